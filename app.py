@@ -4,8 +4,34 @@ from datetime import datetime
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 from flask_migrate import Migrate
+from sqlalchemy.exc import IntegrityError
 from config import config
-from models import db, Patient, Appointment, MedicalRecord
+from models import db, Patient, Appointment, MedicalRecord, AppointmentArchive, MedicalRecordArchive, AuditLog
+from json_provider import FastJSONProvider
+from pagination import (PaginationError, include_options, page_window, paginate, parse_include,
+                        parse_limit, wants_count)
+from export import ExportError, export_table, stream_export
+from filters import FilterError, filter_appointments, parse_datetime_param
+from search import SearchError, parse_query, search_patients
+from scheduling import (SchedulingError, SlotConflictError, availability, check_slot,
+                        is_conflict_error, parse_day)
+from bulk import BulkRequestError, bulk_create, parse_bulk_body
+from stats import get_stats, init_stats
+from archive import init_archive, soft_delete, soft_delete_patient
+from audit import AuditError, filter_audit
+from changes import get_changes, head_token
+from push import PushError, PushUnavailable, init_push, parse_types, stream_changes
+from idempotency import idempotent, init_idempotency
+from ratelimit import concurrency_limited, init_ratelimit
+from compression import init_compression
+from cache import get_cache, init_cache, patient_key, patient_keys, patient_records_key
+from dbpool import configure_pool, pool_stats
+from metrics import init_metrics
+from readiness import init_readiness
+from schema import MIGRATIONS_DIRECTORY, init_schema
+from routing import init_routing, replica_read
+from conditional import (add_validators, collection_fingerprint, compute_etag, not_modified,
+                         window_fingerprint)
 
 # Configure logging
 logging.basicConfig(
@@ -14,6 +40,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Emails are unique among active patients, the only unique constraint a patient write can break
+DUPLICATE_EMAIL = 'A patient with this email already exists'
+
 
 def create_app(config_name=None):
     """Application factory pattern."""
@@ -21,17 +50,86 @@ def create_app(config_name=None):
         config_name = os.environ.get('FLASK_ENV', 'development')
     
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
     app.config.from_object(config[config_name])
     
     # Initialize extensions
+    configure_pool(app)
+    init_routing(app, db)
     db.init_app(app)
-    CORS(app)
-    Migrate(app, db)
+    # Lets browser clients on other origins wait out a 429 for as long as it asks
+    CORS(app, expose_headers=['Retry-After'])
+    Migrate(app, db, directory=MIGRATIONS_DIRECTORY)
+    init_cache(app)
+    init_stats(app)
+    init_archive(app)
+    init_idempotency(app)
+    init_metrics(app)
+    # After init_metrics, so rejected requests are still measured
+    init_ratelimit(app)
+    # Last, so its after_request hook runs first and the others see the encoded body
+    init_compression(app)
+    
+    init_schema(app, db)
+    init_readiness(app, db)
+    init_push(app)
+    
+    def invalidate_patient(*patient_ids):
+        """Drop every cached read for the given patients."""
+        keys = []
+        for patient_id in set(patient_ids):
+            keys.extend(patient_keys(patient_id, Patient.INCLUDES))
+        get_cache().invalidate(*keys)
     
-    # Create tables
-    with app.app_context():
-        db.create_all()
-        logger.info("Database tables created successfully")
+    def patient_validators(patient_id, include=()):
+        """ETag and Last-Modified for one patient, or (None, None) if it does not exist."""
+        updated_at = db.session.query(Patient.updated_at).filter_by(id=patient_id).scalar()
+        if updated_at is None:
+            return None, None
+        parts = [patient_id, updated_at]
+        for name in sorted(include):
+            related = getattr(Patient, Patient.INCLUDES[name]).property.mapper.class_
+            parts.append(collection_fingerprint(related.query.filter_by(patient_id=patient_id), related))
+        # Related rows do not bump the patient's updated_at, so only the ETag covers them.
+        # The cache key, not the raw query string, names the variant: every spelling of
+        # the same include set shares one version and one cache entry.
+        return compute_etag(patient_key(patient_id, include), *parts), None if include else updated_at
+    
+    def bulk_create_response(model, label):
+        """Run a bulk create for model and build the per-item response."""
+        try:
+            items = parse_bulk_body(request)
+            results = bulk_create(model, items)
+        except BulkRequestError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            db.session.rollback()
+            if is_conflict_error(e):
+                # Another request booked one of the slots after validation
+                return jsonify({'success': False, 'error': 'Appointment slot is already booked'}), 409
+            if model is Patient and isinstance(e, IntegrityError):
+                # Another request registered one of the emails after validation
+                return jsonify({'success': False, 'error': DUPLICATE_EMAIL}), 409
+            logger.error(f"Error bulk creating {label}: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+        
+        created = sum(1 for r in results if r['success'])
+        failed = len(results) - created
+        if model is not Patient:
+            invalidate_patient(*(items[r['index']]['patient_id'] for r in results if r['success']))
+        logger.info(f"Bulk created {created} {label} ({failed} failed)")
+        if failed == 0:
+            status = 201
+        elif created == 0:
+            status = 400
+        else:
+            status = 207
+        return jsonify({
+            'success': failed == 0,
+            'created': created,
+            'failed': failed,
+            'results': results
+        }), status
     
     # Health check endpoints
     @app.route('/health', methods=['GET'])
@@ -45,52 +143,132 @@ def create_app(config_name=None):
     
     @app.route('/ready', methods=['GET'])
     def readiness_check():
-        """Readiness check with database connectivity."""
+        """Readiness as of the last background database check."""
+        ready, report = app.extensions['readiness'].state()
+        return jsonify(report), 200 if ready else 503
+    
+    @app.route('/metrics/cache', methods=['GET'])
+    def cache_metrics():
+        """Hit/miss counters of this worker's response cache."""
+        return jsonify(get_cache().stats()), 200
+    
+    @app.route('/metrics/pool', methods=['GET'])
+    def pool_metrics():
+        """Connection pool usage and checkout wait times for this worker."""
+        stats = pool_stats(db.engine)
+        router = app.extensions.get('replica_router')
+        if router is not None:
+            healthy = router.status()
+            stats['replicas'] = {
+                key: {**pool_stats(db.engines[key]), 'healthy': healthy[key]}
+                for key in router.bind_keys
+            }
+        return jsonify(stats), 200
+    
+    @app.route('/api/stats', methods=['GET'])
+    @replica_read
+    def get_statistics():
+        """Dashboard counts read from the pre-aggregated summary tables."""
         try:
-            # Check database connection
-            db.session.execute(db.text('SELECT 1'))
-            return jsonify({
-                'status': 'ready',
-                'database': 'connected',
-                'timestamp': datetime.utcnow().isoformat()
-            }), 200
+            start = parse_datetime_param(request.args, 'from')
+            end = parse_datetime_param(request.args, 'to')
+            data = get_stats(start and start.date(), end and end.date())
+            return jsonify({'success': True, 'data': data}), 200
+        except FilterError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
-            logger.error(f"Readiness check failed: {str(e)}")
-            return jsonify({
-                'status': 'not ready',
-                'database': 'disconnected',
-                'error': str(e)
-            }), 503
+            logger.error(f"Error fetching stats: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
     
     # Patient endpoints
     @app.route('/api/patients', methods=['GET'])
+    @replica_read
+    @concurrency_limited
     def get_patients():
-        """Get all patients."""
+        """Get a page of patients using keyset pagination."""
         try:
-            patients = Patient.query.all()
+            include = parse_include(request.args, Patient)
+            if include and request.args.get('fields'):
+                raise PaginationError('include cannot be combined with fields')
+            etag = None
+            if not include and not wants_count(request.args):
+                window, _ = page_window(Patient.query, Patient, request.args)
+                etag = compute_etag(request.full_path, *window_fingerprint(window, Patient))
+                cached = not_modified(etag)
+                if cached:
+                    return cached
+            
+            if include:
+                query = Patient.query.options(*include_options(Patient, include))
+                page = paginate(query, Patient, request.args,
+                                serialize=lambda p: p.to_dict(include=include))
+            else:
+                page = paginate(Patient.query, Patient, request.args)
+            response = jsonify({'success': True, **page})
+            if etag:
+                add_validators(response, etag)
+            return response, 200
+        except PaginationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error fetching patients: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/api/patients/search', methods=['GET'])
+    @replica_read
+    @concurrency_limited
+    def search_patients_endpoint():
+        """Find patients by name, email or phone, best match first."""
+        try:
+            q = parse_query(request.args)
+            limit = parse_limit(request.args, app.config['SEARCH_DEFAULT_LIMIT'],
+                                app.config['SEARCH_MAX_LIMIT'])
+            patients = search_patients(q, limit)
             return jsonify({
                 'success': True,
-                'data': [p.to_dict() for p in patients],
-                'count': len(patients)
+                'data': patients,
+                'count': len(patients),
+                'limit': limit
             }), 200
+        except (SearchError, PaginationError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
-            logger.error(f"Error fetching patients: {str(e)}")
+            logger.error(f"Error searching patients: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
     
     @app.route('/api/patients/<int:patient_id>', methods=['GET'])
+    @replica_read
     def get_patient(patient_id):
-        """Get a specific patient by ID."""
+        """Get a specific patient by ID, optionally with related history."""
         try:
-            patient = Patient.query.get_or_404(patient_id)
-            return jsonify({
+            include = parse_include(request.args, Patient)
+            etag, last_modified = patient_validators(patient_id, include)
+            if etag:
+                cached = not_modified(etag, last_modified)
+                if cached:
+                    return cached
+            
+            def load():
+                patient = Patient.query.options(*include_options(Patient, include)) \
+                    .filter_by(id=patient_id).first_or_404()
+                return patient.to_dict(include=include)
+            
+            data = get_cache().get_or_set(patient_key(patient_id, include), load, etag)
+            response = jsonify({
                 'success': True,
-                'data': patient.to_dict()
-            }), 200
+                'data': data
+            })
+            if etag:
+                add_validators(response, etag, last_modified)
+            return response, 200
+        except PaginationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
             logger.error(f"Error fetching patient {patient_id}: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 404
     
     @app.route('/api/patients', methods=['POST'])
+    @idempotent
     def create_patient():
         """Create a new patient."""
         try:
@@ -126,11 +304,20 @@ def create_app(config_name=None):
                 'data': patient.to_dict(),
                 'message': 'Patient created successfully'
             }), 201
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': DUPLICATE_EMAIL}), 409
         except Exception as e:
             db.session.rollback()
             logger.error(f"Error creating patient: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
     
+    @app.route('/api/patients/bulk', methods=['POST'])
+    @idempotent
+    def bulk_create_patients():
+        """Create many patients from a JSON array or NDJSON body."""
+        return bulk_create_response(Patient, 'patients')
+    
     @app.route('/api/patients/<int:patient_id>', methods=['PUT'])
     def update_patient(patient_id):
         """Update an existing patient."""
@@ -153,6 +340,7 @@ def create_app(config_name=None):
                 patient.date_of_birth = datetime.strptime(data['date_of_birth'], '%Y-%m-%d').date()
             
             db.session.commit()
+            invalidate_patient(patient_id)
             
             logger.info(f"Updated patient ID: {patient_id}")
             return jsonify({
@@ -160,6 +348,9 @@ def create_app(config_name=None):
                 'data': patient.to_dict(),
                 'message': 'Patient updated successfully'
             }), 200
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': DUPLICATE_EMAIL}), 409
         except Exception as e:
             db.session.rollback()
             logger.error(f"Error updating patient {patient_id}: {str(e)}")
@@ -167,11 +358,12 @@ def create_app(config_name=None):
     
     @app.route('/api/patients/<int:patient_id>', methods=['DELETE'])
     def delete_patient(patient_id):
-        """Delete a patient."""
+        """Soft delete a patient together with its appointments and medical records."""
         try:
             patient = Patient.query.get_or_404(patient_id)
-            db.session.delete(patient)
+            soft_delete_patient(patient)
             db.session.commit()
+            invalidate_patient(patient_id)
             
             logger.info(f"Deleted patient ID: {patient_id}")
             return jsonify({
@@ -185,20 +377,60 @@ def create_app(config_name=None):
     
     # Appointment endpoints
     @app.route('/api/appointments', methods=['GET'])
+    @replica_read
+    @concurrency_limited
     def get_appointments():
-        """Get all appointments."""
+        """Get appointments, optionally filtered by doctor, status, patient and date range."""
         try:
-            appointments = Appointment.query.all()
-            return jsonify({
+            query = filter_appointments(Appointment.query, request.args)
+            etag = compute_etag(request.full_path, *collection_fingerprint(query, Appointment))
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            
+            rows = query.order_by(Appointment.appointment_datetime, Appointment.id) \
+                .with_entities(*Appointment.columns()).all()
+            serialize = Appointment.row_serializer()
+            response = jsonify({
                 'success': True,
-                'data': [a.to_dict() for a in appointments],
-                'count': len(appointments)
-            }), 200
+                'data': [serialize(row) for row in rows],
+                'count': len(rows)
+            })
+            return add_validators(response, etag), 200
+        except FilterError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
             logger.error(f"Error fetching appointments: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
     
+    @app.route('/api/appointments/export', methods=['GET'])
+    @replica_read
+    @concurrency_limited
+    def export_appointments():
+        """Stream appointments as NDJSON or a JSON array, accepting the list filters."""
+        try:
+            query = filter_appointments(Appointment.query, request.args).order_by(Appointment.id)
+            return stream_export(query, Appointment, request.args.get('format', 'ndjson'), 'appointments')
+        except (ExportError, FilterError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+    
+    @app.route('/api/appointments/archive', methods=['GET'])
+    @replica_read
+    @concurrency_limited
+    def get_archived_appointments():
+        """Get a page of archived appointments, accepting the list filters."""
+        try:
+            query = filter_appointments(AppointmentArchive.query, request.args, AppointmentArchive)
+            page = paginate(query, AppointmentArchive, request.args)
+            return jsonify({'success': True, **page}), 200
+        except (FilterError, PaginationError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error fetching archived appointments: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
     @app.route('/api/appointments', methods=['POST'])
+    @idempotent
     def create_appointment():
         """Create a new appointment."""
         try:
@@ -218,6 +450,7 @@ def create_app(config_name=None):
             
             # Convert datetime string
             appt_datetime = datetime.strptime(data['appointment_datetime'], '%Y-%m-%d %H:%M:%S')
+            check_slot(data['doctor_name'], appt_datetime, data.get('status', 'scheduled'))
             
             appointment = Appointment(
                 patient_id=data['patient_id'],
@@ -230,6 +463,7 @@ def create_app(config_name=None):
             
             db.session.add(appointment)
             db.session.commit()
+            invalidate_patient(appointment.patient_id)
             
             logger.info(f"Created appointment ID: {appointment.id} for patient {patient.name}")
             return jsonify({
@@ -237,17 +471,30 @@ def create_app(config_name=None):
                 'data': appointment.to_dict(),
                 'message': 'Appointment created successfully'
             }), 201
+        except SlotConflictError as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e), 'conflict_id': e.conflict_id}), 409
         except Exception as e:
             db.session.rollback()
+            if is_conflict_error(e):
+                return jsonify({'success': False, 'error': 'Appointment slot is already booked'}), 409
             logger.error(f"Error creating appointment: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
     
+    @app.route('/api/appointments/bulk', methods=['POST'])
+    @idempotent
+    def bulk_create_appointments():
+        """Create many appointments from a JSON array or NDJSON body."""
+        return bulk_create_response(Appointment, 'appointments')
+    
     @app.route('/api/appointments/<int:appointment_id>', methods=['PUT'])
     def update_appointment(appointment_id):
         """Update appointment status."""
         try:
             appointment = Appointment.query.get_or_404(appointment_id)
             data = request.get_json()
+            booked_at = appointment.appointment_datetime
+            was_cancelled = appointment.status == 'cancelled'
             
             if 'status' in data:
                 appointment.status = data['status']
@@ -257,8 +504,16 @@ def create_app(config_name=None):
                 appointment.appointment_datetime = datetime.strptime(
                     data['appointment_datetime'], '%Y-%m-%d %H:%M:%S'
                 )
+            # Only a move or a reactivation takes a slot the booking did not hold
+            # already, like the slot trigger checks
+            if appointment.appointment_datetime != booked_at or (was_cancelled and appointment.status != 'cancelled'):
+                # Check before the pending change is flushed into the slot trigger
+                with db.session.no_autoflush:
+                    check_slot(appointment.doctor_name, appointment.appointment_datetime,
+                               appointment.status, exclude_id=appointment.id)
             
             db.session.commit()
+            invalidate_patient(appointment.patient_id)
             
             logger.info(f"Updated appointment ID: {appointment_id}")
             return jsonify({
@@ -266,18 +521,25 @@ def create_app(config_name=None):
                 'data': appointment.to_dict(),
                 'message': 'Appointment updated successfully'
             }), 200
+        except SlotConflictError as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e), 'conflict_id': e.conflict_id}), 409
         except Exception as e:
             db.session.rollback()
+            if is_conflict_error(e):
+                return jsonify({'success': False, 'error': 'Appointment slot is already booked'}), 409
             logger.error(f"Error updating appointment {appointment_id}: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
     
     @app.route('/api/appointments/<int:appointment_id>', methods=['DELETE'])
     def delete_appointment(appointment_id):
-        """Delete an appointment."""
+        """Soft delete an appointment."""
         try:
             appointment = Appointment.query.get_or_404(appointment_id)
-            db.session.delete(appointment)
+            patient_id = appointment.patient_id
+            soft_delete(appointment)
             db.session.commit()
+            invalidate_patient(patient_id)
             
             logger.info(f"Deleted appointment ID: {appointment_id}")
             return jsonify({
@@ -289,24 +551,88 @@ def create_app(config_name=None):
             logger.error(f"Error deleting appointment {appointment_id}: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
     
+    # Doctor endpoints
+    @app.route('/api/doctors/<doctor_name>/availability', methods=['GET'])
+    @replica_read
+    def get_doctor_availability(doctor_name):
+        """Free appointment slots of a doctor on one day."""
+        try:
+            day = parse_day(request.args)
+            return jsonify({'success': True, 'data': availability(doctor_name, day)}), 200
+        except SchedulingError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error computing availability for {doctor_name}: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
     # Medical Records endpoints
     @app.route('/api/patients/<int:patient_id>/records', methods=['GET'])
+    @replica_read
     def get_patient_records(patient_id):
         """Get all medical records for a patient."""
         try:
-            patient = Patient.query.get_or_404(patient_id)
-            records = MedicalRecord.query.filter_by(patient_id=patient_id).all()
-            return jsonify({
-                'success': True,
-                'patient': patient.name,
-                'data': [r.to_dict() for r in records],
-                'count': len(records)
-            }), 200
+            etag, _ = patient_validators(patient_id)
+            if etag:
+                records = MedicalRecord.query.filter_by(patient_id=patient_id)
+                etag = compute_etag(etag, *collection_fingerprint(records, MedicalRecord))
+                cached = not_modified(etag)
+                if cached:
+                    return cached
+            
+            def load():
+                patient = Patient.query.get_or_404(patient_id)
+                rows = MedicalRecord.query.filter_by(patient_id=patient_id) \
+                    .with_entities(*MedicalRecord.columns()).all()
+                serialize = MedicalRecord.row_serializer()
+                return {
+                    'patient': patient.name,
+                    'data': [serialize(row) for row in rows],
+                    'count': len(rows)
+                }
+            
+            body = get_cache().get_or_set(patient_records_key(patient_id), load, etag)
+            response = jsonify({'success': True, **body})
+            if etag:
+                add_validators(response, etag)
+            return response, 200
         except Exception as e:
             logger.error(f"Error fetching records for patient {patient_id}: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
     
+    @app.route('/api/patients/<int:patient_id>/records/export', methods=['GET'])
+    @replica_read
+    @concurrency_limited
+    def export_patient_records(patient_id):
+        """Stream all medical records for a patient as NDJSON or a JSON array."""
+        try:
+            Patient.query.get_or_404(patient_id)
+            query = MedicalRecord.query.filter_by(patient_id=patient_id).order_by(MedicalRecord.id)
+            return stream_export(
+                query, MedicalRecord, request.args.get('format', 'ndjson'), f'patient-{patient_id}-records'
+            )
+        except ExportError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error exporting records for patient {patient_id}: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 404
+    
+    @app.route('/api/patients/<int:patient_id>/records/archive', methods=['GET'])
+    @replica_read
+    def get_archived_patient_records(patient_id):
+        """Get a page of a patient's archived medical records."""
+        try:
+            Patient.query.get_or_404(patient_id)
+            query = MedicalRecordArchive.query.filter_by(patient_id=patient_id)
+            page = paginate(query, MedicalRecordArchive, request.args)
+            return jsonify({'success': True, **page}), 200
+        except PaginationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error fetching archived records for patient {patient_id}: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 404
+    
     @app.route('/api/records', methods=['POST'])
+    @idempotent
     def create_medical_record():
         """Create a new medical record."""
         try:
@@ -338,6 +664,7 @@ def create_app(config_name=None):
             
             db.session.add(record)
             db.session.commit()
+            invalidate_patient(record.patient_id)
             
             logger.info(f"Created medical record ID: {record.id} for patient {patient.name}")
             return jsonify({
@@ -350,13 +677,21 @@ def create_app(config_name=None):
             logger.error(f"Error creating medical record: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
     
+    @app.route('/api/records/bulk', methods=['POST'])
+    @idempotent
+    def bulk_create_medical_records():
+        """Create many medical records from a JSON array or NDJSON body."""
+        return bulk_create_response(MedicalRecord, 'medical records')
+    
     @app.route('/api/records/<int:record_id>', methods=['DELETE'])
     def delete_medical_record(record_id):
-        """Delete a medical record."""
+        """Soft delete a medical record."""
         try:
             record = MedicalRecord.query.get_or_404(record_id)
-            db.session.delete(record)
+            patient_id = record.patient_id
+            soft_delete(record)
             db.session.commit()
+            invalidate_patient(patient_id)
             
             logger.info(f"Deleted medical record ID: {record_id}")
             return jsonify({
@@ -368,6 +703,69 @@ def create_app(config_name=None):
             logger.error(f"Error deleting medical record {record_id}: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
     
+    # Export endpoints
+    @app.route('/api/export/<table>', methods=['GET'])
+    @replica_read
+    @concurrency_limited
+    def export_whole_table(table):
+        """Stream a whole table as CSV or Arrow for analytics, optionally only rows updated since a time."""
+        try:
+            updated_since = parse_datetime_param(request.args, 'updated_since')
+            response = export_table(table, request.args.get('format', 'csv'), updated_since)
+            if response is None:
+                return jsonify({'success': False, 'error': f'Unknown table: {table}'}), 404
+            return response
+        except (ExportError, FilterError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+    
+    # Audit and change feed endpoints
+    @app.route('/api/audit', methods=['GET'])
+    @replica_read
+    @concurrency_limited
+    def get_audit_log():
+        """Get a page of audit log entries, oldest first, filtered by entity and time."""
+        try:
+            query = filter_audit(AuditLog.query, request.args)
+            page = paginate(query, AuditLog, request.args)
+            return jsonify({'success': True, **page}), 200
+        except (AuditError, FilterError, PaginationError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error fetching audit log: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/api/changes', methods=['GET'])
+    @replica_read
+    def get_change_feed():
+        """Changes to patients, appointments and records after ?since=, in commit order."""
+        try:
+            since = request.args.get('since')
+            if since is None:
+                # Where to start from after a full load
+                return jsonify({'success': True, 'data': [], 'next_token': head_token(), 'has_more': False}), 200
+            return jsonify({'success': True, **get_changes(since, request.args)}), 200
+        except PaginationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error fetching changes: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
+    @app.route('/api/changes/stream', methods=['GET'])
+    def stream_change_feed():
+        """Push appointment and record changes as server-sent events as they commit."""
+        try:
+            types = parse_types(request.args.get('entity_type'))
+            # EventSource sends the id of the last event it received when it reconnects
+            since = request.headers.get('Last-Event-ID') or request.args.get('since')
+            return stream_changes(since, types)
+        except PushUnavailable as e:
+            return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': '5'}
+        except (PushError, PaginationError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error opening change stream: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
     # Error handlers
     @app.errorhandler(404)
     def not_found(error):
@@ -0,0 +1,152 @@
+"""Soft deletes and archival of cold appointments and medical records.
+
+Deleting a patient, appointment or record sets deleted_at instead of
+removing the row; ORM SELECTs leave such rows out unless executed with
+``execution_options(include_deleted=True)``.
+
+Rows older than ARCHIVE_AFTER_DAYS are moved, in batches, from appointment
+and medical_record into appointment_archive and medical_record_archive (by
+``flask archive run``, scheduled as a k8s CronJob), so the indexes that hot
+queries scan only cover recent data. Archived rows keep their ids and are
+served by the /archive endpoints.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from sqlalchemy import delete, event, insert, literal, select, update
+from sqlalchemy.orm import with_loader_criteria
+from models import (db, Appointment, AppointmentArchive, MedicalRecord, MedicalRecordArchive,
+                    SoftDeleteMixin)
+from routing import RoutingSession
+from stats import record_deletes
+from audit import audit_updates
+
+logger = logging.getLogger(__name__)
+
+INCLUDE_DELETED = 'include_deleted'
+
+# Hot model: (archive model, column compared with the horizon)
+ARCHIVES = {
+    Appointment: (AppointmentArchive, 'appointment_datetime'),
+    MedicalRecord: (MedicalRecordArchive, 'record_date')
+}
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _hide_deleted(state):
+    # Column loads refresh attributes of an object already loaded (e.g. after
+    # the commit that soft deleted it), so they are left alone
+    if state.is_select and not state.is_column_load \
+            and not state.execution_options.get(INCLUDE_DELETED, False):
+        state.statement = state.statement.options(with_loader_criteria(
+            SoftDeleteMixin, lambda cls: cls.deleted_at.is_(None), include_aliases=True
+        ))
+
+
+def soft_delete(*targets, now=None):
+    """Mark ORM objects deleted; the caller commits."""
+    now = now or datetime.utcnow()
+    for target in targets:
+        target.deleted_at = now
+    return now
+
+
+def soft_delete_patient(patient):
+    """Mark a patient and all of its appointments and records deleted, archived ones included.
+
+    Hot rows are updated through the ORM, which keeps the summary tables in
+    stats.py and the audit log current; archived rows are updated in bulk and
+    their counts and audit entries written explicitly.
+    """
+    now = soft_delete(patient, *patient.appointments, *patient.medical_records)
+    for model, (archive_model, _) in ARCHIVES.items():
+        table = archive_model.__table__
+        live = (table.c.patient_id == patient.id, table.c.deleted_at.is_(None))
+        if model is Appointment:
+            counted = db.session.execute(
+                select(table.c.status, table.c.doctor_name, table.c.appointment_datetime).where(*live)
+            )
+            record_deletes(model, [row._asdict() for row in counted])
+        # updated_at too, so incremental exports pick the deletion up
+        ids = db.session.execute(update(table).where(*live).values(deleted_at=now, updated_at=now)
+                                 .returning(table.c.id)).scalars().all()
+        audit_updates(model, ids, {'deleted_at': None}, {'deleted_at': model.serialize_value(now)},
+                      action='delete')
+    return now
+
+
+def archive_cutoff(now=None):
+    """Rows dated before this are cold."""
+    return (now or datetime.utcnow()) - timedelta(days=current_app.config['ARCHIVE_AFTER_DAYS'])
+
+
+def archive_batch(model, cutoff, batch_size):
+    """Move up to batch_size rows of model dated before cutoff to its archive table.
+
+    Copy and delete run in one transaction. On PostgreSQL the selected rows
+    are locked with SKIP LOCKED, so overlapping runs take different rows.
+    Returns the number of rows moved.
+    """
+    archive_model, column_name = ARCHIVES[model]
+    source, target = model.__table__, archive_model.__table__
+    column = source.c[column_name]
+    if isinstance(column.type, db.Date):
+        cutoff = cutoff.date()
+
+    ids = select(source.c.id).where(column < cutoff).order_by(source.c.id).limit(batch_size)
+    if db.session.get_bind(mapper=model.__mapper__).dialect.name == 'postgresql':
+        ids = ids.with_for_update(skip_locked=True)
+    ids = db.session.execute(ids, execution_options={INCLUDE_DELETED: True}).scalars().all()
+    if not ids:
+        return 0
+
+    names = model.column_names()
+    moved = select(*(source.c[name] for name in names), literal(datetime.utcnow()).label('archived_at')) \
+        .where(source.c.id.in_(ids))
+    db.session.execute(insert(target).from_select([*names, 'archived_at'], moved))
+    db.session.execute(delete(source).where(source.c.id.in_(ids)))
+    db.session.commit()
+    return len(ids)
+
+
+def archive_cold_rows(batch_size=None, max_batches=None, pause=None):
+    """Archive every cold appointment and medical record, one batch per transaction.
+
+    Sleeps pause seconds between batches to leave room for live traffic.
+    Returns {table name: rows moved}.
+    """
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    pause = current_app.config['ARCHIVE_BATCH_PAUSE'] if pause is None else pause
+    cutoff = archive_cutoff()
+    moved = {}
+    for model in ARCHIVES:
+        total = batches = 0
+        while max_batches is None or batches < max_batches:
+            count = archive_batch(model, cutoff, batch_size)
+            total += count
+            batches += 1
+            if count < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+        moved[model.__tablename__] = total
+        logger.info(f"Archived {total} {model.__tablename__} rows dated before {cutoff.isoformat()}")
+    return moved
+
+
+def init_archive(app):
+    """Register the ``flask archive run`` command."""
+    @app.cli.group('archive')
+    def archive_cli():
+        """Move cold appointments and medical records to the archive tables."""
+
+    @archive_cli.command('run')
+    @click.option('--batch-size', type=int, default=None, help='Rows per transaction (ARCHIVE_BATCH_SIZE)')
+    @click.option('--max-batches', type=int, default=None, help='Stop after this many batches per table')
+    def run_command(batch_size, max_batches):
+        """Archive rows older than ARCHIVE_AFTER_DAYS."""
+        moved = archive_cold_rows(batch_size, max_batches)
+        for table, count in moved.items():
+            click.echo(f'{table}: {count} rows archived')
@@ -0,0 +1,208 @@
+"""ASGI entry point serving the create_app routes from an event loop.
+
+Run with, for example::
+
+    uvicorn --factory asgi:create_asgi_app --host 0.0.0.0 --port 5000
+
+The event loop owns client connections: idle keep-alives and request bodies
+still being uploaded hold no thread. Each request is then run by one of a
+bounded pool of handler threads, sized by default to the connections the
+database pool can open (DB_POOL_SIZE + DB_MAX_OVERFLOW). A process therefore
+runs no more requests at once than a gthread worker with as many threads;
+more requests in flight need more connections (see the README). When a
+client disconnects, its response body is closed, so an abandoned export or
+change stream stops at its next chunk.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+from app import create_app
+from dbpool import pool_stats
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# Handler threads when the database has no connection pool to size them by (SQLite)
+DEFAULT_THREADS = 100
+
+
+def build_environ(scope, body):
+    """Translate an ASGI HTTP scope into a WSGI environ."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').lower()
+        value = raw_value.decode('latin-1')
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def forward_body(result, send_body, disconnected):
+    """Pass the chunks of a WSGI result to send_body and close it; return False if the client left first."""
+    try:
+        for chunk in result:
+            if disconnected.is_set():
+                # Stop producing a body nobody reads; close() below ends it
+                return False
+            if chunk:
+                send_body(chunk)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return True
+
+
+class ASGIApp:
+    """Serve a WSGI (Flask) application over ASGI with a bounded thread pool."""
+
+    def __init__(self, wsgi_app, max_threads=100):
+        self.wsgi_app = wsgi_app
+        self.max_threads = max_threads
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = SpooledTemporaryFile(max_size=65536)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+
+        # Servers drop what is sent to a client that has gone; only receive() tells
+        disconnected = threading.Event()
+
+        async def watch_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        try:
+            await loop.run_in_executor(
+                self.executor, context.run, self._run_wsgi, scope, body, loop, send, disconnected
+            )
+        finally:
+            watcher.cancel()
+            body.close()
+
+    def _run_wsgi(self, scope, body, loop, send, disconnected):
+        """Run the WSGI app in a handler thread, forwarding output to send until the client leaves."""
+        def send_sync(message):
+            # Waiting for each send gives the thread backpressure from slow clients
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+
+        def send_body(data):
+            if not response.get('started'):
+                response['started'] = True
+                send_sync(response['start'])
+            send_sync({'type': 'http.response.body', 'body': data, 'more_body': True})
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get('started'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['start'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                            for name, value in headers]
+            }
+            # The WSGI write() callable
+            return send_body
+
+        result = self.wsgi_app(build_environ(scope, body), start_response)
+        if not forward_body(result, send_body, disconnected):
+            return
+        if not response.get('started'):
+            send_sync(response['start'])
+        send_sync({'type': 'http.response.body', 'body': b''})
+
+
+def pool_capacity(app):
+    """Connections the primary engine's pool can hand out at once, None without a QueuePool."""
+    with app.app_context():
+        stats = pool_stats(db.engine)
+    if 'size' not in stats:
+        return None
+    return stats['size'] + max(stats['max_overflow'], 0)
+
+
+def handler_threads(app):
+    """ASGI_THREADS, or by default one handler thread per pooled connection.
+
+    A thread beyond the pool's capacity cannot run a query; it waits for a
+    connection and fails with a pool timeout after DB_POOL_TIMEOUT seconds,
+    so more threads than connections add 500s rather than throughput.
+    """
+    capacity = pool_capacity(app)
+    configured = os.environ.get('ASGI_THREADS')
+    if not configured:
+        return capacity or DEFAULT_THREADS
+    threads = int(configured)
+    if capacity and threads > capacity:
+        logger.warning(f"ASGI_THREADS={threads} exceeds the database pool's {capacity} connections; "
+                       f"raise DB_POOL_SIZE/DB_MAX_OVERFLOW or requests will time out waiting for one")
+    return threads
+
+
+def create_asgi_app(config_name=None):
+    """ASGI application factory wrapping create_app."""
+    app = create_app(config_name)
+    max_threads = handler_threads(app)
+    # Keeps change streams from taking every handler thread
+    app.config['SERVER_THREADS'] = max_threads
+    logger.info(f"Serving ASGI with {max_threads} handler threads")
+    return ASGIApp(app, max_threads=max_threads)
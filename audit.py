@@ -0,0 +1,213 @@
+import click
+from datetime import datetime
+from flask import current_app, has_request_context, request
+from sqlalchemy import event, func, inspect, insert, select, text, update
+from models import db, AuditLog, Patient, Appointment, MedicalRecord
+from filters import parse_datetime_param
+from routing import RoutingSession
+
+# Change log behind GET /api/audit. Mapper events collect one entry per
+# inserted, updated or deleted row during a flush, and after_flush writes them
+# with multi-row INSERTs on the flush's connection: the log commits or rolls
+# back with the change, for one extra round trip per AUDIT_BATCH_SIZE entries
+# instead of one per row.
+ENTRIES_KEY = 'audit_entries'
+# Entity types the current transaction has logged changes for (read by push.py)
+WRITTEN_KEY = 'audit_written'
+AUDITED = {model.__tablename__: model for model in (Patient, Appointment, MedicalRecord)}
+# Called with those entity types once the transaction has committed
+_commit_hooks = []
+
+
+class AuditError(ValueError):
+    """Raised when audit query parameters are invalid."""
+
+
+def _source():
+    if has_request_context():
+        return f'{request.method} {request.path}'[:255]
+    context = click.get_current_context(silent=True)
+    return context.command_path[:255] if context is not None else None
+
+
+def _entry(model, entity_id, action, before, after):
+    return {
+        'entity_type': model.__tablename__,
+        'entity_id': entity_id,
+        'action': action,
+        'before': before,
+        'after': after,
+        'changed_at': datetime.utcnow(),
+        'source': _source()
+    }
+
+
+def _snapshot(target):
+    return {name: target.serialize_value(getattr(target, name)) for name in target.column_names()}
+
+
+def _changes(target):
+    """Before and after values of the columns changed in this flush."""
+    before, after = {}, {}
+    attrs = inspect(target).attrs
+    for name in target.column_names():
+        history = attrs[name].history
+        if history.deleted or history.added:
+            before[name] = target.serialize_value(history.deleted[0] if history.deleted else None)
+            after[name] = target.serialize_value(history.added[0] if history.added else getattr(target, name))
+    return before, after
+
+
+def _entries(session):
+    return session.info.setdefault(ENTRIES_KEY, [])
+
+
+def _listen(model):
+    def after_insert(mapper, connection, target):
+        _entries(inspect(target).session).append(_entry(model, target.id, 'insert', None, _snapshot(target)))
+
+    def after_update(mapper, connection, target):
+        before, after = _changes(target)
+        if not after:
+            return
+        action = 'update'
+        if 'deleted_at' in after:
+            action = 'delete' if after['deleted_at'] is not None else 'restore'
+        _entries(inspect(target).session).append(_entry(model, target.id, action, before, after))
+
+    def after_delete(mapper, connection, target):
+        _entries(inspect(target).session).append(_entry(model, target.id, 'delete', _snapshot(target), None))
+
+    event.listen(model, 'after_insert', after_insert)
+    event.listen(model, 'after_update', after_update)
+    event.listen(model, 'after_delete', after_delete)
+
+
+for _model in AUDITED.values():
+    _listen(_model)
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _reset_entries(session, flush_context, instances):
+    # Entries of a flush that failed were never written
+    session.info.pop(ENTRIES_KEY, None)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _write_entries(session, flush_context):
+    entries = session.info.pop(ENTRIES_KEY, None)
+    if entries:
+        write_entries(session, entries)
+
+
+def write_entries(session, entries):
+    """Insert audit entries in session's transaction, AUDIT_BATCH_SIZE rows per statement."""
+    connection = session.connection()
+    batch_size = current_app.config['AUDIT_BATCH_SIZE']
+    for start in range(0, len(entries), batch_size):
+        connection.execute(insert(AuditLog.__table__).values(entries[start:start + batch_size]))
+    session.info.setdefault(WRITTEN_KEY, set()).update(entry['entity_type'] for entry in entries)
+
+
+@event.listens_for(RoutingSession, 'before_commit')
+def _assign_feed_ids(session):
+    # commit() flushes after this hook; flush now so the last entries get a position too
+    session.flush()
+    if session.info.get(WRITTEN_KEY):
+        assign_feed_ids(session.connection())
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _run_commit_hooks(session):
+    written = session.info.pop(WRITTEN_KEY, None)
+    if written:
+        for hook in _commit_hooks:
+            hook(written)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_written(session):
+    session.info.pop(WRITTEN_KEY, None)
+
+
+def on_commit(hook):
+    """Register hook(entity_types) to run after each commit that logged changes."""
+    _commit_hooks.append(hook)
+    return hook
+
+
+def assign_feed_ids(connection):
+    """Give the entries written by connection's transaction their change feed positions.
+
+    Audit ids are assigned when a transaction flushes, so on PostgreSQL a
+    later id can commit before an earlier one, and a client that has read
+    past it would never see the earlier one. Feed positions are assigned
+    just before commit instead, after every position already committed, and
+    in id order within the transaction. On PostgreSQL an advisory lock held
+    until commit makes the transactions take their turn, so positions become
+    visible in order; other databases already allow one writer at a time.
+    """
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('audit_log_feed'))"))
+    table = AuditLog.__table__
+    # Uncommitted entries of other transactions are invisible, so the NULL ones are this one's
+    pending = table.c.feed_id.is_(None)
+    last = select(func.coalesce(func.max(table.c.feed_id), 0)).scalar_subquery()
+    first = select(func.min(table.c.id)).where(pending).scalar_subquery()
+    connection.execute(update(table).where(pending).values(feed_id=table.c.id - first + last + 1))
+
+
+def audit_inserts(model, rows):
+    """Log rows written with Core INSERTs (bulk creates), which skip ORM events.
+
+    rows are the inserted rows as returned by ``RETURNING`` model.columns(),
+    so the snapshots hold every column, defaults included, like the ORM path's.
+    """
+    serialize = model.row_serializer()
+    entries = [_entry(model, row.id, 'insert', None, serialize(row)) for row in rows]
+    if entries:
+        write_entries(db.session, entries)
+
+
+def audit_updates(model, ids, before, after, action='update'):
+    """Log the same change applied to many rows with a Core UPDATE."""
+    entries = [_entry(model, entity_id, action, before, after) for entity_id in ids]
+    if entries:
+        write_entries(db.session, entries)
+
+
+def _filter_entity(query, args):
+    """Apply ?entity_type=, ?entity_id= and ?action= to query."""
+    entity_type = args.get('entity_type')
+    if entity_type:
+        if entity_type not in AUDITED:
+            raise AuditError(f"entity_type must be one of: {', '.join(AUDITED)}")
+        query = query.filter(AuditLog.entity_type == entity_type)
+    if args.get('entity_id'):
+        if not entity_type:
+            raise AuditError('entity_id requires entity_type')
+        try:
+            query = query.filter(AuditLog.entity_id == int(args['entity_id']))
+        except ValueError:
+            raise AuditError('entity_id must be an integer')
+    if args.get('action'):
+        query = query.filter(AuditLog.action == args['action'])
+    return query
+
+
+def _filter_range(query, args):
+    """Apply the ?from=/?to= range of changed_at to query."""
+    start = parse_datetime_param(args, 'from')
+    end = parse_datetime_param(args, 'to')
+    if start and end and start >= end:
+        raise AuditError('from must be earlier than to')
+    if start:
+        query = query.filter(AuditLog.changed_at >= start)
+    if end:
+        query = query.filter(AuditLog.changed_at < end)
+    return query
+
+
+def filter_audit(query, args):
+    """Apply ?entity_type=, ?entity_id=, ?action= and the ?from=/?to= range to query."""
+    return _filter_range(_filter_entity(query, args), args)
@@ -0,0 +1,80 @@
+"""Measure patient search latency against a large patient table.
+
+Uses the search backend of whatever DATABASE_URL points at (the FTS5 index on
+SQLite, trigram indexes on PostgreSQL); defaults to a temporary SQLite file.
+
+    python benchmarks/bench_search.py --rows 1000000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import common  # noqa: E402
+
+FIRST = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda',
+         'William', 'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica']
+LAST = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+        'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson']
+QUERIES = ['john', 'jennifer smi', 'garcia', 'pat', 'user12345', '555-01', 'wilson rob']
+
+
+def seed(db, Patient, rows, batch=20000):
+    from sqlalchemy import insert
+    rng = random.Random(42)
+    for start in range(0, rows, batch):
+        db.session.execute(insert(Patient), [
+            {
+                'name': f'{rng.choice(FIRST)} {rng.choice(LAST)}',
+                'date_of_birth': date(1950 + i % 60, 1 + i % 12, 1 + i % 28),
+                'email': f'user{i}@example.com',
+                'phone': f'555-{i % 10000:04d}'
+            }
+            for i in range(start, min(start + batch, rows))
+        ])
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    if 'DATABASE_URL' not in os.environ:
+        os.environ['DATABASE_URL'] = f'sqlite:///{tempfile.mkdtemp()}/search.db'
+    from app import create_app
+    from models import db, Patient
+    from search import search_patients
+
+    app = create_app('development')
+    with app.app_context():
+        if db.session.query(Patient.id).count() < args.rows:
+            seed(db, Patient, args.rows)
+        results = {'rows': args.rows, 'dialect': db.engine.dialect.name, 'queries': {}}
+        for q in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                hits = search_patients(q, args.limit)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results['queries'][q] = {
+                'hits': len(hits),
+                'p50_ms': round(statistics.median(timings), 2),
+                'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2)
+            }
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {common.save_results('search', results)}")
+
+
+if __name__ == '__main__':
+    main()
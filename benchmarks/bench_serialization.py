@@ -0,0 +1,89 @@
+"""Compare list serialization paths for appointments.
+
+"before" is the original path: load ORM objects, call to_dict() per row and
+encode with the stdlib json module. "after" selects column tuples with
+with_entities, converts them with Appointment.row_serializer() and encodes
+with the app's JSON provider (orjson when installed).
+
+    python benchmarks/bench_serialization.py --rows 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import common  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from app import create_app  # noqa: E402
+from json_provider import backend_name  # noqa: E402
+from models import db, Appointment, Patient  # noqa: E402
+
+
+def seed(rows):
+    db.session.execute(insert(Patient), [
+        {'name': f'Patient {i}', 'date_of_birth': date(1980, 1, 1), 'email': f'p{i}@example.com'}
+        for i in range(1000)
+    ])
+    start = datetime(2024, 1, 1, 8, 0)
+    db.session.execute(insert(Appointment), [
+        {
+            'patient_id': i % 1000 + 1,
+            'doctor_name': f'Dr. {i % 50}',
+            'appointment_datetime': start + timedelta(minutes=15 * i),
+            'status': 'scheduled',
+            'reason': 'Follow-up visit'
+        }
+        for i in range(rows)
+    ])
+    db.session.commit()
+
+
+def before():
+    appointments = Appointment.query.order_by(Appointment.id).all()
+    return json.dumps({'data': [a.to_dict() for a in appointments]}, sort_keys=True)
+
+
+def after(app):
+    rows = Appointment.query.order_by(Appointment.id).with_entities(*Appointment.columns()).all()
+    serialize = Appointment.row_serializer()
+    return app.json.dumps_bytes({'data': [serialize(row) for row in rows]})
+
+
+def measure(fn, rows, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return rows / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+        assert json.loads(before())['data'] == json.loads(after(app))['data']
+        results = {
+            'rows': args.rows,
+            'json_backend': backend_name(),
+            'before_rows_per_sec': round(measure(before, args.rows, args.repeat)),
+            'after_rows_per_sec': round(measure(lambda: after(app), args.rows, args.repeat))
+        }
+        results['speedup'] = round(results['after_rows_per_sec'] / results['before_rows_per_sec'], 2)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {common.save_results('serialization', results)}")
+
+
+if __name__ == '__main__':
+    main()
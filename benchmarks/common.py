@@ -0,0 +1,75 @@
+"""Helpers shared by the benchmark scripts."""
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def default_database_url():
+    """DATABASE_URL, or a SQLite file under the temp directory so runs stay offline."""
+    return os.environ.get('DATABASE_URL') or \
+        f"sqlite:///{os.path.join(tempfile.gettempdir(), 'healthcare-bench.db')}"
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed=None):
+    """p50/p95/p99 in milliseconds (and throughput when elapsed is given) for latencies in seconds."""
+    values = sorted(latencies)
+    summary = {'count': len(values)}
+    for name, fraction in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+        value = percentile(values, fraction)
+        summary[name] = round(value * 1000, 3) if value is not None else None
+    summary['mean_ms'] = round(sum(values) / len(values) * 1000, 3) if values else None
+    if elapsed:
+        summary['per_second'] = round(len(values) / elapsed, 1)
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def save_results(kind, results, output=None):
+    """Write results with run metadata as JSON and return the file path.
+
+    Files are named <kind>-<commit>-<timestamp>.json under benchmarks/results
+    unless output is given, so runs on different commits can be compared with
+    benchmarks/compare.py.
+    """
+    commit = git_commit()
+    started = datetime.utcnow()
+    document = {
+        'kind': kind,
+        'commit': commit,
+        'timestamp': started.isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': default_database_url().split(':', 1)[0],
+        'results': results
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{kind}-{commit}-{started.strftime('%Y%m%dT%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+    return output
@@ -0,0 +1,66 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python benchmarks/compare.py benchmarks/results/micro-abc123-*.json benchmarks/results/micro-def456-*.json
+
+Compares p50/p95/p99 latency of every benchmark present in both files and
+exits with status 1 when any of them got slower by more than --threshold
+percent.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+def benchmarks(document):
+    """Flatten micro and load result documents into {name: summary}."""
+    results = document['results']
+    if document['kind'] == 'load':
+        return results['scenarios']
+    return {name: summary for name, summary in results.items() if isinstance(summary, dict) and 'p50_ms' in summary}
+
+
+def compare(baseline, candidate, threshold):
+    """Return (rows, regressed) for every benchmark and metric present in both."""
+    rows = []
+    regressed = False
+    old, new = benchmarks(baseline), benchmarks(candidate)
+    for name in sorted(set(old) & set(new)):
+        for metric in METRICS:
+            before, after = old[name].get(metric), new[name].get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            flag = change > threshold
+            regressed = regressed or flag
+            rows.append((name, metric, before, after, change, flag))
+    return rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Percent slowdown that counts as a regression (default 10)')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline['kind'] != candidate['kind']:
+        parser.error(f"Cannot compare {baseline['kind']} results with {candidate['kind']} results")
+
+    rows, regressed = compare(baseline, candidate, args.threshold)
+    print(f"{baseline['commit']} -> {candidate['commit']} ({baseline['kind']})")
+    width = max((len(row[0]) for row in rows), default=10)
+    for name, metric, before, after, change, flag in rows:
+        print(f"{name:<{width}}  {metric:<6}  {before:>10.3f}  {after:>10.3f}  {change:>+7.1f}%"
+              f"{'  REGRESSION' if flag else ''}")
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Generate a reproducible data set for benchmarks.
+
+    python benchmarks/datagen.py --patients 10000 --appointments 100000 --records 50000
+
+Writes to DATABASE_URL (a temporary SQLite file by default). The same seed
+always produces the same rows. Appointments are spread over the doctors on a
+30-minute grid so they never trip the slot conflict check.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import common
+
+FIRST = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda',
+         'William', 'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica']
+LAST = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+        'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson']
+BLOOD_GROUPS = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-', None]
+STATUSES = ['scheduled'] * 6 + ['completed'] * 3 + ['cancelled']
+DIAGNOSES = ['Hypertension', 'Type 2 diabetes', 'Asthma', 'Influenza', 'Migraine', 'Back pain']
+FIRST_SLOT = datetime(2024, 1, 1, 9, 0)
+BATCH_SIZE = 5000
+
+
+def doctor_names(count):
+    return [f'Dr. {LAST[i % len(LAST)]} {i}' for i in range(count)]
+
+
+def patient_rows(count, rng):
+    for i in range(count):
+        yield {
+            'name': f'{rng.choice(FIRST)} {rng.choice(LAST)}',
+            'date_of_birth': date(1940, 1, 1) + timedelta(days=rng.randrange(365 * 80)),
+            'email': f'patient{i}@example.com',
+            'phone': f'555-{rng.randrange(10000):04d}',
+            'address': f'{rng.randrange(1, 9999)} Main St',
+            'blood_group': rng.choice(BLOOD_GROUPS)
+        }
+
+
+def appointment_rows(count, patients, doctors, rng):
+    for i in range(count):
+        # Doctor i % doctors gets every doctors-th appointment, one slot after the last
+        slot = i // len(doctors)
+        day, index = divmod(slot, 16)
+        yield {
+            'patient_id': rng.randrange(1, patients + 1),
+            'doctor_name': doctors[i % len(doctors)],
+            'appointment_datetime': FIRST_SLOT + timedelta(days=day, minutes=30 * index),
+            'status': rng.choice(STATUSES),
+            'reason': 'Follow-up visit'
+        }
+
+
+def record_rows(count, patients, doctors, rng):
+    for _ in range(count):
+        yield {
+            'patient_id': rng.randrange(1, patients + 1),
+            'diagnosis': rng.choice(DIAGNOSES),
+            'prescription': 'As directed',
+            'doctor_name': rng.choice(doctors),
+            'record_date': date(2020, 1, 1) + timedelta(days=rng.randrange(365 * 5))
+        }
+
+
+def _insert(db, model, rows):
+    from sqlalchemy import insert
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            db.session.execute(insert(model), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(model), batch)
+    db.session.commit()
+
+
+def generate(patients, appointments, records, doctors=50, seed=42):
+    """Replace the contents of the database in the current app context with a generated data set."""
+    from models import db, Patient, Appointment, MedicalRecord
+    from stats import rebuild_stats
+
+    rng = random.Random(seed)
+    names = doctor_names(doctors)
+    db.drop_all(bind_key=None)
+    db.create_all(bind_key=None)
+    if db.engine.dialect.name == 'sqlite':
+        # Lets the gunicorn workers of the load harness read while another writes
+        db.session.execute(db.text('PRAGMA journal_mode=WAL'))
+    _insert(db, Patient, patient_rows(patients, rng))
+    _insert(db, Appointment, appointment_rows(appointments, patients, names, rng))
+    _insert(db, MedicalRecord, record_rows(records, patients, names, rng))
+    # Core INSERTs skip the ORM events that maintain the summary tables
+    rebuild_stats()
+    return {'patients': patients, 'appointments': appointments, 'records': records,
+            'doctors': doctors, 'seed': seed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=10000)
+    parser.add_argument('--appointments', type=int, default=100000)
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--doctors', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = common.default_database_url()
+    from app import create_app
+    app = create_app('development')
+    with app.app_context():
+        started = time.perf_counter()
+        generate(args.patients, args.appointments, args.records, args.doctors, args.seed)
+        print(f"Generated {args.patients} patients, {args.appointments} appointments and "
+              f"{args.records} records in {time.perf_counter() - started:.1f}s "
+              f"at {os.environ['DATABASE_URL']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Load test create_app under gunicorn and report latency percentiles and RPS.
+
+    python benchmarks/load.py --workers 4 --concurrency 32 --duration 30
+    python benchmarks/load.py --server asgi --scenario list_patients
+
+Generates a data set (see datagen.py) in DATABASE_URL, a temporary SQLite
+file by default, starts gunicorn on a local port and drives it with
+keep-alive HTTP clients on --concurrency threads. Everything runs offline.
+Results are written to benchmarks/results/.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import quote
+
+import common
+
+
+def doctor_day_path(rng, data):
+    day = rng.randrange(1, 28)
+    return (f"/api/appointments?doctor_name={quote(rng.choice(data['doctors']))}"
+            f"&from=2024-01-{day:02d}&to=2024-01-{day + 1:02d}")
+
+
+# name: (weight, method, path factory, body factory)
+SCENARIOS = {
+    'get_patient': (30, 'GET', lambda rng, d: f"/api/patients/{rng.randrange(1, d['patients'] + 1)}", None),
+    'list_patients': (20, 'GET', lambda rng, d: '/api/patients?limit=50', None),
+    'list_appointments_doctor_day': (15, 'GET', lambda rng, d: doctor_day_path(rng, d), None),
+    'search_patients': (10, 'GET', lambda rng, d: f"/api/patients/search?q={rng.choice(['john', 'garcia', 'mary+smi'])}",
+                        None),
+    'doctor_availability': (10, 'GET', lambda rng, d: (
+        f"/api/doctors/{quote(rng.choice(d['doctors']))}/availability?date=2024-01-{rng.randrange(1, 29):02d}"),
+        None),
+    'stats': (5, 'GET', lambda rng, d: '/api/stats?from=2024-01-01&to=2024-01-08', None),
+    'create_patient': (10, 'POST', lambda rng, d: '/api/patients', lambda rng, d: {
+        'name': 'Load Patient',
+        'date_of_birth': '1980-01-01',
+        'email': f'load-{time.time_ns()}-{rng.random()}@example.com'
+    })
+}
+
+
+def wait_until_ready(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server on port {port} did not become ready within {timeout}s')
+
+
+def start_server(args, env):
+    if args.server == 'asgi':
+        target = ['-k', 'uvicorn.workers.UvicornWorker', 'asgi:create_asgi_app()']
+    else:
+        target = ['app:create_app()']
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{args.port}',
+               '--workers', str(args.workers), '--timeout', '120', *target]
+    log = open(os.path.join(tempfile.gettempdir(), 'healthcare-bench-gunicorn.log'), 'w')
+    process = subprocess.Popen(command, cwd=common.ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        wait_until_ready(args.port)
+    except RuntimeError:
+        process.kill()
+        raise
+    return process
+
+
+def send(connection, method, path, payload, headers):
+    """Send one request and read its response; return whether it succeeded."""
+    try:
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status < 400
+    except (OSError, http.client.HTTPException):
+        connection.close()
+        return False
+
+
+def drive(args, data, scenarios):
+    """Send requests from args.concurrency threads for args.duration seconds."""
+    names = list(scenarios)
+    weights = [scenarios[name][0] for name in names]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    stop_at = time.monotonic() + args.duration
+
+    def client(number):
+        rng = random.Random(args.seed + number)
+        connection = http.client.HTTPConnection('127.0.0.1', args.port, timeout=30)
+        local_latencies = defaultdict(list)
+        local_errors = defaultdict(int)
+        while time.monotonic() < stop_at:
+            name = rng.choices(names, weights)[0]
+            _, method, path, body = scenarios[name]
+            payload = json.dumps(body(rng, data)) if body else None
+            headers = {'Content-Type': 'application/json'} if payload else {}
+            started = time.perf_counter()
+            ok = send(connection, method, path(rng, data), payload, headers)
+            elapsed = time.perf_counter() - started
+            if ok:
+                local_latencies[name].append(elapsed)
+            else:
+                local_errors[name] += 1
+        connection.close()
+        with lock:
+            for name, values in local_latencies.items():
+                latencies[name].extend(values)
+            for name, count in local_errors.items():
+                errors[name] += count
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for name in names:
+        results[name] = {**common.summarize(latencies[name], elapsed), 'errors': errors[name]}
+    everything = [value for values in latencies.values() for value in values]
+    results['total'] = {**common.summarize(everything, elapsed), 'errors': sum(errors.values())}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi',
+                        help='gunicorn sync workers (wsgi) or uvicorn workers (asgi)')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Only run these scenarios (repeatable); default is a weighted mix of all')
+    parser.add_argument('--patients', type=int, default=10000)
+    parser.add_argument('--appointments', type=int, default=100000)
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--reuse', action='store_true', help='Keep the existing data set')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/load-<commit>-<time>.json)')
+    args = parser.parse_args()
+
+    # One client hammering the server is what the rate limiter exists to stop
+    env = {**os.environ, 'DATABASE_URL': common.default_database_url(), 'FLASK_ENV': 'production',
+           'RATELIMIT_BACKEND': os.environ.get('RATELIMIT_BACKEND', 'none')}
+    os.environ['DATABASE_URL'] = env['DATABASE_URL']
+    from app import create_app
+    from datagen import doctor_names, generate
+    from models import db, Patient
+
+    app = create_app('production')
+    with app.app_context():
+        if args.reuse:
+            data = {'patients': db.session.query(Patient.id).count(), 'doctors': 50}
+        else:
+            data = generate(args.patients, args.appointments, args.records)
+        db.engine.dispose()
+    doctors = doctor_names(data['doctors'])
+
+    scenarios = {name: SCENARIOS[name] for name in (args.scenario or SCENARIOS)}
+    server = start_server(args, env)
+    try:
+        results = drive(args, {**data, 'doctors': doctors}, scenarios)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+    config = {key: getattr(args, key) for key in ('server', 'workers', 'concurrency', 'duration')}
+    path = common.save_results('load', {'config': config, 'data': data, 'scenarios': results}, args.output)
+    width = max(len(name) for name in results)
+    for name, summary in results.items():
+        print(f"{name:<{width}}  n {summary['count']:>7}  p50 {summary['p50_ms']} ms  p95 {summary['p95_ms']} ms  "
+              f"p99 {summary['p99_ms']} ms  {summary['per_second']} req/s  errors {summary['errors']}")
+    print(f'Results written to {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""In-process microbenchmarks of serialization, list, create and bulk paths.
+
+    python benchmarks/micro.py --patients 10000 --appointments 100000
+
+Requests go through the Flask test client, so the numbers cover routing,
+queries and serialization but not the network or the WSGI server (see
+benchmarks/load.py for that). Results are written to benchmarks/results/.
+"""
+import argparse
+import itertools
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import common
+
+BULK_START = datetime(2030, 1, 1, 9, 0)
+
+
+def run(fn, iterations, warmup=5):
+    """Call fn iterations times after a warm-up and summarize the latencies."""
+    for i in range(warmup):
+        fn(-1 - i)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        begin = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - begin)
+    return common.summarize(latencies, time.perf_counter() - started)
+
+
+def checked(response, status=200):
+    assert response.status_code == status, (response.status_code, response.get_data(as_text=True)[:200])
+    response.close()
+    return response
+
+
+def serialization_benchmarks(rows):
+    """Per-row cost of to_dict on ORM objects against row_serializer on column tuples."""
+    from models import db, Appointment
+    appointments = Appointment.query.order_by(Appointment.id).limit(rows).all()
+    tuples = Appointment.query.order_by(Appointment.id).limit(rows) \
+        .with_entities(*Appointment.columns()).all()
+    serialize = Appointment.row_serializer()
+    results = {}
+    for name, fn in (('to_dict', lambda: [a.to_dict() for a in appointments]),
+                     ('row_serializer', lambda: [serialize(r) for r in tuples])):
+        summary = run(lambda _: fn(), 20)
+        summary['rows_per_second'] = round(len(appointments) / (summary['mean_ms'] / 1000))
+        results[f'serialize_{name}'] = summary
+    db.session.expunge_all()
+    return results
+
+
+def endpoint_benchmarks(client, data, iterations, rng):
+    from datagen import doctor_names
+    doctors = doctor_names(data['doctors'])
+    patients = data['patients']
+    unique = itertools.count()
+
+    def new_patient(i):
+        checked(client.post('/api/patients', json={
+            'name': 'Bench Patient',
+            'date_of_birth': '1980-01-01',
+            'email': f'bench{next(unique)}-{time.time_ns()}@example.com'
+        }), 201)
+
+    def new_appointment(i):
+        checked(client.post('/api/appointments', json={
+            'patient_id': rng.randrange(1, patients + 1),
+            'doctor_name': f'Dr. Bench {next(unique)}-{time.time_ns()}',
+            'appointment_datetime': '2030-01-01 09:00:00'
+        }), 201)
+
+    def bulk_appointments(i):
+        doctor = f'Dr. Bulk {next(unique)}-{time.time_ns()}'
+        checked(client.post('/api/appointments/bulk', json=[
+            {
+                'patient_id': rng.randrange(1, patients + 1),
+                'doctor_name': doctor,
+                'appointment_datetime': (BULK_START + timedelta(days=n // 16, minutes=30 * (n % 16)))
+                .strftime('%Y-%m-%d %H:%M:%S')
+            }
+            for n in range(500)
+        ]), 201)
+
+    cases = {
+        'get_patient': lambda i: checked(client.get(f'/api/patients/{rng.randrange(1, patients + 1)}')),
+        'list_patients': lambda i: checked(client.get('/api/patients?limit=100')),
+        'list_patients_include': lambda i: checked(
+            client.get('/api/patients?limit=50&include=appointments,records')),
+        'list_appointments_doctor_day': lambda i: checked(client.get(
+            f'/api/appointments?doctor_name={rng.choice(doctors)}&from=2024-01-02&to=2024-01-03')),
+        # GET /api/appointments is not paginated; this returns every appointment
+        'list_appointments_all': lambda i: checked(client.get('/api/appointments')),
+        'search_patients': lambda i: checked(client.get('/api/patients/search?q=john+smi')),
+        'doctor_availability': lambda i: checked(
+            client.get(f'/api/doctors/{rng.choice(doctors)}/availability?date=2024-01-02')),
+        'stats': lambda i: checked(client.get('/api/stats?from=2024-01-01&to=2024-01-08')),
+        'create_patient': new_patient,
+        'create_appointment': new_appointment
+    }
+    results = {name: run(fn, iterations) for name, fn in cases.items()}
+    summary = run(bulk_appointments, max(3, iterations // 20), warmup=1)
+    summary['rows_per_second'] = round(500 / (summary['mean_ms'] / 1000))
+    results['bulk_appointments_500'] = summary
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=10000)
+    parser.add_argument('--appointments', type=int, default=100000)
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--reuse', action='store_true', help='Keep the existing data set')
+    parser.add_argument('--output', help='Result file (default: benchmarks/results/micro-<commit>-<time>.json)')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = common.default_database_url()
+    os.environ.setdefault('RATELIMIT_BACKEND', 'none')
+    from app import create_app
+    from datagen import generate
+    from models import db, Patient
+
+    app = create_app('production')
+    with app.app_context():
+        if args.reuse:
+            data = {'patients': db.session.query(Patient.id).count(), 'doctors': 50}
+        else:
+            data = generate(args.patients, args.appointments, args.records)
+        results = {'data': data}
+        results.update(serialization_benchmarks(1000))
+        results.update(endpoint_benchmarks(app.test_client(), data, args.iterations, random.Random(7)))
+
+    path = common.save_results('micro', results, args.output)
+    width = max(len(name) for name in results)
+    for name, summary in results.items():
+        if name != 'data':
+            print(f"{name:<{width}}  p50 {summary['p50_ms']:>9} ms  p95 {summary['p95_ms']:>9} ms  "
+                  f"p99 {summary['p99_ms']:>9} ms  {summary['per_second']:>8}/s")
+    print(f'Results written to {path}')
+
+
+if __name__ == '__main__':
+    main()
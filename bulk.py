@@ -0,0 +1,202 @@
+import json
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert
+from models import db, Patient, Appointment, MedicalRecord
+from scheduling import check_slots
+from stats import record_inserts
+from archive import INCLUDE_DELETED
+from audit import audit_inserts
+
+
+class BulkRequestError(ValueError):
+    """Raised when a bulk request body cannot be used at all."""
+
+
+class BulkItemError(ValueError):
+    """Raised when a single item of a bulk request is invalid."""
+
+
+def parse_bulk_body(req):
+    """Return the items of a JSON array or NDJSON request body."""
+    if req.mimetype == 'application/x-ndjson':
+        items = []
+        for number, line in enumerate(req.get_data(as_text=True).splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                raise BulkRequestError(f'Invalid JSON on line {number}')
+    else:
+        items = req.get_json(silent=True)
+        if not isinstance(items, list):
+            raise BulkRequestError('Request body must be a JSON array or NDJSON')
+
+    if not items:
+        raise BulkRequestError('No items provided')
+    max_items = current_app.config['BULK_MAX_ITEMS']
+    if len(items) > max_items:
+        raise BulkRequestError(f'Too many items: {len(items)} (maximum {max_items})')
+    return items
+
+
+def _require(data, fields):
+    if not isinstance(data, dict):
+        raise BulkItemError('Item must be a JSON object')
+    for field in fields:
+        if field not in data:
+            raise BulkItemError(f'Missing required field: {field}')
+
+
+def _require_int(data, field):
+    if not isinstance(data[field], int) or isinstance(data[field], bool):
+        raise BulkItemError(f'{field} must be an integer')
+
+
+def _parse(value, field, fmt):
+    try:
+        return datetime.strptime(value, fmt)
+    except (TypeError, ValueError):
+        raise BulkItemError(f'Invalid {field}: expected format {fmt}')
+
+
+def validate_patient(data):
+    """Validate a patient payload and return its column values."""
+    _require(data, ['name', 'date_of_birth', 'email'])
+    return {
+        'name': data['name'],
+        'date_of_birth': _parse(data['date_of_birth'], 'date_of_birth', '%Y-%m-%d').date(),
+        'email': data['email'],
+        'phone': data.get('phone'),
+        'address': data.get('address'),
+        'blood_group': data.get('blood_group')
+    }
+
+
+def validate_appointment(data):
+    """Validate an appointment payload and return its column values."""
+    _require(data, ['patient_id', 'doctor_name', 'appointment_datetime'])
+    _require_int(data, 'patient_id')
+    return {
+        'patient_id': data['patient_id'],
+        'doctor_name': data['doctor_name'],
+        'appointment_datetime': _parse(
+            data['appointment_datetime'], 'appointment_datetime', '%Y-%m-%d %H:%M:%S'
+        ),
+        'status': data.get('status', 'scheduled'),
+        'reason': data.get('reason'),
+        'notes': data.get('notes')
+    }
+
+
+def validate_medical_record(data):
+    """Validate a medical record payload and return its column values."""
+    _require(data, ['patient_id', 'diagnosis', 'doctor_name'])
+    _require_int(data, 'patient_id')
+    if 'record_date' in data:
+        record_date = _parse(data['record_date'], 'record_date', '%Y-%m-%d').date()
+    else:
+        record_date = datetime.utcnow().date()
+    return {
+        'patient_id': data['patient_id'],
+        'diagnosis': data['diagnosis'],
+        'prescription': data.get('prescription'),
+        'doctor_name': data['doctor_name'],
+        'record_date': record_date,
+        'notes': data.get('notes')
+    }
+
+
+def _chunks(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _select_existing(column, values, batch_size, include_deleted=False):
+    """Return the subset of values present in column, one IN query per batch."""
+    found = set()
+    options = {INCLUDE_DELETED: include_deleted}
+    for chunk in _chunks(set(values), batch_size):
+        found.update(db.session.execute(db.select(column).where(column.in_(chunk)),
+                                        execution_options=options).scalars())
+    return found
+
+
+def check_patients(valid, batch_size):
+    """Reject emails that repeat within the batch or already exist."""
+    errors = {}
+    seen = set()
+    for index, values in valid:
+        if values['email'] in seen:
+            errors[index] = f"Duplicate email in request: {values['email']}"
+        seen.add(values['email'])
+    # Soft deleted patients' emails can be registered again
+    existing = _select_existing(Patient.email, seen, batch_size)
+    for index, values in valid:
+        if index not in errors and values['email'] in existing:
+            errors[index] = f"Email already exists: {values['email']}"
+    return errors
+
+
+def check_patient_refs(valid, batch_size):
+    """Reject items whose patient_id does not exist, using one lookup for the batch."""
+    existing = _select_existing(Patient.id, (v['patient_id'] for _, v in valid), batch_size)
+    return {
+        index: f"Patient not found: {values['patient_id']}"
+        for index, values in valid
+        if values['patient_id'] not in existing
+    }
+
+
+def check_appointments(valid, batch_size):
+    """Reject unknown patients, then bookings that overlap another appointment."""
+    errors = check_patient_refs(valid, batch_size)
+    errors.update(check_slots([(index, values) for index, values in valid if index not in errors]))
+    return errors
+
+
+BULK_MODELS = {
+    Patient: (validate_patient, check_patients),
+    Appointment: (validate_appointment, check_appointments),
+    MedicalRecord: (validate_medical_record, check_patient_refs)
+}
+
+
+def bulk_create(model, items):
+    """Validate items and insert the valid ones with multi-row INSERTs.
+
+    All valid rows are written in a single transaction. Returns one result
+    per input item, in input order.
+    """
+    validate, check = BULK_MODELS[model]
+    batch_size = current_app.config['BULK_BATCH_SIZE']
+
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, validate(item)))
+        except BulkItemError as e:
+            results[index] = {'index': index, 'success': False, 'error': str(e)}
+
+    if valid:
+        errors = check(valid, batch_size)
+        for index, error in errors.items():
+            results[index] = {'index': index, 'success': False, 'error': error}
+        valid = [(index, values) for index, values in valid if index not in errors]
+
+    if valid:
+        # Whole rows, so the audit log sees the column defaults too
+        stmt = insert(model).returning(*model.columns(), sort_by_parameter_order=True)
+        for chunk in _chunks(valid, batch_size):
+            rows = [values for _, values in chunk]
+            inserted = db.session.execute(stmt, rows).all()
+            record_inserts(model, rows)
+            audit_inserts(model, inserted)
+            for (index, _), row in zip(chunk, inserted):
+                results[index] = {'index': index, 'success': True, 'id': row.id}
+        db.session.commit()
+
+    return results
@@ -0,0 +1,148 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from itertools import combinations
+from flask import current_app
+
+
+class LRUCache:
+    """In-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache:
+    """Cache backend for any client exposing Redis' get/set/delete commands.
+
+    Values are stored as JSON so every worker and replica shares them.
+    """
+
+    def __init__(self, client, prefix='healthcare:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), ex=ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+
+class ResponseCache:
+    """Read-through cache for response bodies with hit/miss counters."""
+
+    def __init__(self, backend, ttl, enabled=True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_or_set(self, key, loader, version=None):
+        """Return the cached value for key, calling loader() on a miss.
+
+        version is the validator (ETag) just read from the database. An
+        entry stored under another version is a miss: invalidation only
+        reaches this worker's LRU, so a write through another worker would
+        otherwise leave a stale body served under the new ETag.
+        """
+        if not self.enabled:
+            return loader()
+        entry = self.backend.get(key)
+        if entry is not None and entry['version'] == version:
+            self.hits += 1
+            return entry['value']
+        self.misses += 1
+        value = loader()
+        self.backend.set(key, {'version': version, 'value': value}, self.ttl)
+        return value
+
+    def invalidate(self, *keys):
+        if self.enabled and keys:
+            self.invalidations += 1
+            self.backend.delete(*keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__ if self.enabled else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'invalidations': self.invalidations
+        }
+
+
+def patient_key(patient_id, include=()):
+    """Cache key for GET /api/patients/<id> with a given include set."""
+    suffix = ','.join(sorted(include)) or 'base'
+    return f'patient:{patient_id}:{suffix}'
+
+
+def patient_records_key(patient_id):
+    """Cache key for GET /api/patients/<id>/records."""
+    return f'patient:{patient_id}:records-list'
+
+
+def patient_keys(patient_id, includes):
+    """Every cache key that can hold data for one patient."""
+    keys = [patient_records_key(patient_id)]
+    for size in range(len(includes) + 1):
+        keys.extend(patient_key(patient_id, combo) for combo in combinations(includes, size))
+    return keys
+
+
+def init_cache(app):
+    """Create the response cache configured by CACHE_BACKEND."""
+    backend_name = app.config['CACHE_BACKEND']
+    if backend_name == 'redis':
+        # Optional dependency, only needed when the shared backend is used
+        import redis
+        backend = RedisCache(redis.Redis.from_url(app.config['CACHE_REDIS_URL']))
+    else:
+        backend = LRUCache(app.config['CACHE_MAX_ENTRIES'])
+    app.extensions['cache'] = ResponseCache(
+        backend, app.config['CACHE_TTL'], enabled=backend_name != 'none'
+    )
+    return app.extensions['cache']
+
+
+def get_cache():
+    return current_app.extensions['cache']
@@ -0,0 +1,79 @@
+from sqlalchemy import func, select
+from models import db, AuditLog
+from audit import AUDITED
+from archive import INCLUDE_DELETED
+from pagination import decode_cursor, encode_cursor, parse_limit
+
+# Change feed behind GET /api/changes, read from the audit log by feed_id:
+# a position audit.py assigns when the writing transaction commits, in
+# commit order, so no entry can appear behind a position a client has
+# already read. Soft deletes are logged as 'delete' entries, which become
+# tombstones. A token is the last feed position a client has seen.
+
+# Audit action -> what a client applies to its copy of the row
+CLIENT_ACTIONS = {'insert': 'create', 'restore': 'create', 'update': 'update', 'delete': 'delete'}
+
+
+def head_token():
+    """Token for the latest change, for clients starting from a full load."""
+    return encode_cursor(db.session.execute(select(func.coalesce(func.max(AuditLog.feed_id), 0))).scalar())
+
+
+def _current_rows(latest):
+    """Current, non-deleted row of each changed entity, as {(entity_type, id): dict}."""
+    rows = {}
+    by_type = {}
+    for entity_type, entity_id in latest:
+        by_type.setdefault(entity_type, []).append(entity_id)
+    for entity_type, ids in by_type.items():
+        model = AUDITED[entity_type]
+        # Soft deleted rows are selected too, to be told apart from missing ones below
+        found = db.session.execute(select(model).where(model.id.in_(ids)),
+                                   execution_options={INCLUDE_DELETED: True}).scalars()
+        for row in found:
+            if row.deleted_at is None:
+                rows[(entity_type, row.id)] = row.to_dict()
+    return rows
+
+
+def get_changes(since_token, args):
+    """Changes after since_token, at most one per entity, in commit order.
+
+    Each change carries the entity's current row, or ``data: null`` for a
+    tombstone (deleted, or moved to the archive tables). Returns a dict
+    ready to be merged into the response body.
+    """
+    since = decode_cursor(since_token)
+    limit = parse_limit(args)
+    # Fetch one extra entry to know whether another page is ready
+    fetched = db.session.execute(
+        select(AuditLog.feed_id, AuditLog.entity_type, AuditLog.entity_id, AuditLog.action, AuditLog.changed_at)
+        .where(AuditLog.feed_id > since).order_by(AuditLog.feed_id).limit(limit + 1)
+    ).all()
+    entries = fetched[:limit]
+    has_more = len(fetched) > limit
+    if not entries:
+        return {'data': [], 'next_token': since_token, 'has_more': has_more}
+
+    # Keep the last change of each entity; a create within the page stays a create
+    latest = {}
+    for entry in entries:
+        key = (entry.entity_type, entry.entity_id)
+        action = CLIENT_ACTIONS[entry.action]
+        if key in latest and latest[key]['action'] == 'create' and action == 'update':
+            action = 'create'
+        latest.pop(key, None)
+        latest[key] = {'action': action, 'changed_at': entry.changed_at.isoformat()}
+
+    rows = _current_rows(latest)
+    data = []
+    for (entity_type, entity_id), change in latest.items():
+        row = rows.get((entity_type, entity_id))
+        data.append({
+            'entity_type': entity_type,
+            'id': entity_id,
+            'action': change['action'] if row is not None else 'delete',
+            'changed_at': change['changed_at'],
+            'data': row
+        })
+    return {'data': data, 'next_token': encode_cursor(entries[-1].feed_id), 'has_more': has_more}
@@ -0,0 +1,123 @@
+"""gzip/brotli compression of responses, negotiated with Accept-Encoding.
+
+Buffered responses are compressed when they are at least COMPRESS_MIN_SIZE
+bytes. Streamed exports have no length up front and are always compressed,
+chunk by chunk as they are produced, so memory stays bounded.
+
+Brotli is used when the optional ``brotli`` package is installed and the
+client prefers it; gzip otherwise.
+"""
+import zlib
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# gzip framing for zlib
+GZIP_WBITS = 31
+
+
+def parse_route_levels(value):
+    """Parse "GET /api/appointments/export=1,GET /api/patients=9" into {(method, rule): level}.
+
+    Level 0 turns compression off for the route.
+    """
+    levels = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        route, _, level = item.rpartition('=')
+        method, _, rule = route.strip().partition(' ')
+        if not rule or not level.strip().isdigit() or int(level) > 9:
+            raise ValueError(f'Invalid route compression level {item!r}: expected "METHOD /rule=<0-9>"')
+        levels[(method.upper(), rule.strip())] = int(level)
+    return levels
+
+
+def encodings():
+    """Encodings this process can produce, most preferred first."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, level):
+        # Brotli qualities run 0-11; 1-9 cover the same speed/size trade-off as gzip's
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+ENCODERS = {'gzip': GzipEncoder, 'br': BrotliEncoder}
+
+
+def _encoded(iterable, encoder):
+    """Compress a streamed body chunk by chunk."""
+    try:
+        for chunk in iterable:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            data = encoder.compress(chunk)
+            if data:
+                yield data
+        yield encoder.finish()
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+
+def _level(app):
+    rule = request.url_rule.rule if request.url_rule is not None else None
+    return app.extensions['compression'].get((request.method, rule), app.config['COMPRESS_LEVEL'])
+
+
+def compress_response(response):
+    """Compress response in place if the client accepts it and it is worth it."""
+    app = current_app
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.mimetype not in app.config['COMPRESS_MIMETYPES']
+            or 'Content-Encoding' in response.headers or response.direct_passthrough):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    level = _level(app)
+    if not level or (not response.is_streamed and response.content_length < app.config['COMPRESS_MIN_SIZE']):
+        return response
+    encoding = request.accept_encodings.best_match(encodings())
+    if encoding is None:
+        return response
+
+    encoder = ENCODERS[encoding](level)
+    if response.is_streamed:
+        response.response = _encoded(response.response, encoder)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(encoder.compress(response.get_data()) + encoder.finish())
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    """Compress the responses of app (COMPRESS_* settings)."""
+    app.extensions['compression'] = parse_route_levels(app.config['COMPRESS_ROUTES'])
+    if app.config['COMPRESS_ENABLED']:
+        app.after_request(compress_response)
+    return app.extensions['compression']
@@ -0,0 +1,58 @@
+import hashlib
+from datetime import timezone
+from flask import Response, request
+from sqlalchemy import func
+from models import db
+
+
+def compute_etag(*parts):
+    """Hash the validator parts (timestamps, counts, request variant) into an ETag."""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def collection_fingerprint(query, model):
+    """Return (count, max(updated_at), max(id)) for the rows matched by query.
+
+    Runs a single aggregate query; max(id) catches a delete that is offset by
+    an older row moving into a windowed result.
+    """
+    return tuple(query.order_by(None).with_entities(
+        func.count(model.id), func.max(model.updated_at), func.max(model.id)
+    ).one())
+
+
+def window_fingerprint(window, model):
+    """Like collection_fingerprint, for a query that already has LIMIT/OFFSET."""
+    subquery = window.with_entities(model.id, model.updated_at).subquery()
+    return tuple(db.session.query(
+        func.count(subquery.c.id), func.max(subquery.c.updated_at), func.max(subquery.c.id)
+    ).one())
+
+
+def _as_utc(value):
+    return value.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def not_modified(etag, last_modified=None):
+    """Return a 304 response when the request's validators still match.
+
+    If-None-Match takes precedence over If-Modified-Since, as in RFC 9110.
+    """
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)
+    elif last_modified and request.if_modified_since:
+        matched = _as_utc(last_modified) <= request.if_modified_since
+    else:
+        matched = False
+    if not matched:
+        return None
+    return add_validators(Response(status=304), etag, last_modified)
+
+
+def add_validators(response, etag, last_modified=None):
+    """Attach ETag, Last-Modified and a revalidation Cache-Control header."""
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = _as_utc(last_modified)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,75 @@
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.wait_count += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def recreate(self):
+        # Keep the instrumentation when the pool is rebuilt (e.g. engine.dispose())
+        new_pool = super().recreate()
+        with self._stats_lock:
+            new_pool.wait_count = self.wait_count
+            new_pool.wait_total = self.wait_total
+            new_pool.wait_max = self.wait_max
+            new_pool.timeouts = self.timeouts
+        return new_pool
+
+
+def configure_pool(app):
+    """Use InstrumentedQueuePool for any engine that would get a QueuePool."""
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if 'pool_size' in options:
+        options.setdefault('poolclass', InstrumentedQueuePool)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def pool_stats(engine):
+    """Current connection counts and checkout wait times for engine's pool."""
+    pool = engine.pool
+    stats = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            # overflow() is negative while the pool has not filled up yet
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout()
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._stats_lock:
+            stats.update({
+                'checkouts': pool.wait_count,
+                'wait_seconds_total': round(pool.wait_total, 6),
+                'wait_seconds_avg': round(pool.wait_total / pool.wait_count, 6) if pool.wait_count else 0.0,
+                'wait_seconds_max': round(pool.wait_max, 6),
+                'timeouts': pool.timeouts
+            })
+    return stats
@@ -0,0 +1,256 @@
+import csv
+import io
+import queue
+import threading
+from flask import Response, current_app, stream_with_context
+from sqlalchemy import select
+from models import (db, Patient, Appointment, MedicalRecord, AppointmentArchive,
+                    MedicalRecordArchive)
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class ExportError(ValueError):
+    """Raised when export parameters are invalid."""
+
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json'
+}
+
+
+def _iter_documents(query, model, batch_size):
+    """Yield each row of query as encoded JSON, reading batch_size rows at a time."""
+    # yield_per enables stream_results, so the driver does not buffer the
+    # whole result set; selecting column tuples skips ORM hydration.
+    serialize = model.row_serializer()
+    dumps = current_app.json.dumps_bytes
+    for row in query.with_entities(*model.columns()).yield_per(batch_size):
+        yield dumps(serialize(row))
+
+
+def generate_ndjson(query, model, batch_size):
+    """Yield one JSON document per line, flushed in batches."""
+    chunk = []
+    for document in _iter_documents(query, model, batch_size):
+        chunk.append(document)
+        if len(chunk) >= batch_size:
+            yield b'\n'.join(chunk) + b'\n'
+            chunk = []
+    if chunk:
+        yield b'\n'.join(chunk) + b'\n'
+
+
+def generate_json_array(query, model, batch_size):
+    """Yield a single JSON array incrementally."""
+    yield b'['
+    first = True
+    chunk = []
+    for document in _iter_documents(query, model, batch_size):
+        chunk.append(document)
+        if len(chunk) >= batch_size:
+            yield (b'' if first else b',') + b','.join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield (b'' if first else b',') + b','.join(chunk)
+    yield b']\n'
+
+
+def stream_export(query, model, fmt='ndjson', filename=None):
+    """Build a streaming response that exports every row of query.
+
+    Rows are read with a server-side cursor and written as they arrive, so
+    memory use is bounded by the batch size rather than the table size.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(
+            f"Unsupported format: {fmt}. Use one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    generator = generate_ndjson if fmt == 'ndjson' else generate_json_array
+    response = Response(
+        stream_with_context(generator(query, model, batch_size)),
+        mimetype=EXPORT_FORMATS[fmt]
+    )
+    if filename:
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}.{fmt}'
+    return response
+
+
+# Tables served by GET /api/export/<table>
+EXPORT_TABLES = {
+    model.__tablename__: model
+    for model in (Patient, Appointment, MedicalRecord, AppointmentArchive, MedicalRecordArchive)
+}
+
+TABLE_FORMATS = {
+    'csv': 'text/csv',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+# Bytes of COPY output handed to the response at a time
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def table_select(model, updated_since=None):
+    """Every row of model's table, soft deleted ones included, optionally only those updated since."""
+    table = model.__table__
+    stmt = select(*table.columns).order_by(table.c.id)
+    if updated_since is not None:
+        stmt = stmt.where(table.c.updated_at >= updated_since)
+    return stmt
+
+
+def generate_csv(stmt, batch_size):
+    """Yield stmt's rows as CSV with a header line, batch_size rows per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(column.name for column in stmt.selected_columns)
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _arrow_type(column_type):
+    if isinstance(column_type, db.Integer):
+        return pyarrow.int64()
+    if isinstance(column_type, db.DateTime):
+        return pyarrow.timestamp('us')
+    if isinstance(column_type, db.Date):
+        return pyarrow.date32()
+    return pyarrow.string()
+
+
+def generate_arrow(stmt, batch_size):
+    """Yield stmt's rows as an Arrow IPC stream, one record batch per batch_size rows."""
+    schema = pyarrow.schema([(column.name, _arrow_type(column.type)) for column in stmt.selected_columns])
+    sink = io.BytesIO()
+    writer = pyarrow.ipc.new_stream(sink, schema)
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        columns = zip(*rows)
+        writer.write_batch(pyarrow.record_batch(
+            [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        ))
+        yield drain()
+    writer.close()
+    yield drain()
+
+
+class _CopySink:
+    """File object for psycopg2's copy_expert that hands its output to a generator.
+
+    The queue is bounded, so a slow client slows the COPY down instead of
+    the output piling up in memory.
+    """
+
+    def __init__(self, maxsize=8):
+        self.queue = queue.Queue(maxsize)
+        self.buffer = bytearray()
+        self.closed = False
+
+    def write(self, data):
+        if self.closed:
+            # Raised inside copy_expert, which aborts the COPY
+            raise IOError('export client went away')
+        self.buffer += data.encode() if isinstance(data, str) else data
+        if len(self.buffer) >= COPY_CHUNK_SIZE:
+            self.queue.put(bytes(self.buffer))
+            self.buffer.clear()
+
+    def finish(self, error=None):
+        if not self.closed:
+            if self.buffer and error is None:
+                self.queue.put(bytes(self.buffer))
+            self.queue.put(error or StopIteration)
+
+    def close(self):
+        self.closed = True
+        # Unblock a pending write, which then sees closed
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+
+def generate_copy_csv(engine, stmt):
+    """Yield stmt's rows as CSV produced by PostgreSQL's COPY ... TO STDOUT.
+
+    The COPY runs on its own connection in a worker thread, since
+    copy_expert only returns once the whole result has been written.
+    """
+    compiled = stmt.compile(dialect=engine.dialect)
+    sink = _CopySink()
+
+    def run():
+        connection = engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            query = cursor.mogrify(str(compiled), compiled.params).decode()
+            cursor.copy_expert(f'COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)', sink)
+            cursor.close()
+            connection.rollback()
+            sink.finish()
+        except Exception as e:
+            sink.finish(e)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run, name='export-copy', daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = sink.queue.get()
+            if chunk is StopIteration:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        sink.close()
+        thread.join(timeout=5)
+
+
+def export_table(table_name, fmt='csv', updated_since=None):
+    """Build a streaming response with every row of table_name as CSV or Arrow.
+
+    CSV from PostgreSQL (psycopg2) is produced by COPY, skipping per-row
+    Python work entirely; other databases and Arrow read the rows with a
+    server-side cursor, EXPORT_BATCH_SIZE at a time. Returns None for an
+    unknown table.
+    """
+    model = EXPORT_TABLES.get(table_name)
+    if model is None:
+        return None
+    if fmt not in TABLE_FORMATS:
+        raise ExportError(f"Unsupported format: {fmt}. Use one of: {', '.join(TABLE_FORMATS)}")
+    if fmt == 'arrow' and pyarrow is None:
+        raise ExportError('Arrow export is not available: the pyarrow package is not installed')
+
+    stmt = table_select(model, updated_since)
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    engine = db.session.get_bind(mapper=model.__mapper__)
+    if fmt == 'arrow':
+        body = stream_with_context(generate_arrow(stmt, batch_size))
+    elif engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg2':
+        body = generate_copy_csv(engine, stmt)
+    else:
+        body = stream_with_context(generate_csv(stmt, batch_size))
+    response = Response(body, mimetype=TABLE_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={table_name}.{fmt}'
+    return response
@@ -0,0 +1,46 @@
+from datetime import datetime
+from models import Appointment
+
+
+class FilterError(ValueError):
+    """Raised when a list filter parameter is invalid."""
+
+
+def parse_datetime_param(args, name):
+    """Parse an ISO date or datetime query parameter, or return None."""
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise FilterError(f'{name} must be an ISO date or datetime, e.g. 2024-12-01 or 2024-12-01 10:00:00')
+
+
+def filter_appointments(query, args, model=Appointment):
+    """Apply the appointment list filters from the request arguments.
+
+    ``from`` is inclusive and ``to`` is exclusive. Every filter combined with
+    the datetime range maps onto one of the composite indexes declared on
+    Appointment. model may be AppointmentArchive to filter archived rows.
+    """
+    if args.get('doctor_name'):
+        query = query.filter(model.doctor_name == args['doctor_name'])
+    if args.get('status'):
+        query = query.filter(model.status == args['status'])
+    if args.get('patient_id'):
+        try:
+            patient_id = int(args['patient_id'])
+        except ValueError:
+            raise FilterError('patient_id must be an integer')
+        query = query.filter(model.patient_id == patient_id)
+
+    start = parse_datetime_param(args, 'from')
+    end = parse_datetime_param(args, 'to')
+    if start and end and start >= end:
+        raise FilterError('from must be earlier than to')
+    if start:
+        query = query.filter(model.appointment_datetime >= start)
+    if end:
+        query = query.filter(model.appointment_datetime < end)
+    return query
@@ -0,0 +1,28 @@
+"""Gunicorn settings, loaded automatically from the working directory.
+
+Command-line options (see the Dockerfile CMD) take precedence over these.
+"""
+import glob
+import os
+
+# Threaded workers, so a change stream (GET /api/changes/stream) holds one
+# thread rather than a whole worker. The app reads the same variable as
+# SERVER_THREADS and keeps a thread free for other requests.
+if os.environ.get('GUNICORN_THREADS'):
+    worker_class = 'gthread'
+    threads = int(os.environ['GUNICORN_THREADS'])
+
+
+def on_starting(server):
+    # Metric files of workers from a previous run would be summed in forever
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -14,8 +14,42 @@ export const healthAPI = {
     checkReadiness: () => api.get('/ready'),
 };
 
+// GET /api/patients returns one page (default 50 rows) and a next_cursor while
+// more remain; getAll follows the cursors and resolves with every patient in a
+// single response-shaped object, as callers expect.
+const PATIENTS_PAGE_SIZE = 500;
+const MAX_RETRIES = 5;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Back-to-back pages can exhaust the rate limit; wait out each 429 for the
+// server's Retry-After before asking again.
+const getWithRetry = async (url, config) => {
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await api.get(url, config);
+        } catch (error) {
+            if (error.response?.status !== 429 || attempt === MAX_RETRIES) throw error;
+            await sleep((Number(error.response.headers['retry-after']) || 1) * 1000);
+        }
+    }
+};
+
+const getAllPatients = async () => {
+    const data = [];
+    let cursor;
+    let response;
+    do {
+        response = await getWithRetry('/api/patients', { params: { limit: PATIENTS_PAGE_SIZE, cursor } });
+        data.push(...(response.data.data || []));
+        cursor = response.data.next_cursor;
+    } while (cursor);
+    return { ...response, data: { ...response.data, data, count: data.length, next_cursor: null } };
+};
+
 export const patientsAPI = {
-    getAll: () => api.get('/api/patients'),
+    getAll: getAllPatients,
+    getPage: (params) => api.get('/api/patients', { params }),
     getById: (id) => api.get(`/api/patients/${id}`),
     create: (data) => api.post('/api/patients', data),
     update: (id, data) => api.put(`/api/patients/${id}`, data),
@@ -35,4 +69,20 @@ export const recordsAPI = {
     delete: (id) => api.delete(`/api/records/${id}`),
 };
 
+// Pass the previous next_token to receive only what changed since; call
+// without a token before a full load to get the token to start from.
+export const changesAPI = {
+    since: (token, limit) => api.get('/api/changes', { params: { since: token, limit } }),
+    // Calls onChanges with each list of changes pushed by the server; returns the
+    // EventSource, which reconnects on its own. Close it to stop.
+    subscribe: (onChanges, { since, entityTypes } = {}) => {
+        const params = new URLSearchParams();
+        if (since) params.set('since', since);
+        if (entityTypes) params.set('entity_type', entityTypes.join(','));
+        const source = new EventSource(`${API_BASE_URL}/api/changes/stream?${params}`);
+        source.addEventListener('changes', (event) => onChanges(JSON.parse(event.data), event.lastEventId));
+        return source;
+    },
+};
+
 export default api;
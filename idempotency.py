@@ -0,0 +1,145 @@
+"""Idempotency-Key support for POST endpoints.
+
+The first request with a given key claims it by inserting an
+idempotency_key row; its response is then stored on that row. Retries with
+the same key get the stored response back without running the view again,
+so a retry storm costs one indexed lookup per request instead of a write.
+A retry that arrives while the first request is still running gets 409.
+"""
+import functools
+import hashlib
+import logging
+from datetime import datetime, timedelta
+import click
+from flask import current_app, jsonify, make_response, request
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db, IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def _fingerprint():
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.full_path.encode(), request.get_data()):
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _error(message, status):
+    return jsonify({'success': False, 'error': message}), status
+
+
+def _find(key, now):
+    return db.session.execute(
+        select(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.expires_at > now)
+    ).scalar_one_or_none()
+
+
+def _claim(key, fingerprint):
+    """Insert the claim for key; returns None when claimed, else the row already holding it."""
+    now = datetime.utcnow()
+    existing = _find(key, now)
+    if existing is not None:
+        return existing
+    try:
+        # An expired claim or response gives the key up
+        db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key,
+                                                        IdempotencyKey.expires_at <= now))
+        timeout = timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_TIMEOUT'])
+        db.session.add(IdempotencyKey(key=key, fingerprint=fingerprint, created_at=now,
+                                      expires_at=now + timeout))
+        db.session.commit()
+        return None
+    except IntegrityError:
+        # Another request claimed it first
+        db.session.rollback()
+        return _find(key, now)
+
+
+def _finish(key, response):
+    """Store response on the claim, or give the key up if the request failed."""
+    table = IdempotencyKey.__table__
+    try:
+        if response is None or response.status_code >= 500:
+            db.session.execute(delete(table).where(table.c.key == key))
+        else:
+            ttl = timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+            db.session.execute(update(table).where(table.c.key == key).values(
+                status_code=response.status_code, mimetype=response.mimetype,
+                body=response.get_data(), expires_at=datetime.utcnow() + ttl
+            ))
+        db.session.commit()
+    except Exception as e:
+        # The claim then lapses after IDEMPOTENCY_LOCK_TIMEOUT
+        db.session.rollback()
+        logger.error(f"Error storing response for idempotency key {key}: {str(e)}")
+
+
+def _replay(stored):
+    response = current_app.response_class(stored.body, status=stored.status_code, mimetype=stored.mimetype)
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(view):
+    """Run view once per Idempotency-Key and replay its response to retries.
+
+    Requests without the header are not affected. 5xx responses are not
+    stored, so the client may retry them with the same key.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return _error(f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters', 400)
+
+        fingerprint = _fingerprint()
+        try:
+            existing = _claim(key, fingerprint)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error claiming idempotency key {key}: {str(e)}")
+            return _error(str(e), 503)
+        if existing is not None:
+            if existing.fingerprint != fingerprint:
+                return _error(f'{HEADER} was already used for a different request', 422)
+            if existing.status_code is None:
+                return _error(f'A request with this {HEADER} is still in progress', 409)
+            return _replay(existing)
+
+        response = None
+        try:
+            response = make_response(view(*args, **kwargs))
+            return response
+        finally:
+            _finish(key, response)
+    return wrapper
+
+
+def purge_expired(now=None):
+    """Delete expired keys; returns the number deleted."""
+    result = db.session.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.expires_at <= (now or datetime.utcnow()))
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def init_idempotency(app):
+    """Register the ``flask idempotency purge`` command."""
+    @app.cli.group('idempotency')
+    def idempotency_cli():
+        """Manage stored Idempotency-Key responses."""
+
+    @idempotency_cli.command('purge')
+    def purge_command():
+        """Delete keys older than IDEMPOTENCY_TTL."""
+        click.echo(f'{purge_expired()} expired idempotency keys deleted')
@@ -0,0 +1,54 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised when orjson is not installed
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that uses orjson when it is installed.
+
+    Falls back to the stdlib-based DefaultJSONProvider otherwise, and for
+    any json.dumps keyword orjson has no equivalent for. Dates and datetimes
+    are still handed to ``default`` so both paths produce identical output.
+    Keys are emitted in insertion order; sorting every dict is the single
+    most expensive option of the stdlib encoder.
+    """
+
+    sort_keys = False
+    ensure_ascii = False
+
+    def _orjson_options(self, indent=None):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj, indent=None):
+        """Serialize obj straight to UTF-8 bytes."""
+        if orjson is None:
+            kwargs = {'indent': indent} if indent else {'separators': (',', ':')}
+            return self.dumps(obj, **kwargs).encode('utf-8')
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options(indent))
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj, kwargs.get('indent')).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        return self._app.response_class(
+            self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype
+        )
+
+
+def backend_name():
+    return 'orjson' if orjson is not None else 'json'
@@ -0,0 +1,132 @@
+"""Prometheus metrics for HTTP requests and the SQL they run.
+
+With several gunicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory shared by the workers (see gunicorn.conf.py); /metrics then reports
+the sum over all live workers instead of whichever worker answered. The
+directory is created if missing, since other entry points in the image
+(uvicorn, flask commands) see the same variable without gunicorn's hooks.
+"""
+import logging
+import os
+import time
+from flask import Response, current_app, g, has_app_context, has_request_context, request
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram,
+                               REGISTRY, generate_latest, multiprocess)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to produce the full response body',
+    ['method', 'route', 'status']
+)
+REQUEST_SIZE = Histogram(
+    'http_request_size_bytes', 'Request body size', ['method', 'route'], buckets=SIZE_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Response body size', ['method', 'route'], buckets=SIZE_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL statements executed per request', ['method', 'route'],
+    buckets=COUNT_BUCKETS
+)
+REQUEST_QUERY_TIME = Histogram(
+    'http_request_db_duration_seconds', 'Total SQL execution time per request', ['method', 'route']
+)
+SLOW_QUERIES = Counter(
+    'db_slow_queries_total', 'SQL statements slower than SLOW_QUERY_THRESHOLD_MS', ['route']
+)
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    route = None
+    if has_request_context() and 'request_metrics' in g:
+        g.request_metrics['queries'] += 1
+        g.request_metrics['query_seconds'] += elapsed
+        route = g.request_metrics['route']
+    threshold = current_app.config['SLOW_QUERY_THRESHOLD_MS'] if has_app_context() else 0
+    if threshold and elapsed * 1000 >= threshold:
+        SLOW_QUERIES.labels(route or 'none').inc()
+        logger.warning(f"Slow query ({elapsed * 1000:.1f} ms) on {route or 'no request'}: "
+                       f"{' '.join(statement.split())[:1000]}")
+
+
+def _counted(iterable, stats):
+    """Pass a streamed body through while counting its bytes."""
+    try:
+        for chunk in iterable:
+            stats['response_bytes'] += len(chunk)
+            yield chunk
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+
+def _observe(stats):
+    labels = (stats['method'], stats['route'])
+    REQUEST_LATENCY.labels(*labels, stats['status']).observe(time.perf_counter() - stats['start'])
+    REQUEST_SIZE.labels(*labels).observe(stats['request_bytes'])
+    RESPONSE_SIZE.labels(*labels).observe(stats['response_bytes'])
+    REQUEST_QUERIES.labels(*labels).observe(stats['queries'])
+    REQUEST_QUERY_TIME.labels(*labels).observe(stats['query_seconds'])
+
+
+def metrics_response():
+    """Current metrics in the Prometheus text format."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    """Time every request of app and serve the results at /metrics."""
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        # Metric values are written there, and /metrics reads it, from now on
+        os.makedirs(directory, exist_ok=True)
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_metrics = {
+            'start': time.perf_counter(),
+            'method': request.method,
+            'route': _route(),
+            'request_bytes': request.content_length or 0,
+            'queries': 0,
+            'query_seconds': 0.0
+        }
+
+    @app.after_request
+    def finish_request_metrics(response):
+        stats = g.get('request_metrics')
+        if stats is None:
+            return response
+        stats['status'] = str(response.status_code)
+        if response.is_streamed:
+            # Streamed bodies run queries and produce bytes after this hook
+            stats['response_bytes'] = 0
+            response.response = _counted(response.response, stats)
+        else:
+            stats['response_bytes'] = response.content_length or 0
+        response.call_on_close(lambda: _observe(stats))
+        return response
+
+    app.add_url_rule('/metrics', 'metrics', metrics_response)
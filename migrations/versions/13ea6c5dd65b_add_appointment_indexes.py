@@ -0,0 +1,41 @@
+"""add appointment indexes
+
+Revision ID: 13ea6c5dd65b
+Revises: 2b681c23b5fd
+Create Date: 2026-10-18 03:03:43.556128
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '13ea6c5dd65b'
+down_revision = '2b681c23b5fd'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_appointment_doctor_datetime', ['doctor_name', 'appointment_datetime']),
+    ('ix_appointment_patient_datetime', ['patient_id', 'appointment_datetime']),
+    ('ix_appointment_status_datetime', ['status', 'appointment_datetime']),
+]
+
+
+def upgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        # Build the indexes without taking a write lock on the table
+        with op.get_context().autocommit_block():
+            for name, columns in INDEXES:
+                op.create_index(name, 'appointment', columns, unique=False,
+                                postgresql_concurrently=True, if_not_exists=True)
+        return
+
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        for name, columns in INDEXES:
+            batch_op.create_index(name, columns, unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        for name, _ in reversed(INDEXES):
+            batch_op.drop_index(name)
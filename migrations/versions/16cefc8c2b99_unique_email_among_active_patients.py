@@ -0,0 +1,56 @@
+"""unique email among active patients
+
+Revision ID: 16cefc8c2b99
+Revises: e0b5807730ae
+Create Date: 2026-10-18 04:20:11.402813
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '16cefc8c2b99'
+down_revision = 'e0b5807730ae'
+branch_labels = None
+depends_on = None
+
+# Names the initial schema's unnamed UNIQUE (email) on SQLite, so batch mode can drop it
+NAMING_CONVENTION = {'uq': 'uq_%(table_name)s_%(column_0_name)s'}
+
+
+def _recreate_search_triggers():
+    # Batch mode rebuilds the patient table, which drops the triggers on it
+    from search import SQLITE_SEARCH_DDL
+    for statement in SQLITE_SEARCH_DDL[1:]:
+        op.execute(statement)
+
+
+def upgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        # Build the index without taking a write lock on the table
+        with op.get_context().autocommit_block():
+            op.create_index('ix_patient_email_active', 'patient', ['email'], unique=True,
+                            postgresql_where=sa.text('deleted_at IS NULL'),
+                            postgresql_concurrently=True, if_not_exists=True)
+        op.execute('ALTER TABLE patient DROP CONSTRAINT IF EXISTS patient_email_key')
+        return
+
+    with op.batch_alter_table('patient', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint('uq_patient_email', type_='unique')
+        batch_op.create_index('ix_patient_email_active', ['email'], unique=True,
+                              sqlite_where=sa.text('deleted_at IS NULL'))
+    _recreate_search_triggers()
+
+
+def downgrade():
+    # Fails if an email was registered again after its patient was deleted
+    if op.get_context().dialect.name == 'postgresql':
+        op.create_unique_constraint('patient_email_key', 'patient', ['email'])
+        op.drop_index('ix_patient_email_active', table_name='patient')
+        return
+
+    with op.batch_alter_table('patient', schema=None) as batch_op:
+        batch_op.drop_index('ix_patient_email_active')
+        batch_op.create_unique_constraint('uq_patient_email', ['email'])
+    _recreate_search_triggers()
@@ -0,0 +1,40 @@
+"""add audit log feed_id
+
+Revision ID: 20c2918be8f8
+Revises: 16cefc8c2b99
+Create Date: 2026-10-18 04:12:37.220541
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20c2918be8f8'
+down_revision = '16cefc8c2b99'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('feed_id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'),
+                                      nullable=True))
+    # Change feed tokens handed out so far are audit ids, so they stay valid
+    op.execute('UPDATE audit_log SET feed_id = id')
+
+    if op.get_context().dialect.name == 'postgresql':
+        # Build the index without taking a write lock on the table
+        with op.get_context().autocommit_block():
+            op.create_index('ix_audit_log_feed_id', 'audit_log', ['feed_id'], unique=True,
+                            postgresql_concurrently=True, if_not_exists=True)
+        return
+
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.create_index('ix_audit_log_feed_id', ['feed_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_log_feed_id')
+        batch_op.drop_column('feed_id')
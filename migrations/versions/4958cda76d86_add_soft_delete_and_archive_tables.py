@@ -0,0 +1,163 @@
+"""add soft delete and archive tables
+
+Revision ID: 4958cda76d86
+Revises: 4eb5d81664ac
+Create Date: 2026-10-18 03:38:14.633339
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4958cda76d86'
+down_revision = '4eb5d81664ac'
+branch_labels = None
+depends_on = None
+
+# Slot check triggers that skip soft deleted appointments, as of this revision
+SQLITE_DDL = [
+    f"""CREATE TRIGGER IF NOT EXISTS appointment_slot_check_{event_name.lower()}
+    BEFORE {event_name} ON appointment
+    WHEN COALESCE(new.status, '') <> 'cancelled' AND new.deleted_at IS NULL
+    BEGIN
+        SELECT RAISE(ABORT, 'appointment slot conflict') WHERE EXISTS (
+            SELECT 1 FROM appointment
+            WHERE doctor_name = new.doctor_name
+              AND appointment_datetime > strftime('%Y-%m-%d %H:%M:%S', new.appointment_datetime,
+                                                  '-30 minutes') || substr(new.appointment_datetime, 20)
+              AND appointment_datetime < strftime('%Y-%m-%d %H:%M:%S', new.appointment_datetime,
+                                                  '+30 minutes') || substr(new.appointment_datetime, 20)
+              AND COALESCE(status, '') <> 'cancelled'
+              AND deleted_at IS NULL
+              AND id IS NOT new.id
+        );
+    END"""
+    for event_name in ('INSERT', 'UPDATE')
+]
+
+POSTGRESQL_DDL = [
+    """CREATE OR REPLACE FUNCTION appointment_slot_check() RETURNS trigger AS $$
+    BEGIN
+        IF COALESCE(NEW.status, '') = 'cancelled' OR NEW.deleted_at IS NOT NULL THEN
+            RETURN NEW;
+        END IF;
+        -- Serialize bookings per doctor so two transactions cannot both pass the check
+        PERFORM pg_advisory_xact_lock(hashtext('appointment:' || NEW.doctor_name));
+        IF EXISTS (
+            SELECT 1 FROM appointment
+            WHERE doctor_name = NEW.doctor_name
+              AND appointment_datetime > NEW.appointment_datetime - interval '30 minutes'
+              AND appointment_datetime < NEW.appointment_datetime + interval '30 minutes'
+              AND COALESCE(status, '') <> 'cancelled'
+              AND deleted_at IS NULL
+              AND id <> NEW.id
+        ) THEN
+            RAISE EXCEPTION 'appointment slot conflict' USING ERRCODE = 'exclusion_violation';
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE TRIGGER appointment_slot_check
+    BEFORE INSERT OR UPDATE OF doctor_name, appointment_datetime, status, deleted_at ON appointment
+    FOR EACH ROW EXECUTE FUNCTION appointment_slot_check()"""
+]
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('appointment_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('patient_id', sa.Integer(), nullable=False),
+    sa.Column('doctor_name', sa.String(length=100), nullable=False),
+    sa.Column('appointment_datetime', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('reason', sa.Text(), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['patient_id'], ['patient.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('appointment_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_appointment_archive_doctor_datetime', ['doctor_name', 'appointment_datetime'], unique=False)
+        batch_op.create_index('ix_appointment_archive_patient_datetime', ['patient_id', 'appointment_datetime'], unique=False)
+
+    op.create_table('medical_record_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('patient_id', sa.Integer(), nullable=False),
+    sa.Column('diagnosis', sa.Text(), nullable=False),
+    sa.Column('prescription', sa.Text(), nullable=True),
+    sa.Column('doctor_name', sa.String(length=100), nullable=False),
+    sa.Column('record_date', sa.Date(), nullable=False),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['patient_id'], ['patient.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('medical_record_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_medical_record_archive_patient_date', ['patient_id', 'record_date'], unique=False)
+
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('medical_record', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('patient', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+    # ### end Alembic commands ###
+
+    if op.get_context().dialect.name == 'postgresql':
+        statements = POSTGRESQL_DDL
+    else:
+        _drop_sqlite_triggers()
+        statements = SQLITE_DDL
+    for statement in statements:
+        op.execute(statement)
+
+
+def _drop_sqlite_triggers():
+    op.execute('DROP TRIGGER IF EXISTS appointment_slot_check_insert')
+    op.execute('DROP TRIGGER IF EXISTS appointment_slot_check_update')
+
+
+def downgrade():
+    # The current triggers read deleted_at, so they go before the column
+    if op.get_context().dialect.name == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS appointment_slot_check ON appointment')
+    else:
+        _drop_sqlite_triggers()
+
+    # Plain ALTER TABLE (SQLite 3.35+): a batch rebuild of patient would
+    # drop the patient_search triggers
+    for table in ('patient', 'medical_record', 'appointment'):
+        op.execute(f'ALTER TABLE {table} DROP COLUMN deleted_at')
+
+    # ### commands auto generated by Alembic - please adjust! ###
+
+    with op.batch_alter_table('medical_record_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_medical_record_archive_patient_date')
+
+    op.drop_table('medical_record_archive')
+    with op.batch_alter_table('appointment_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_appointment_archive_patient_datetime')
+        batch_op.drop_index('ix_appointment_archive_doctor_datetime')
+
+    op.drop_table('appointment_archive')
+    # ### end Alembic commands ###
+
+    # Put back the triggers of revision 4d1e8a0b7f52
+    previous_revision = context.script.get_revision('4d1e8a0b7f52').module
+    if op.get_context().dialect.name == 'postgresql':
+        statements = previous_revision.POSTGRESQL_DDL
+    else:
+        statements = previous_revision.SQLITE_DDL
+    for statement in statements:
+        op.execute(statement)
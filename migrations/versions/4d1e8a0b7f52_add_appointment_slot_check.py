@@ -0,0 +1,83 @@
+"""add appointment slot check
+
+Revision ID: 4d1e8a0b7f52
+Revises: 9f3b2d71c4ae
+Create Date: 2026-10-18 03:48:37.206114
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4d1e8a0b7f52'
+down_revision = '9f3b2d71c4ae'
+branch_labels = None
+depends_on = None
+
+# The triggers as of this revision. Later revisions replace them, so they are
+# not imported from scheduling.py, which always holds the latest version.
+SQLITE_DDL = [
+    f"""CREATE TRIGGER IF NOT EXISTS appointment_slot_check_{event_name.lower()}
+    BEFORE {event_name} ON appointment
+    WHEN COALESCE(new.status, '') <> 'cancelled'
+    BEGIN
+        SELECT RAISE(ABORT, 'appointment slot conflict') WHERE EXISTS (
+            SELECT 1 FROM appointment
+            WHERE doctor_name = new.doctor_name
+              AND appointment_datetime > strftime('%Y-%m-%d %H:%M:%S', new.appointment_datetime,
+                                                  '-30 minutes') || substr(new.appointment_datetime, 20)
+              AND appointment_datetime < strftime('%Y-%m-%d %H:%M:%S', new.appointment_datetime,
+                                                  '+30 minutes') || substr(new.appointment_datetime, 20)
+              AND COALESCE(status, '') <> 'cancelled'
+              AND id IS NOT new.id
+        );
+    END"""
+    for event_name in ('INSERT', 'UPDATE')
+]
+
+POSTGRESQL_DDL = [
+    """CREATE OR REPLACE FUNCTION appointment_slot_check() RETURNS trigger AS $$
+    BEGIN
+        IF COALESCE(NEW.status, '') = 'cancelled' THEN
+            RETURN NEW;
+        END IF;
+        -- Serialize bookings per doctor so two transactions cannot both pass the check
+        PERFORM pg_advisory_xact_lock(hashtext('appointment:' || NEW.doctor_name));
+        IF EXISTS (
+            SELECT 1 FROM appointment
+            WHERE doctor_name = NEW.doctor_name
+              AND appointment_datetime > NEW.appointment_datetime - interval '30 minutes'
+              AND appointment_datetime < NEW.appointment_datetime + interval '30 minutes'
+              AND COALESCE(status, '') <> 'cancelled'
+              AND id <> NEW.id
+        ) THEN
+            RAISE EXCEPTION 'appointment slot conflict' USING ERRCODE = 'exclusion_violation';
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE TRIGGER appointment_slot_check
+    BEFORE INSERT OR UPDATE OF doctor_name, appointment_datetime, status ON appointment
+    FOR EACH ROW EXECUTE FUNCTION appointment_slot_check()"""
+]
+
+
+def upgrade():
+    # Triggers only check new and changed rows, so existing double bookings
+    # in the history do not block the upgrade
+    if op.get_context().dialect.name == 'postgresql':
+        statements = POSTGRESQL_DDL
+    else:
+        statements = SQLITE_DDL
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS appointment_slot_check ON appointment')
+        op.execute('DROP FUNCTION IF EXISTS appointment_slot_check()')
+        return
+
+    op.execute('DROP TRIGGER IF EXISTS appointment_slot_check_insert')
+    op.execute('DROP TRIGGER IF EXISTS appointment_slot_check_update')
@@ -0,0 +1,33 @@
+"""add medical record patient index
+
+Revision ID: 6c7920ee39cc
+Revises: 13ea6c5dd65b
+Create Date: 2026-10-18 03:06:01.842909
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '6c7920ee39cc'
+down_revision = '13ea6c5dd65b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        # Build the index without taking a write lock on the table
+        with op.get_context().autocommit_block():
+            op.create_index('ix_medical_record_patient_date', 'medical_record',
+                            ['patient_id', 'record_date'], unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+        return
+
+    with op.batch_alter_table('medical_record', schema=None) as batch_op:
+        batch_op.create_index('ix_medical_record_patient_date', ['patient_id', 'record_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('medical_record', schema=None) as batch_op:
+        batch_op.drop_index('ix_medical_record_patient_date')
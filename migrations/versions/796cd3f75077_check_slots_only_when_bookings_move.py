@@ -0,0 +1,87 @@
+"""check slots only when bookings move
+
+Revision ID: 796cd3f75077
+Revises: 20c2918be8f8
+Create Date: 2026-10-18 04:41:09.518204
+
+"""
+from alembic import context, op
+
+
+# revision identifiers, used by Alembic.
+revision = '796cd3f75077'
+down_revision = '20c2918be8f8'
+branch_labels = None
+depends_on = None
+
+# Updates are only checked when they move a booking or make it occupy its
+# slot again, as of this revision. The insert trigger is unchanged.
+SQLITE_UPDATE_DDL = """CREATE TRIGGER IF NOT EXISTS appointment_slot_check_update
+    BEFORE UPDATE OF doctor_name, appointment_datetime, status, deleted_at ON appointment
+    WHEN COALESCE(new.status, '') <> 'cancelled' AND new.deleted_at IS NULL
+    AND (old.doctor_name IS NOT new.doctor_name
+        OR old.appointment_datetime IS NOT new.appointment_datetime
+        OR COALESCE(old.status, '') = 'cancelled' OR old.deleted_at IS NOT NULL)
+    BEGIN
+        SELECT RAISE(ABORT, 'appointment slot conflict') WHERE EXISTS (
+            SELECT 1 FROM appointment
+            WHERE doctor_name = new.doctor_name
+              AND appointment_datetime > strftime('%Y-%m-%d %H:%M:%S', new.appointment_datetime,
+                                                  '-30 minutes') || substr(new.appointment_datetime, 20)
+              AND appointment_datetime < strftime('%Y-%m-%d %H:%M:%S', new.appointment_datetime,
+                                                  '+30 minutes') || substr(new.appointment_datetime, 20)
+              AND COALESCE(status, '') <> 'cancelled'
+              AND deleted_at IS NULL
+              AND id IS NOT new.id
+        );
+    END"""
+
+# The trigger already fires on UPDATE OF these columns only; the function skips
+# updates that leave a booking in the slot it held
+POSTGRESQL_FUNCTION_DDL = """CREATE OR REPLACE FUNCTION appointment_slot_check() RETURNS trigger AS $$
+    BEGIN
+        IF COALESCE(NEW.status, '') = 'cancelled' OR NEW.deleted_at IS NOT NULL THEN
+            RETURN NEW;
+        END IF;
+        IF TG_OP = 'UPDATE' AND NEW.doctor_name = OLD.doctor_name
+           AND NEW.appointment_datetime = OLD.appointment_datetime
+           AND COALESCE(OLD.status, '') <> 'cancelled' AND OLD.deleted_at IS NULL THEN
+            -- Already held this slot
+            RETURN NEW;
+        END IF;
+        -- Serialize bookings per doctor so two transactions cannot both pass the check
+        PERFORM pg_advisory_xact_lock(hashtext('appointment:' || NEW.doctor_name));
+        IF EXISTS (
+            SELECT 1 FROM appointment
+            WHERE doctor_name = NEW.doctor_name
+              AND appointment_datetime > NEW.appointment_datetime - interval '30 minutes'
+              AND appointment_datetime < NEW.appointment_datetime + interval '30 minutes'
+              AND COALESCE(status, '') <> 'cancelled'
+              AND deleted_at IS NULL
+              AND id <> NEW.id
+        ) THEN
+            RAISE EXCEPTION 'appointment slot conflict' USING ERRCODE = 'exclusion_violation';
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql"""
+
+
+def upgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        op.execute(POSTGRESQL_FUNCTION_DDL)
+        return
+
+    op.execute('DROP TRIGGER IF EXISTS appointment_slot_check_update')
+    op.execute(SQLITE_UPDATE_DDL)
+
+
+def downgrade():
+    # Put back the triggers of revision 4958cda76d86
+    previous_revision = context.script.get_revision('4958cda76d86').module
+    if op.get_context().dialect.name == 'postgresql':
+        op.execute(previous_revision.POSTGRESQL_DDL[0])
+        return
+
+    op.execute('DROP TRIGGER IF EXISTS appointment_slot_check_update')
+    op.execute(previous_revision.SQLITE_DDL[1])
@@ -0,0 +1,48 @@
+"""add patient search indexes
+
+Revision ID: 9f3b2d71c4ae
+Revises: 6c7920ee39cc
+Create Date: 2026-10-18 03:20:12.514302
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9f3b2d71c4ae'
+down_revision = '6c7920ee39cc'
+branch_labels = None
+depends_on = None
+
+SEARCHED_COLUMNS = ('name', 'email', 'phone')
+
+
+def upgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        # Build the indexes without taking a write lock on the table
+        with op.get_context().autocommit_block():
+            for name in SEARCHED_COLUMNS:
+                op.create_index(f'ix_patient_{name}_trgm', 'patient', [name], unique=False,
+                                postgresql_using='gin', postgresql_ops={name: 'gin_trgm_ops'},
+                                postgresql_concurrently=True, if_not_exists=True)
+        return
+
+    from search import SEARCH_TABLE, SQLITE_SEARCH_DDL
+    for statement in SQLITE_SEARCH_DDL:
+        op.execute(statement)
+    # Index the patients that existed before the triggers
+    op.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name in SEARCHED_COLUMNS:
+                op.drop_index(f'ix_patient_{name}_trgm', table_name='patient',
+                              postgresql_concurrently=True, if_exists=True)
+        return
+
+    for trigger in ('patient_search_ai', 'patient_search_ad', 'patient_search_au'):
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS patient_search')
@@ -0,0 +1,38 @@
+"""add updated_at indexes
+
+Revision ID: e0b5807730ae
+Revises: 9bc4f6b36d4d
+Create Date: 2026-10-18 03:50:40.938310
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e0b5807730ae'
+down_revision = '9bc4f6b36d4d'
+branch_labels = None
+depends_on = None
+
+# Back the ?updated_since= filter of GET /api/export/<table>
+TABLES = ('appointment', 'appointment_archive', 'medical_record', 'medical_record_archive', 'patient')
+
+
+def upgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        # Build the indexes without taking a write lock on the tables
+        with op.get_context().autocommit_block():
+            for table in TABLES:
+                op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False,
+                                postgresql_concurrently=True, if_not_exists=True)
+        return
+
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(f'ix_{table}_updated_at', ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_updated_at')
@@ -1,17 +1,89 @@
-from datetime import datetime
+from datetime import date, datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 
-class Patient(db.Model):
+class SerializerMixin:
+    """Column-level serialization shared by all models."""
+    
+    @classmethod
+    def column_names(cls):
+        """Return the table's column names in declaration order."""
+        return [c.name for c in cls.__table__.columns]
+    
+    @staticmethod
+    def serialize_value(value):
+        """Convert a column value to its JSON representation."""
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
+    
+    @classmethod
+    def columns(cls, fields=None):
+        """Column attributes for fields (all columns by default), for with_entities."""
+        return [getattr(cls, f) for f in (fields or cls.column_names())]
+    
+    @classmethod
+    def row_serializer(cls, fields=None):
+        """Return a function that converts with_entities rows into dictionaries.
+        
+        Only the date/datetime positions are converted, so rows are serialized
+        without hydrating model instances or inspecting every value.
+        """
+        names = tuple(fields or cls.column_names())
+        temporal = [
+            index for index, name in enumerate(names)
+            if isinstance(cls.__table__.c[name].type, (db.Date, db.DateTime))
+        ]
+        
+        def serialize(row):
+            values = list(row)
+            for index in temporal:
+                if values[index] is not None:
+                    values[index] = values[index].isoformat()
+            return dict(zip(names, values))
+        return serialize
+    
+    @classmethod
+    def row_to_dict(cls, row, fields):
+        """Convert a row selected with with_entities into a dictionary."""
+        return cls.row_serializer(fields)(row)
+
+
+class SoftDeleteMixin:
+    """A deleted_at timestamp instead of hard deletes.
+    
+    Rows with deleted_at set are left out of every ORM SELECT unless the
+    statement has the include_deleted execution option (see archive.py).
+    """
+    deleted_at = db.Column(db.DateTime, nullable=True)
+
+
+class Patient(SoftDeleteMixin, SerializerMixin, db.Model):
     """Patient model for storing patient information."""
     __tablename__ = 'patient'
+    __table_args__ = tuple(
+        # Trigram indexes for GET /api/patients/search (PostgreSQL only; SQLite
+        # uses the FTS5 table created in search.py)
+        db.Index(f'ix_patient_{name}_trgm', name, postgresql_using='gin',
+                 postgresql_ops={name: 'gin_trgm_ops'}).ddl_if(dialect='postgresql')
+        for name in ('name', 'email', 'phone')
+    ) + (
+        # Incremental exports (?updated_since=)
+        db.Index('ix_patient_updated_at', 'updated_at'),
+        # Emails are unique among active patients; a soft deleted patient's
+        # email can be registered again
+        db.Index('ix_patient_email_active', 'email', unique=True,
+                 postgresql_where=text('deleted_at IS NULL'), sqlite_where=text('deleted_at IS NULL')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     date_of_birth = db.Column(db.Date, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
+    email = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(20), nullable=True)
     address = db.Column(db.Text, nullable=True)
     blood_group = db.Column(db.String(5), nullable=True)
@@ -22,9 +94,15 @@ class Patient(db.Model):
     appointments = db.relationship('Appointment', backref='patient', lazy=True, cascade='all, delete-orphan')
     medical_records = db.relationship('MedicalRecord', backref='patient', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        """Convert model to dictionary."""
-        return {
+    # Values accepted by ?include= mapped to the relationship they load
+    INCLUDES = {
+        'appointments': 'appointments',
+        'records': 'medical_records'
+    }
+    
+    def to_dict(self, include=()):
+        """Convert model to dictionary, optionally embedding related rows."""
+        data = {
             'id': self.id,
             'name': self.name,
             'date_of_birth': self.date_of_birth.isoformat() if self.date_of_birth else None,
@@ -33,13 +111,25 @@ class Patient(db.Model):
             'address': self.address,
             'blood_group': self.blood_group,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
         }
+        for name in include:
+            data[name] = [related.to_dict() for related in getattr(self, self.INCLUDES[name])]
+        return data
 
 
-class Appointment(db.Model):
+class Appointment(SoftDeleteMixin, SerializerMixin, db.Model):
     """Appointment model for managing patient appointments."""
     __tablename__ = 'appointment'
+    __table_args__ = (
+        # Composite indexes for the filters supported by GET /api/appointments
+        db.Index('ix_appointment_doctor_datetime', 'doctor_name', 'appointment_datetime'),
+        db.Index('ix_appointment_patient_datetime', 'patient_id', 'appointment_datetime'),
+        db.Index('ix_appointment_status_datetime', 'status', 'appointment_datetime'),
+        # Incremental exports (?updated_since=)
+        db.Index('ix_appointment_updated_at', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
@@ -62,13 +152,20 @@ class Appointment(db.Model):
             'reason': self.reason,
             'notes': self.notes,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
         }
 
 
-class MedicalRecord(db.Model):
+class MedicalRecord(SoftDeleteMixin, SerializerMixin, db.Model):
     """Medical record model for storing patient medical history."""
     __tablename__ = 'medical_record'
+    __table_args__ = (
+        # Backs patient history lookups (selectinload on Patient.medical_records)
+        db.Index('ix_medical_record_patient_date', 'patient_id', 'record_date'),
+        # Incremental exports (?updated_since=)
+        db.Index('ix_medical_record_updated_at', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
@@ -91,5 +188,120 @@ class MedicalRecord(db.Model):
             'record_date': self.record_date.isoformat() if self.record_date else None,
             'notes': self.notes,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
         }
+
+
+class AppointmentArchive(SoftDeleteMixin, SerializerMixin, db.Model):
+    """Appointments older than ARCHIVE_AFTER_DAYS, moved out of appointment by archive.py."""
+    __tablename__ = 'appointment_archive'
+    __table_args__ = (
+        db.Index('ix_appointment_archive_patient_datetime', 'patient_id', 'appointment_datetime'),
+        db.Index('ix_appointment_archive_doctor_datetime', 'doctor_name', 'appointment_datetime'),
+        db.Index('ix_appointment_archive_updated_at', 'updated_at'),
+    )
+    
+    # Keeps the id the row had in appointment
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
+    doctor_name = db.Column(db.String(100), nullable=False)
+    appointment_datetime = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(20))
+    reason = db.Column(db.Text, nullable=True)
+    notes = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class MedicalRecordArchive(SoftDeleteMixin, SerializerMixin, db.Model):
+    """Medical records older than ARCHIVE_AFTER_DAYS, moved out of medical_record by archive.py."""
+    __tablename__ = 'medical_record_archive'
+    __table_args__ = (
+        db.Index('ix_medical_record_archive_patient_date', 'patient_id', 'record_date'),
+        db.Index('ix_medical_record_archive_updated_at', 'updated_at'),
+    )
+    
+    # Keeps the id the row had in medical_record
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
+    diagnosis = db.Column(db.Text, nullable=False)
+    prescription = db.Column(db.Text, nullable=True)
+    doctor_name = db.Column(db.String(100), nullable=False)
+    record_date = db.Column(db.Date, nullable=False)
+    notes = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class AppointmentStatusStat(db.Model):
+    """Number of appointments per status, maintained by stats.py."""
+    __tablename__ = 'appointment_status_stat'
+    
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class AppointmentDailyStat(db.Model):
+    """Number of appointments per day, doctor and status, maintained by stats.py."""
+    __tablename__ = 'appointment_daily_stat'
+    
+    day = db.Column(db.Date, primary_key=True)
+    doctor_name = db.Column(db.String(100), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class BloodGroupStat(db.Model):
+    """Number of patients per blood group, maintained by stats.py."""
+    __tablename__ = 'blood_group_stat'
+    
+    blood_group = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class AuditLog(SerializerMixin, db.Model):
+    """One insert, update or delete of a Patient, Appointment or MedicalRecord, written by audit.py."""
+    __tablename__ = 'audit_log'
+    __table_args__ = (
+        # Keyset pages of one entity's history, and time range scans
+        db.Index('ix_audit_log_entity', 'entity_type', 'entity_id', 'id'),
+        db.Index('ix_audit_log_changed_at', 'changed_at'),
+        # Change feed pages; also finds the transaction's own entries (feed_id IS NULL) at commit
+        db.Index('ix_audit_log_feed_id', 'feed_id', unique=True),
+    )
+    
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    entity_type = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # insert, update, delete, restore
+    # Column values before and after the change; only the changed columns for updates
+    before = db.Column(db.JSON, nullable=True)
+    after = db.Column(db.JSON, nullable=True)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # "METHOD /path" of the request that made the change, or the CLI command
+    source = db.Column(db.String(255), nullable=True)
+    # Position in the change feed, assigned in commit order by audit.py; NULL until commit
+    feed_id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), nullable=True)
+
+
+class IdempotencyKey(db.Model):
+    """Response stored for an Idempotency-Key header, replayed by idempotency.py."""
+    __tablename__ = 'idempotency_key'
+    __table_args__ = (
+        db.Index('ix_idempotency_key_expires_at', 'expires_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(255), unique=True, nullable=False)
+    # SHA-256 of the method, path and body the key was first used with
+    fingerprint = db.Column(db.String(64), nullable=False)
+    # NULL while the first request is still running
+    status_code = db.Column(db.Integer, nullable=True)
+    mimetype = db.Column(db.String(100), nullable=True)
+    body = db.Column(db.LargeBinary, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Claims of running requests expire after IDEMPOTENCY_LOCK_TIMEOUT, stored responses after IDEMPOTENCY_TTL
+    expires_at = db.Column(db.DateTime, nullable=False)
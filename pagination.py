@@ -0,0 +1,149 @@
+import base64
+import binascii
+import json
+from flask import current_app
+from sqlalchemy.orm import selectinload
+
+
+class PaginationError(ValueError):
+    """Raised when pagination or projection parameters are invalid."""
+
+
+def encode_cursor(last_id):
+    """Encode the last seen primary key as an opaque cursor string."""
+    raw = json.dumps({'id': last_id}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor back into a primary key."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return int(payload['id'])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise PaginationError('Invalid cursor')
+
+
+def parse_limit(args, default=None, maximum=None):
+    """Read ?limit= and clamp it to the maximum (the pagination settings by default)."""
+    default = default or current_app.config['PAGINATION_DEFAULT_LIMIT']
+    maximum = maximum or current_app.config['PAGINATION_MAX_LIMIT']
+    try:
+        limit = int(args.get('limit', default))
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, maximum)
+
+
+def parse_fields(args, model):
+    """Read ?fields= into a list of column names of model.
+
+    The primary key is always included because the cursor is built from it.
+    Returns None when no projection was requested.
+    """
+    raw = args.get('fields')
+    if not raw:
+        return None
+    columns = model.column_names()
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise PaginationError(f"Unknown field(s): {', '.join(unknown)}")
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    # Keep the order stable and drop duplicates
+    return list(dict.fromkeys(fields))
+
+
+def parse_include(args, model):
+    """Read ?include= into a list of names from model.INCLUDES."""
+    raw = args.get('include')
+    if not raw:
+        return []
+    include = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in include if name not in model.INCLUDES]
+    if unknown:
+        raise PaginationError(f"Unknown include(s): {', '.join(unknown)}")
+    return list(dict.fromkeys(include))
+
+
+def include_options(model, include):
+    """Loader options that fetch each included relationship in one extra query."""
+    return [selectinload(getattr(model, model.INCLUDES[name])) for name in include]
+
+
+def wants_count(args):
+    return args.get('count', '').lower() in ('1', 'true', 'yes')
+
+
+def page_window(query, model, args):
+    """Restrict query to the requested page plus one look-ahead row.
+
+    Returns the windowed query, ordered by model.id, and the page limit.
+    """
+    limit = parse_limit(args)
+    cursor = args.get('cursor')
+    offset = args.get('offset')
+    if cursor and offset:
+        raise PaginationError('cursor and offset cannot be combined')
+
+    query = query.order_by(model.id)
+    if cursor:
+        query = query.filter(model.id > decode_cursor(cursor))
+    elif offset:
+        try:
+            offset = int(offset)
+        except ValueError:
+            raise PaginationError('offset must be an integer')
+        max_offset = current_app.config['PAGINATION_MAX_OFFSET']
+        if offset < 0 or offset > max_offset:
+            raise PaginationError(
+                f'offset must be between 0 and {max_offset}; use cursor for deeper pages'
+            )
+        query = query.offset(offset)
+    # Fetch one extra row to know whether another page exists
+    return query.limit(limit + 1), limit
+
+
+def paginate(query, model, args, serialize=None):
+    """Apply keyset pagination on model.id to query.
+
+    Supports ``cursor`` (opaque, from a previous page), ``limit``, a bounded
+    ``offset`` for small jumps, an optional ``count=true`` total and a
+    ``fields=`` projection. Rows are selected as column tuples unless a
+    ``serialize`` callable is given, in which case model instances are loaded
+    and passed to it (needed for relationships). Returns a dict ready to be
+    merged into the response body.
+    """
+    fields = parse_fields(args, model)
+    if serialize is None:
+        # Select plain column tuples and skip ORM hydration entirely
+        fields = fields or model.column_names()
+
+    total = None
+    if wants_count(args):
+        total = query.order_by(None).count()
+
+    window, limit = page_window(query, model, args)
+    if fields:
+        window = window.with_entities(*model.columns(fields))
+    rows = window.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if fields:
+        serialize = model.row_serializer(fields)
+    data = [serialize(row) for row in rows]
+
+    page = {
+        'data': data,
+        'count': len(data),
+        'limit': limit,
+        'next_cursor': encode_cursor(data[-1]['id']) if has_more else None
+    }
+    if total is not None:
+        page['total'] = total
+    return page
@@ -0,0 +1,387 @@
+"""Server-sent events for committed appointment and medical record changes.
+
+Each worker process runs one dispatcher thread. It wakes up when a
+transaction that wrote audit entries commits, reads the new changes once
+through the change feed (changes.py) and hands them to every subscriber of
+that process. Commits are signalled with PostgreSQL NOTIFY, which is only
+delivered on commit and reaches every worker and pod, or, on other
+databases, with an in-process event; the dispatcher also polls every
+PUSH_POLL_INTERVAL seconds, which covers writes made by other processes
+there.
+
+Subscribers have a bounded buffer. One that falls behind is not allowed to
+hold events back for the others: its buffer is dropped and it catches up
+from the audit log, like a client reconnecting with Last-Event-ID.
+
+An open stream holds a handler thread for up to PUSH_MAX_DURATION seconds,
+so streams are only served by threaded servers (gthread workers or the
+ASGI entry point) and never take the last of a process's SERVER_THREADS.
+"""
+import logging
+import os
+import queue
+import select
+import threading
+import time
+from flask import Response, current_app, g, has_app_context, request, stream_with_context
+from sqlalchemy import event, text
+from models import db
+from audit import AUDITED, WRITTEN_KEY, on_commit
+from changes import get_changes, head_token
+from pagination import decode_cursor, encode_cursor
+from routing import RoutingSession
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'healthcare_changes'
+# Entity types streamed unless the client asks for others
+DEFAULT_TYPES = ('appointment', 'medical_record')
+
+
+class PushError(ValueError):
+    """Raised when stream parameters are invalid."""
+
+
+class PushUnavailable(Exception):
+    """Raised when this process cannot hold another stream open."""
+
+
+class LocalNotifier:
+    """Wakes the dispatcher of this process; the stand-in for PostgresNotifier."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def notify(self):
+        self._event.set()
+
+    def wait(self, timeout):
+        woken = self._event.wait(timeout)
+        self._event.clear()
+        return woken
+
+
+class PostgresNotifier:
+    """LISTENs on CHANNEL with a dedicated connection outside the pool.
+
+    Committing transactions send the NOTIFY themselves (see _notify_before_commit),
+    so notify() has nothing to do.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._connection = None
+
+    def notify(self):
+        pass
+
+    def _listen(self):
+        connection = self.engine.raw_connection()
+        # Kept for as long as the process runs, so it does not count against the pool
+        connection.detach()
+        connection.driver_connection.autocommit = True
+        with connection.driver_connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+        return connection.driver_connection
+
+    def wait(self, timeout):
+        try:
+            if self._connection is None:
+                self._connection = self._listen()
+            if select.select([self._connection], [], [], timeout) == ([], [], []):
+                return False
+            self._connection.poll()
+            self._connection.notifies.clear()
+            return True
+        except Exception as e:
+            logger.error(f"Change notification listener error: {str(e)}")
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            time.sleep(timeout)
+            return False
+
+
+class Subscriber:
+    """One open stream: a bounded buffer of change pages, filled from token on."""
+
+    def __init__(self, buffer_size, token):
+        self.buffer = queue.Queue(buffer_size)
+        self.token = token
+        self.overflowed = False
+
+    def offer(self, page):
+        try:
+            self.buffer.put_nowait(page)
+        except queue.Full:
+            self.overflowed = True
+
+    def drain(self):
+        """Forget buffered pages after an overflow; they are read again from the audit log."""
+        self.overflowed = False
+        while True:
+            try:
+                self.buffer.get_nowait()
+            except queue.Empty:
+                return
+
+
+class ChangeBroker:
+    """Reads new changes once per wake-up and fans them out to this process's subscribers.
+
+    With poll_interval 0 no dispatcher thread is started and dispatch()
+    must be called explicitly.
+    """
+
+    def __init__(self, app, notifier, poll_interval, buffer_size, max_subscribers):
+        self.app = app
+        self.notifier = notifier
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.token = None
+        # Requests this process is handling, open streams included
+        self.active_requests = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def capacity(self):
+        """Streams this process may hold: max_subscribers, and always fewer than SERVER_THREADS."""
+        threads = self.app.config['SERVER_THREADS']
+        if threads:
+            return min(self.max_subscribers, threads - 1)
+        return self.max_subscribers
+
+    def has_spare_thread(self):
+        """Whether a thread stays free for other requests if the current one becomes a stream."""
+        threads = self.app.config['SERVER_THREADS']
+        with self._lock:
+            return not threads or self.active_requests < threads
+
+    def request_started(self):
+        with self._lock:
+            self.active_requests += 1
+
+    def request_finished(self):
+        with self._lock:
+            self.active_requests -= 1
+
+    def subscribe(self):
+        """Register a subscriber, or return None when the process is at capacity() already.
+
+        Its buffer receives every page after its token, the broker's token
+        when it joined.
+        """
+        with self._lock:
+            if len(self._subscribers) >= self.capacity():
+                return None
+            if not self._subscribers:
+                # Nobody was listening, so nothing since the last dispatch is owed to anyone
+                self.token = head_token()
+            subscriber = Subscriber(self.buffer_size, self.token)
+            self._subscribers.add(subscriber)
+        self.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def dispatch(self):
+        """Read the changes since the last dispatch and offer them to every subscriber."""
+        with self._lock:
+            if not self._subscribers:
+                return
+            token = self.token
+        pages = list(_pages(token))
+        with self._lock:
+            # Includes subscribers that joined while the pages were read: their
+            # token is the one read from, and a stream skips pages it has caught
+            # up past already
+            for subscriber in self._subscribers:
+                for page in pages:
+                    subscriber.offer(page)
+            if pages and self.token == token:
+                self.token = pages[-1]['next_token']
+
+    def _run(self):
+        while True:
+            self.notifier.wait(self.poll_interval)
+            try:
+                with self.app.app_context():
+                    try:
+                        self.dispatch()
+                    finally:
+                        db.session.remove()
+            except Exception as e:
+                logger.error(f"Change dispatcher error: {str(e)}")
+
+    def start(self):
+        """Start the dispatcher thread in this process if it is not running."""
+        if not self.poll_interval:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='change-dispatcher', daemon=True)
+            self._thread.start()
+
+
+def get_broker():
+    return current_app.extensions['push']
+
+
+@event.listens_for(RoutingSession, 'before_commit')
+def _notify_before_commit(session):
+    broker = current_app.extensions.get('push') if has_app_context() else None
+    if broker is None or not isinstance(broker.notifier, PostgresNotifier):
+        return
+    # commit() flushes after this hook; flush now so its audit entries count
+    session.flush()
+    written = session.info.get(WRITTEN_KEY)
+    if written:
+        # Delivered to the listeners only if and when this transaction commits
+        session.execute(text('SELECT pg_notify(:channel, :payload)'),
+                        {'channel': CHANNEL, 'payload': ','.join(sorted(written))})
+
+
+@on_commit
+def _notify_after_commit(written):
+    broker = current_app.extensions.get('push') if has_app_context() else None
+    if broker is not None:
+        broker.notifier.notify()
+
+
+def parse_types(value):
+    """Parse the entity_type parameter ("appointment,medical_record") into a set."""
+    if not value:
+        return set(DEFAULT_TYPES)
+    types = {part.strip() for part in value.split(',') if part.strip()}
+    unknown = types - set(AUDITED)
+    if unknown:
+        raise PushError(f"Unknown entity_type: {', '.join(sorted(unknown))}. "
+                        f"Use any of: {', '.join(AUDITED)}")
+    return types
+
+
+def _changes_event(page, types):
+    changes = [change for change in page['data'] if change['entity_type'] in types]
+    # Sent even when empty, so the client's Last-Event-ID still moves forward
+    return (f"id: {page['next_token']}\nevent: changes\ndata: ".encode()
+            + current_app.json.dumps_bytes(changes) + b'\n\n')
+
+
+def _pages(since_token):
+    """Every page of changes after since_token, read from the audit log."""
+    limit = {'limit': str(current_app.config['PAGINATION_MAX_LIMIT'])}
+    while True:
+        page = get_changes(since_token, limit)
+        if page['data']:
+            yield page
+        since_token = page['next_token']
+        if not page['has_more']:
+            return
+
+
+def _next_pages(subscriber, last_id, remaining):
+    """Wait for the next pages of a stream at last_id; yields a heartbeat if none arrive in time.
+
+    Used with ``yield from``, which returns the pages.
+    """
+    if subscriber.overflowed:
+        # Fell more than PUSH_BUFFER_SIZE pages behind: read them back instead
+        subscriber.drain()
+        return _pages(encode_cursor(last_id))
+    try:
+        return [subscriber.buffer.get(timeout=min(remaining, current_app.config['PUSH_HEARTBEAT']))]
+    except queue.Empty:
+        yield b': heartbeat\n\n'
+        return []
+
+
+def _stream(subscriber, last_id, types):
+    """Yield the events of a stream that has sent up to last_id, until PUSH_MAX_DURATION has passed."""
+    config = current_app.config
+    deadline = time.monotonic() + config['PUSH_MAX_DURATION']
+    yield f"retry: {config['PUSH_RETRY_MS']}\n\n".encode()
+    pending = _pages(encode_cursor(last_id))
+    while True:
+        for page in pending:
+            page_id = decode_cursor(page['next_token'])
+            # Pages up to last_id were already sent by the catch-up
+            if page_id > last_id:
+                yield _changes_event(page, types)
+                last_id = page_id
+        # Nothing is read until the next page arrives; give the connection back
+        db.session.rollback()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        pending = yield from _next_pages(subscriber, last_id, remaining)
+
+
+def stream_changes(since_token, types):
+    """Build a text/event-stream response pushing changes to entities of types.
+
+    Changes after since_token (a change feed token, or the latest one) are
+    sent as ``changes`` events whose id is the token to resume from. The
+    stream sends a heartbeat comment every PUSH_HEARTBEAT seconds and ends
+    after PUSH_MAX_DURATION; EventSource clients then reconnect with
+    Last-Event-ID. Raises PushUnavailable on a server without threads, when
+    the stream would take the process's last free thread or when it has as
+    many streams open as it may hold.
+    """
+    broker = get_broker()
+    last_id = decode_cursor(since_token) if since_token is not None else None
+    if not request.environ.get('wsgi.multithread'):
+        # A sync worker would serve nothing else until the stream ends
+        raise PushUnavailable('Change streams need a threaded server; poll GET /api/changes instead')
+    if not broker.has_spare_thread():
+        raise PushUnavailable('No free thread for another change stream')
+    # Subscribed before catching up, so nothing committed in between is missed
+    subscriber = broker.subscribe()
+    if subscriber is None:
+        raise PushUnavailable('Too many open change streams')
+    if last_id is None:
+        last_id = decode_cursor(subscriber.token)
+
+    response = Response(stream_with_context(_stream(subscriber, last_id, types)), mimetype='text/event-stream')
+    response.call_on_close(lambda: broker.unsubscribe(subscriber))
+    response.headers['Cache-Control'] = 'no-cache'
+    # Tells nginx (the ingress) not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def init_push(app):
+    """Create the change broker configured by PUSH_* and count the requests in flight."""
+    threads = app.config['SERVER_THREADS']
+    if threads and app.config['PUSH_MAX_SUBSCRIBERS'] >= threads:
+        logger.warning(f"PUSH_MAX_SUBSCRIBERS={app.config['PUSH_MAX_SUBSCRIBERS']} leaves no thread of "
+                       f"{threads} for other requests; at most {threads - 1} change streams are opened")
+    backend = app.config['PUSH_BACKEND']
+    if backend == 'auto':
+        backend = 'postgres' if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql') else 'local'
+    with app.app_context():
+        notifier = PostgresNotifier(db.engine) if backend == 'postgres' else LocalNotifier()
+    app.extensions['push'] = ChangeBroker(
+        app, notifier, app.config['PUSH_POLL_INTERVAL'], app.config['PUSH_BUFFER_SIZE'],
+        app.config['PUSH_MAX_SUBSCRIBERS']
+    )
+
+    @app.before_request
+    def count_request():
+        app.extensions['push'].request_started()
+        g.push_counted = True
+
+    @app.teardown_request
+    def uncount_request(exc):
+        # Skipped for requests an earlier before_request answered; a stream's
+        # teardown runs once it has been closed
+        if g.pop('push_counted', False):
+            app.extensions['push'].request_finished()
+
+    return app.extensions['push']
@@ -0,0 +1,251 @@
+"""Per-client rate limiting and concurrency caps.
+
+Every /api request takes a token from a bucket keyed by client and route;
+an empty bucket answers 429 with Retry-After. Views marked
+``concurrency_limited`` (the list, search and export endpoints that can scan
+whole tables) additionally run at most RATELIMIT_CONCURRENCY at a time per
+client, so one client cannot occupy every worker.
+
+Buckets live in process memory by default, i.e. the limits apply per
+worker. RATELIMIT_BACKEND=redis shares them between workers and pods.
+"""
+import functools
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, jsonify, make_response, request
+from prometheus_client import Counter
+
+API_KEY_HEADER = 'X-API-Key'
+EXEMPT_PATHS = ('/health', '/ready', '/metrics')
+
+THROTTLED = Counter(
+    'http_throttled_requests_total', 'Requests rejected with 429', ['route', 'reason']
+)
+
+
+def parse_limit(value):
+    """Parse "<rate>/<burst>" (tokens per second / bucket size) into floats."""
+    try:
+        rate, burst = (float(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f'Invalid rate limit {value!r}: expected "<rate>/<burst>", e.g. "10/20"')
+    if rate <= 0 or burst < 1:
+        raise ValueError(f'Invalid rate limit {value!r}: rate must be positive and burst at least 1')
+    return rate, burst
+
+
+def parse_route_limits(value):
+    """Parse "GET /api/patients=2/5,GET /api/appointments/export=0.2/1" into {(method, rule): limit}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        route, _, limit = item.rpartition('=')
+        method, _, rule = route.strip().partition(' ')
+        if not rule:
+            raise ValueError(f'Invalid route rate limit {item!r}: expected "METHOD /rule=<rate>/<burst>"')
+        limits[(method.upper(), rule.strip())] = parse_limit(limit)
+    return limits
+
+
+class LocalLimiterBackend:
+    """In-process token buckets and concurrency counters.
+
+    Also the stand-in for RedisLimiterBackend in development and tests.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._active = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Take one token; returns (allowed, seconds until a token is available)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_entries:
+                # Least recently used buckets are the fullest ones
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def acquire(self, key, limit):
+        """Count one more running request for key unless limit are running already."""
+        with self._lock:
+            active = self._active.get(key, 0)
+            if active >= limit:
+                return False
+            self._active[key] = active + 1
+            return True
+
+    def release(self, key):
+        with self._lock:
+            active = self._active.get(key, 0) - 1
+            if active > 0:
+                self._active[key] = active
+            else:
+                self._active.pop(key, None)
+
+
+# Refill and take atomically, on the Redis server's clock
+TAKE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+tokens = math.min(burst, tokens + (now - (tonumber(state[2]) or now)) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisLimiterBackend:
+    """Limiter state shared through any client exposing Redis' eval/incr/decr/expire."""
+
+    def __init__(self, client, prefix='healthcare:ratelimit:', slot_ttl=300):
+        self.client = client
+        self.prefix = prefix
+        # Slots of a worker that died mid-request are forgotten after this long
+        self.slot_ttl = slot_ttl
+
+    def take(self, key, rate, burst):
+        wait = float(self.client.eval(TAKE_SCRIPT, 1, self.prefix + key, rate, burst))
+        return wait == 0, wait
+
+    def acquire(self, key, limit):
+        key = self.prefix + key
+        if self.client.incr(key) > limit:
+            self.client.decr(key)
+            return False
+        self.client.expire(key, self.slot_ttl)
+        return True
+
+    def release(self, key):
+        self.client.decr(self.prefix + key)
+
+
+class RateLimiter:
+    """Applies the configured limits to requests."""
+
+    def __init__(self, backend, default_limit, route_limits=None, concurrency=0, enabled=True):
+        self.backend = backend
+        self.default_limit = default_limit
+        self.route_limits = route_limits or {}
+        self.concurrency = concurrency
+        self.enabled = enabled
+
+    def limit_for(self, method, rule):
+        return self.route_limits.get((method, rule), self.default_limit)
+
+    def take(self, client, method, rule):
+        rate, burst = self.limit_for(method, rule)
+        return self.backend.take(f'rate:{client}:{method} {rule}', rate, burst)
+
+    def acquire(self, client):
+        return self.backend.acquire(f'active:{client}', self.concurrency)
+
+    def release(self, client):
+        self.backend.release(f'active:{client}')
+
+
+def client_id():
+    """The API key of the request if it has one, else the client address.
+
+    With RATELIMIT_PROXY_COUNT trusted proxies in front (the ingress), the
+    address is read from X-Forwarded-For as they recorded it.
+    """
+    api_key = request.headers.get(API_KEY_HEADER)
+    if api_key:
+        # Keys are not kept in the limiter's storage in clear
+        return 'key:' + hashlib.sha256(api_key.encode()).hexdigest()[:32]
+    proxies = current_app.config['RATELIMIT_PROXY_COUNT']
+    forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+    if proxies and len(forwarded) >= proxies:
+        return 'ip:' + forwarded[-proxies]
+    return 'ip:' + (request.remote_addr or 'unknown')
+
+
+def get_limiter():
+    return current_app.extensions['ratelimit']
+
+
+def _rule():
+    return request.url_rule.rule if request.url_rule is not None else None
+
+
+def _too_many(reason, retry_after, message):
+    THROTTLED.labels(_rule() or 'unmatched', reason).inc()
+    response = jsonify({'success': False, 'error': message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def concurrency_limited(view):
+    """Run view for at most RATELIMIT_CONCURRENCY requests of the same client at a time.
+
+    The slot of a streamed response is held until the stream is closed.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        limiter = get_limiter()
+        if not limiter.enabled or not limiter.concurrency:
+            return view(*args, **kwargs)
+        client = g.get('ratelimit_client') or client_id()
+        if not limiter.acquire(client):
+            return _too_many('concurrency', 1, 'Too many concurrent requests')
+        released = False
+        try:
+            response = make_response(view(*args, **kwargs))
+            if response.is_streamed:
+                response.call_on_close(lambda: limiter.release(client))
+                released = True
+            return response
+        finally:
+            if not released:
+                limiter.release(client)
+    return wrapper
+
+
+def init_ratelimit(app):
+    """Create the limiter configured by RATELIMIT_* and check every /api request against it."""
+    backend_name = app.config['RATELIMIT_BACKEND']
+    if backend_name == 'redis':
+        # Optional dependency, only needed when the shared backend is used
+        import redis
+        backend = RedisLimiterBackend(redis.Redis.from_url(app.config['RATELIMIT_REDIS_URL']))
+    else:
+        backend = LocalLimiterBackend()
+    app.extensions['ratelimit'] = RateLimiter(
+        backend,
+        parse_limit(app.config['RATELIMIT_DEFAULT']),
+        parse_route_limits(app.config['RATELIMIT_ROUTES']),
+        app.config['RATELIMIT_CONCURRENCY'],
+        enabled=backend_name != 'none'
+    )
+
+    @app.before_request
+    def check_rate_limit():
+        limiter = get_limiter()
+        rule = _rule()
+        if not limiter.enabled or rule is None or request.method == 'OPTIONS' \
+                or request.path.startswith(EXEMPT_PATHS):
+            return None
+        g.ratelimit_client = client_id()
+        allowed, retry_after = limiter.take(g.ratelimit_client, request.method, rule)
+        if not allowed:
+            return _too_many('rate', retry_after, 'Rate limit exceeded')
+        return None
+
+    return app.extensions['ratelimit']
@@ -0,0 +1,161 @@
+"""Readiness state kept in memory and refreshed by a background thread.
+
+Probes read the last result instead of running a query each, so a slow
+database delays one check per worker and interval rather than every probe,
+and probes never wait for a pooled connection behind real traffic.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import text
+from dbpool import pool_stats
+
+logger = logging.getLogger(__name__)
+
+
+def migration_head(app):
+    """Newest revision in the migrations directory, or None if there is none."""
+    migrate = app.extensions.get('migrate')
+    if migrate is None:
+        return None
+    try:
+        from alembic.script import ScriptDirectory
+        heads = ScriptDirectory(migrate.directory).get_heads()
+    except Exception as e:
+        logger.warning(f"Could not read migration head: {str(e)}")
+        return None
+    return heads[0] if len(heads) == 1 else None
+
+
+def pool_saturation(engine):
+    """Share of the pool's connections (size + max overflow) checked out, None without a QueuePool."""
+    stats = pool_stats(engine)
+    if 'checked_out' not in stats:
+        return None, stats
+    capacity = stats['size'] + max(stats['max_overflow'], 0)
+    return (round(stats['checked_out'] / capacity, 3) if capacity else None), stats
+
+
+class ReadinessMonitor:
+    """Checks the database every interval seconds and keeps the outcome.
+
+    With interval 0 no thread is started and state() checks on every call,
+    which is the old per-probe behaviour.
+    """
+
+    def __init__(self, app, db, interval, stale_after):
+        self.app = app
+        self.db = db
+        self.interval = interval
+        self.stale_after = stale_after
+        self.expected_revision = migration_head(app)
+        self._state = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def check(self):
+        """Query the database once and store the result."""
+        started = time.perf_counter()
+        state = {'database': 'connected', 'error': None, 'migration_version': None}
+        with self.app.app_context():
+            engine = self.db.engine
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+                    try:
+                        state['migration_version'] = connection.execute(
+                            text('SELECT version_num FROM alembic_version')).scalar()
+                    except Exception:
+                        # Databases built with create_all() have no alembic_version table
+                        connection.rollback()
+            except Exception as e:
+                state.update(database='disconnected', error=str(e))
+            saturation, stats = pool_saturation(engine)
+            router = self.app.extensions.get('replica_router')
+        state.update({
+            'check_ms': round((time.perf_counter() - started) * 1000, 3),
+            'checked_at': time.monotonic(),
+            'checked_at_iso': datetime.utcnow().isoformat(),
+            'pool': {
+                'saturation': saturation,
+                'checked_out': stats.get('checked_out'),
+                'capacity': stats['size'] + max(stats['max_overflow'], 0) if 'size' in stats else None,
+                'timeouts': stats.get('timeouts')
+            }
+        })
+        if router is not None:
+            state['replicas'] = router.status()
+        if state['error'] and (self._state is None or self._state['error'] is None):
+            logger.error(f"Readiness check failed: {state['error']}")
+        with self._lock:
+            self._state = state
+        return state
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Readiness checker error: {str(e)}")
+            time.sleep(self.interval)
+
+    def start(self):
+        """Start the checker thread in this process if it is not running.
+
+        Threads do not survive a fork, so a worker forked from a process that
+        already started one gets its own.
+        """
+        if not self.interval:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='readiness-checker', daemon=True)
+            self._thread.start()
+
+    def state(self):
+        """The latest readiness report and whether the instance is ready."""
+        self.start()
+        current = self._state
+        if current is None or not self.interval:
+            current = self.check()
+        age = time.monotonic() - current['checked_at']
+        # A checker stuck on a hung connection must not keep reporting the last success
+        fresh = not self.interval or age <= self.stale_after
+        ready = current['error'] is None and fresh
+        report = {
+            'status': 'ready' if ready else 'not ready',
+            'database': current['database'] if fresh else 'unknown',
+            'timestamp': datetime.utcnow().isoformat(),
+            'checked_at': current['checked_at_iso'],
+            'check_age_seconds': round(age, 3),
+            'check_ms': current['check_ms'],
+            'migration': {
+                'version': current['migration_version'],
+                'expected': self.expected_revision,
+                'current': current['migration_version'] == self.expected_revision
+                if current['migration_version'] and self.expected_revision else None
+            },
+            'pool': current['pool']
+        }
+        if 'replicas' in current:
+            report['replicas'] = current['replicas']
+        if current['error']:
+            report['error'] = current['error']
+        elif not fresh:
+            report['error'] = f'last database check finished {age:.0f}s ago'
+        return ready, report
+
+
+def init_readiness(app, db):
+    """Create the readiness monitor of app and start its checker thread."""
+    interval = app.config['READINESS_CHECK_INTERVAL']
+    stale_after = app.config['READINESS_STALE_AFTER'] or 3 * interval
+    monitor = ReadinessMonitor(app, db, interval, stale_after)
+    app.extensions['readiness'] = monitor
+    monitor.start()
+    return monitor
@@ -0,0 +1,169 @@
+import functools
+import itertools
+import logging
+import os
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = 'replica_'
+PIN_COOKIE = 'db_primary_until'
+CONSISTENCY_HEADER = 'X-Read-Consistency'
+
+
+def replica_binds(urls):
+    """SQLALCHEMY_BINDS entries for a comma-separated list of replica URLs."""
+    urls = [url.strip() for url in urls.split(',') if url.strip()] if urls else []
+    return {f'{REPLICA_BIND_PREFIX}{index}': url for index, url in enumerate(urls)}
+
+
+class ReplicaRouter:
+    """Round-robin over replica engines, skipping replicas that failed their last health probe.
+
+    A background thread probes every replica each health_interval seconds,
+    so a hanging replica holds up the next probe rather than requests;
+    choose() only reads the recorded results. A replica gets no reads until
+    its first probe has passed. With health_interval 0 no thread is started
+    and check() must be called explicitly.
+    """
+
+    def __init__(self, app, db, bind_keys, health_interval, probe_timeout):
+        self.app = app
+        self.db = db
+        self.bind_keys = list(bind_keys)
+        self.health_interval = health_interval
+        self.probe_timeout = probe_timeout
+        self._cycle = itertools.cycle(self.bind_keys)
+        self._lock = threading.Lock()
+        self._health = {}
+        self._thread = None
+        self._pid = None
+
+    def _probe(self, key):
+        engine = self.db.engines[key]
+        with engine.connect() as connection:
+            if engine.dialect.name == 'postgresql':
+                connection.execute(text(f'SET LOCAL statement_timeout = {int(self.probe_timeout * 1000)}'))
+            connection.execute(text('SELECT 1'))
+
+    def check(self):
+        """Probe every replica once and record which are healthy."""
+        with self.app.app_context():
+            for key in self.bind_keys:
+                try:
+                    self._probe(key)
+                    healthy = True
+                except Exception as e:
+                    if self._health.get(key, True):
+                        logger.warning(f"Read replica {key} is unavailable: {str(e)}")
+                    healthy = False
+                with self._lock:
+                    self._health[key] = healthy
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Replica health checker error: {str(e)}")
+            time.sleep(self.health_interval)
+
+    def start(self):
+        """Start the health checker thread in this process if it is not running."""
+        if not self.health_interval:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='replica-health-checker', daemon=True)
+            self._thread.start()
+
+    def choose(self):
+        """Return the bind key of the next healthy replica, or None for the primary."""
+        self.start()
+        with self._lock:
+            for _ in range(len(self.bind_keys)):
+                key = next(self._cycle)
+                if self._health.get(key):
+                    return key
+        return None
+
+    def status(self):
+        """Whether each replica passed its last probe, None before the first."""
+        return {key: self._health.get(key) for key in self.bind_keys}
+
+
+def init_routing(app, db):
+    """Register replica binds and the read-your-writes cookie for app.
+
+    Must run before db.init_app so the replica engines are created.
+    """
+    binds = replica_binds(app.config.get('DATABASE_REPLICA_URLS'))
+    if not binds:
+        return None
+    probe_timeout = app.config['REPLICA_PROBE_TIMEOUT']
+    engines = {}
+    for key, url in binds.items():
+        engines[key] = url
+        if url.startswith('postgresql'):
+            # An unreachable replica fails its probe instead of hanging it
+            engines[key] = {'url': url, 'connect_args': {'connect_timeout': max(1, int(probe_timeout))}}
+    app.config['SQLALCHEMY_BINDS'] = {**(app.config.get('SQLALCHEMY_BINDS') or {}), **engines}
+    router = ReplicaRouter(app, db, binds, app.config['REPLICA_HEALTH_INTERVAL'], probe_timeout)
+    app.extensions['replica_router'] = router
+
+    @app.after_request
+    def pin_after_write(response):
+        pin_seconds = app.config['READ_YOUR_WRITES_SECONDS']
+        if pin_seconds and request.method in ('POST', 'PUT', 'PATCH', 'DELETE') \
+                and response.status_code < 400:
+            response.set_cookie(PIN_COOKIE, str(int(time.time()) + pin_seconds),
+                                max_age=pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+    logger.info(f"Routing reads to {len(binds)} replica(s)")
+    return router
+
+
+def _pinned_to_primary():
+    """True when this client asked for, or recently made, a write it must see."""
+    if request.headers.get(CONSISTENCY_HEADER, '').lower() == 'primary':
+        return True
+    try:
+        return int(request.cookies.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def replica_read(view):
+    """Mark a read-only view so its queries may be served by a replica."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.replica_read = not _pinned_to_primary()
+        g.pop('replica_bind', None)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(Session):
+    """Session that sends reads from replica_read views to a replica.
+
+    The replica is picked once per request so all reads in a request see the
+    same snapshot. Flushes and any request not marked read-only use the
+    primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('replica_read'):
+            router = current_app.extensions.get('replica_router')
+            if router is not None:
+                if 'replica_bind' not in g:
+                    g.replica_bind = router.choose()
+                if g.replica_bind is not None:
+                    return self._db.engines[g.replica_bind]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,195 @@
+import bisect
+from datetime import date, datetime, time, timedelta
+from flask import current_app
+from sqlalchemy import DDL, event, func
+from models import Appointment
+
+# Every appointment occupies one fixed-length slot starting at appointment_datetime
+SLOT_MINUTES = 30
+SLOT = timedelta(minutes=SLOT_MINUTES)
+CONFLICT_MESSAGE = 'appointment slot conflict'
+
+# The database rejects overlapping bookings itself, so concurrent requests and
+# bulk inserts cannot double book. Each check is a range scan of
+# ix_appointment_doctor_datetime. An update is only checked when it moves a
+# booking or makes it occupy its slot again (from cancelled or deleted), so a
+# double booking made before the check existed can still be completed or
+# annotated.
+SQLITE_SLOT_CHANGED = """(old.doctor_name IS NOT new.doctor_name
+        OR old.appointment_datetime IS NOT new.appointment_datetime
+        OR COALESCE(old.status, '') = 'cancelled' OR old.deleted_at IS NOT NULL)"""
+
+SQLITE_SCHEDULING_DDL = [
+    f"""CREATE TRIGGER IF NOT EXISTS appointment_slot_check_{name}
+    BEFORE {event_name} ON appointment
+    WHEN COALESCE(new.status, '') <> 'cancelled' AND new.deleted_at IS NULL{condition}
+    BEGIN
+        SELECT RAISE(ABORT, '{CONFLICT_MESSAGE}') WHERE EXISTS (
+            SELECT 1 FROM appointment
+            WHERE doctor_name = new.doctor_name
+              AND appointment_datetime > strftime('%Y-%m-%d %H:%M:%S', new.appointment_datetime,
+                                                  '-{SLOT_MINUTES} minutes') || substr(new.appointment_datetime, 20)
+              AND appointment_datetime < strftime('%Y-%m-%d %H:%M:%S', new.appointment_datetime,
+                                                  '+{SLOT_MINUTES} minutes') || substr(new.appointment_datetime, 20)
+              AND COALESCE(status, '') <> 'cancelled'
+              AND deleted_at IS NULL
+              AND id IS NOT new.id
+        );
+    END"""
+    for name, event_name, condition in (
+        ('insert', 'INSERT', ''),
+        ('update', 'UPDATE OF doctor_name, appointment_datetime, status, deleted_at',
+         f'\n    AND {SQLITE_SLOT_CHANGED}')
+    )
+]
+
+POSTGRESQL_SCHEDULING_DDL = [
+    f"""CREATE OR REPLACE FUNCTION appointment_slot_check() RETURNS trigger AS $$
+    BEGIN
+        IF COALESCE(NEW.status, '') = 'cancelled' OR NEW.deleted_at IS NOT NULL THEN
+            RETURN NEW;
+        END IF;
+        IF TG_OP = 'UPDATE' AND NEW.doctor_name = OLD.doctor_name
+           AND NEW.appointment_datetime = OLD.appointment_datetime
+           AND COALESCE(OLD.status, '') <> 'cancelled' AND OLD.deleted_at IS NULL THEN
+            -- Already held this slot
+            RETURN NEW;
+        END IF;
+        -- Serialize bookings per doctor so two transactions cannot both pass the check
+        PERFORM pg_advisory_xact_lock(hashtext('appointment:' || NEW.doctor_name));
+        IF EXISTS (
+            SELECT 1 FROM appointment
+            WHERE doctor_name = NEW.doctor_name
+              AND appointment_datetime > NEW.appointment_datetime - interval '{SLOT_MINUTES} minutes'
+              AND appointment_datetime < NEW.appointment_datetime + interval '{SLOT_MINUTES} minutes'
+              AND COALESCE(status, '') <> 'cancelled'
+              AND deleted_at IS NULL
+              AND id <> NEW.id
+        ) THEN
+            RAISE EXCEPTION '{CONFLICT_MESSAGE}' USING ERRCODE = 'exclusion_violation';
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE TRIGGER appointment_slot_check
+    BEFORE INSERT OR UPDATE OF doctor_name, appointment_datetime, status, deleted_at ON appointment
+    FOR EACH ROW EXECUTE FUNCTION appointment_slot_check()"""
+]
+
+for dialect, statements in (('sqlite', SQLITE_SCHEDULING_DDL), ('postgresql', POSTGRESQL_SCHEDULING_DDL)):
+    for statement in statements:
+        # DDL() applies %-formatting to its statement
+        event.listen(Appointment.__table__, 'after_create',
+                     DDL(statement.replace('%', '%%')).execute_if(dialect=dialect))
+
+
+class SchedulingError(ValueError):
+    """Raised when availability parameters are invalid."""
+
+
+class SlotConflictError(ValueError):
+    """Raised when an appointment overlaps another booking of the same doctor."""
+
+    def __init__(self, message, conflict_id=None):
+        super().__init__(message)
+        self.conflict_id = conflict_id
+
+
+def is_conflict_error(error):
+    """True if a database error was raised by the slot check triggers."""
+    return CONFLICT_MESSAGE in str(getattr(error, 'orig', error))
+
+
+def booked(doctor_name, start, end, exclude_id=None):
+    """Active appointments of doctor_name whose slot overlaps [start, end)."""
+    query = Appointment.query.filter(
+        Appointment.doctor_name == doctor_name,
+        Appointment.appointment_datetime > start - SLOT,
+        Appointment.appointment_datetime < end,
+        func.coalesce(Appointment.status, '') != 'cancelled'
+    )
+    if exclude_id is not None:
+        query = query.filter(Appointment.id != exclude_id)
+    return query
+
+
+def check_slot(doctor_name, start, status='scheduled', exclude_id=None):
+    """Raise SlotConflictError if start is not free for doctor_name."""
+    if status == 'cancelled':
+        return
+    conflict_id = booked(doctor_name, start, start + SLOT, exclude_id) \
+        .with_entities(Appointment.id).order_by(Appointment.appointment_datetime).limit(1).scalar()
+    if conflict_id is not None:
+        raise SlotConflictError(
+            f'{doctor_name} already has an appointment overlapping {start.isoformat()}',
+            conflict_id
+        )
+
+
+def check_slots(valid):
+    """Reject bulk appointment items that overlap a booking or an earlier item.
+
+    Reads the existing bookings of each doctor once, over the time span the
+    batch covers.
+    """
+    errors = {}
+    by_doctor = {}
+    for index, values in valid:
+        if values.get('status') != 'cancelled':
+            by_doctor.setdefault(values['doctor_name'], []).append((index, values))
+    for doctor_name, items in by_doctor.items():
+        starts = [values['appointment_datetime'] for _, values in items]
+        taken = sorted(
+            row[0] for row in booked(doctor_name, min(starts), max(starts) + SLOT)
+            .with_entities(Appointment.appointment_datetime)
+        )
+        for index, values in items:
+            start = values['appointment_datetime']
+            position = bisect.bisect_right(taken, start - SLOT)
+            if position < len(taken) and taken[position] < start + SLOT:
+                errors[index] = f'{doctor_name} already has an appointment overlapping {start.isoformat()}'
+                continue
+            bisect.insort(taken, start)
+    return errors
+
+
+def parse_day(args):
+    """Read the required ?date=YYYY-MM-DD parameter."""
+    value = args.get('date')
+    if not value:
+        raise SchedulingError('date is required, e.g. 2024-12-01')
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise SchedulingError('date must be an ISO date, e.g. 2024-12-01')
+
+
+def availability(doctor_name, day):
+    """Free and booked slots of doctor_name within the working hours of day.
+
+    Free slots are laid on a SLOT_MINUTES grid from SCHEDULE_DAY_START; a
+    booking off the grid blocks every grid slot it overlaps.
+    """
+    opens = datetime.combine(day, time.fromisoformat(current_app.config['SCHEDULE_DAY_START']))
+    closes = datetime.combine(day, time.fromisoformat(current_app.config['SCHEDULE_DAY_END']))
+    taken = [
+        row[0] for row in booked(doctor_name, opens, closes)
+        .with_entities(Appointment.appointment_datetime)
+        .order_by(Appointment.appointment_datetime)
+    ]
+
+    free = []
+    slot = opens
+    while slot + SLOT <= closes:
+        # taken is sorted, so the first booking after slot - SLOT is the only candidate overlap
+        position = bisect.bisect_right(taken, slot - SLOT)
+        if position == len(taken) or taken[position] >= slot + SLOT:
+            free.append({'start': slot.isoformat(), 'end': (slot + SLOT).isoformat()})
+        slot += SLOT
+    return {
+        'doctor_name': doctor_name,
+        'date': day.isoformat(),
+        'slot_minutes': SLOT_MINUTES,
+        'available': free,
+        'booked': [{'start': t.isoformat(), 'end': (t + SLOT).isoformat()} for t in taken]
+    }
@@ -0,0 +1,32 @@
+"""Creating the schema of a new database.
+
+Migrations (migrations/, applied with ``flask db upgrade``) own every
+database that has tables already. An empty database is built with
+create_all() and stamped with the latest revision, so later upgrades start
+from there instead of recreating what it has.
+"""
+import logging
+import os
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def init_schema(app, db):
+    """Create and stamp the tables of an empty primary database; return whether it was empty."""
+    with app.app_context():
+        # Only the primary; replica binds receive the schema through replication
+        with db.engine.begin() as connection:
+            if connection.dialect.name == 'postgresql':
+                # Workers starting together on a new database create it once
+                connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('healthcare_schema'))"))
+            if inspect(connection).get_table_names():
+                return False
+            db.metadata.create_all(connection)
+            MigrationContext.configure(connection).stamp(ScriptDirectory(MIGRATIONS_DIRECTORY), 'heads')
+    logger.info("Database tables created successfully")
+    return True
@@ -0,0 +1,100 @@
+import re
+from flask import current_app
+from sqlalchemy import DDL, column, event, func, or_, select, table
+from models import db, Patient
+
+SEARCH_TABLE = 'patient_search'
+
+# SQLite fallback: an external-content FTS5 index over the patient columns,
+# kept in sync by triggers. Prefix indexes make 'jo*' style lookups cheap.
+SQLITE_SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        name, email, phone, content='patient', content_rowid='id', prefix='2 3')""",
+    f"""CREATE TRIGGER IF NOT EXISTS patient_search_ai AFTER INSERT ON patient BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, name, email, phone)
+        VALUES (new.id, new.name, new.email, new.phone);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS patient_search_ad AFTER DELETE ON patient BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, email, phone)
+        VALUES ('delete', old.id, old.name, old.email, old.phone);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS patient_search_au AFTER UPDATE ON patient BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, email, phone)
+        VALUES ('delete', old.id, old.name, old.email, old.phone);
+        INSERT INTO {SEARCH_TABLE}(rowid, name, email, phone)
+        VALUES (new.id, new.name, new.email, new.phone);
+    END"""
+]
+
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Patient.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Patient.__table__, 'before_drop',
+             DDL(f'DROP TABLE IF EXISTS {SEARCH_TABLE}').execute_if(dialect='sqlite'))
+# The trigram indexes declared on Patient need the pg_trgm operator classes
+event.listen(Patient.__table__, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+
+fts = table(SEARCH_TABLE, column('rowid'), column(SEARCH_TABLE), column('rank'))
+
+
+class SearchError(ValueError):
+    """Raised when search parameters are invalid."""
+
+
+def parse_query(args):
+    """Read ?q= and check it is long enough to be served from the index."""
+    q = ' '.join(args.get('q', '').split())
+    minimum = current_app.config['SEARCH_MIN_LENGTH']
+    if len(q) < minimum:
+        raise SearchError(f'q must be at least {minimum} characters')
+    return q
+
+
+def fts_expression(q):
+    """Turn free text into an FTS5 query matching every term as a prefix."""
+    terms = re.findall(r'\w+', q)
+    if not terms:
+        raise SearchError('q must contain letters or digits')
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_patients(q, limit):
+    """Return up to limit patients matching q, best match first.
+
+    PostgreSQL matches substrings of name, email and phone through the
+    trigram GIN indexes and ranks by trigram similarity. SQLite matches
+    term prefixes through the FTS5 index and ranks by bm25.
+
+    Only the first SEARCH_MAX_CANDIDATES matches are ranked, so a very
+    common term costs the same as a rare one. Queries with fewer matches
+    than that are ranked exactly.
+    """
+    candidates = current_app.config['SEARCH_MAX_CANDIDATES']
+    query = Patient.query.with_entities(*Patient.columns())
+    dialect = db.session.get_bind(mapper=Patient.__mapper__).dialect.name
+    if dialect == 'sqlite':
+        match = fts.c[SEARCH_TABLE].op('MATCH')(fts_expression(q))
+        # FTS5 can bound a MATCH by rowid, which keeps bm25 off the other rows
+        window = select(fts.c.rowid).where(match).limit(candidates).subquery()
+        bound = select(func.max(window.c.rowid)).scalar_subquery()
+        query = query.join(fts, fts.c.rowid == Patient.id) \
+            .filter(match, fts.c.rowid <= bound) \
+            .order_by(fts.c.rank, Patient.id)
+    else:
+        pattern = f'%{escape_like(q)}%'
+        searched = (Patient.name, Patient.email, Patient.phone)
+        window = select(Patient.id) \
+            .where(or_(*(c.ilike(pattern, escape='\\') for c in searched))) \
+            .limit(candidates)
+        query = query.filter(Patient.id.in_(window))
+        if dialect == 'postgresql':
+            score = func.greatest(*(func.similarity(c, q) for c in searched))
+            query = query.order_by(score.desc(), Patient.id)
+        else:
+            query = query.order_by(Patient.name, Patient.id)
+    serialize = Patient.row_serializer()
+    return [serialize(row) for row in query.limit(limit)]
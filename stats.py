@@ -0,0 +1,231 @@
+from collections import Counter
+import click
+from sqlalchemy import event, func, inspect, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from models import (db, Appointment, AppointmentArchive, AppointmentDailyStat, AppointmentStatusStat,
+                    BloodGroupStat, Patient)
+from routing import RoutingSession
+
+# Summary tables behind GET /api/stats. Every ORM insert, update and delete of
+# an Appointment or Patient adds +1/-1 deltas to the rows it affects; soft
+# deleted rows are not counted and archived appointments still are. The
+# deltas of a flush are written with one upsert per table inside the same
+# transaction, so the counters commit or roll back with the change itself.
+UNKNOWN = 'unknown'
+DELTAS_KEY = 'stats_deltas'
+
+
+def _status(value):
+    return value or UNKNOWN
+
+
+def _appointment_keys(status, doctor_name, appointment_datetime):
+    status = _status(status)
+    return [
+        (AppointmentStatusStat, (status,)),
+        (AppointmentDailyStat, (appointment_datetime.date(), doctor_name, status))
+    ]
+
+
+def _patient_keys(blood_group):
+    return [(BloodGroupStat, (blood_group or UNKNOWN,))]
+
+
+KEYS = {
+    Appointment: (('status', 'doctor_name', 'appointment_datetime'), _appointment_keys),
+    Patient: (('blood_group',), _patient_keys)
+}
+
+
+def _record(deltas, model, values, sign):
+    _, keys = KEYS[model]
+    for table_model, key in keys(*values):
+        deltas[table_model][key] += sign
+
+
+def _new_deltas():
+    return {AppointmentStatusStat: Counter(), AppointmentDailyStat: Counter(), BloodGroupStat: Counter()}
+
+
+def _deltas(session):
+    return session.info.setdefault(DELTAS_KEY, _new_deltas())
+
+
+def _current(model, target):
+    return [getattr(target, name) for name in KEYS[model][0]]
+
+
+def _previous(model, target):
+    """Values of the counted attributes before this flush's changes."""
+    attrs = inspect(target).attrs
+    values = []
+    for name in KEYS[model][0]:
+        history = attrs[name].history
+        values.append(history.deleted[0] if history.deleted else getattr(target, name))
+    return values
+
+
+def _was_deleted(target):
+    history = inspect(target).attrs.deleted_at.history
+    return (history.deleted[0] if history.deleted else target.deleted_at) is not None
+
+
+def _listen(model):
+    # Soft deleted rows are not counted: setting deleted_at subtracts the row
+    # and clearing it adds the row back
+    def after_insert(mapper, connection, target):
+        if target.deleted_at is None:
+            _record(_deltas(inspect(target).session), model, _current(model, target), 1)
+
+    def after_update(mapper, connection, target):
+        old, new = _previous(model, target), _current(model, target)
+        was_live, is_live = not _was_deleted(target), target.deleted_at is None
+        if (old, was_live) != (new, is_live):
+            deltas = _deltas(inspect(target).session)
+            if was_live:
+                _record(deltas, model, old, -1)
+            if is_live:
+                _record(deltas, model, new, 1)
+
+    def before_delete(mapper, connection, target):
+        # Read the values while the row still exists, in case they are expired
+        if not _was_deleted(target):
+            _record(_deltas(inspect(target).session), model, _previous(model, target), -1)
+
+    event.listen(model, 'after_insert', after_insert)
+    event.listen(model, 'after_update', after_update)
+    event.listen(model, 'before_delete', before_delete)
+
+
+for _model in KEYS:
+    _listen(_model)
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _reset_deltas(session, flush_context, instances):
+    # Deltas of a flush that failed were never written
+    session.info.pop(DELTAS_KEY, None)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _write_deltas(session, flush_context):
+    deltas = session.info.pop(DELTAS_KEY, None)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def apply_deltas(connection, deltas):
+    """Add each {summary model: Counter(key: delta)} to the summary tables."""
+    for table_model, counter in deltas.items():
+        table = table_model.__table__
+        key_columns = [c.name for c in table.primary_key.columns]
+        # Sorted keys give concurrent transactions the same row lock order
+        rows = [
+            {**dict(zip(key_columns, key)), 'count': delta}
+            for key, delta in sorted(counter.items()) if delta
+        ]
+        if not rows:
+            continue
+        insert = postgresql.insert if connection.dialect.name == 'postgresql' else sqlite.insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={'count': table.c.count + stmt.excluded['count']}
+        )
+        connection.execute(stmt, rows)
+
+
+def _record_rows(model, rows, sign):
+    if model not in KEYS:
+        return
+    deltas = _new_deltas()
+    names = KEYS[model][0]
+    for values in rows:
+        _record(deltas, model, [values.get(name) for name in names], sign)
+    apply_deltas(db.session.connection(), deltas)
+
+
+def record_inserts(model, rows):
+    """Count rows written with Core INSERTs (bulk creates), which skip ORM events."""
+    _record_rows(model, rows, 1)
+
+
+def record_deletes(model, rows):
+    """Uncount rows soft deleted with Core UPDATEs (archived history), which skip ORM events."""
+    _record_rows(model, rows, -1)
+
+
+def rebuild_stats():
+    """Recompute every summary table from the base tables in one transaction.
+
+    Counts live appointments in both appointment and appointment_archive.
+    """
+    appointments = union_all(*(
+        select(table.c.status, table.c.doctor_name, table.c.appointment_datetime)
+        .where(table.c.deleted_at.is_(None))
+        for table in (Appointment.__table__, AppointmentArchive.__table__)
+    )).subquery()
+    status = func.coalesce(appointments.c.status, UNKNOWN)
+    day = func.date(appointments.c.appointment_datetime)
+    blood_group = func.coalesce(Patient.blood_group, UNKNOWN)
+    sources = {
+        AppointmentStatusStat: select(status, func.count()).group_by(status),
+        AppointmentDailyStat: select(day, appointments.c.doctor_name, status, func.count())
+        .group_by(day, appointments.c.doctor_name, status),
+        BloodGroupStat: select(blood_group, func.count()).where(Patient.deleted_at.is_(None))
+        .group_by(blood_group)
+    }
+    for table_model, source in sources.items():
+        table = table_model.__table__
+        db.session.execute(table.delete())
+        db.session.execute(table.insert().from_select([c.name for c in table.columns], source))
+    db.session.commit()
+
+
+def get_stats(start=None, end=None):
+    """Summary counts for the dashboard; the daily breakdown covers [start, end)."""
+    daily = db.session.query(AppointmentDailyStat).filter(AppointmentDailyStat.count > 0)
+    if start:
+        daily = daily.filter(AppointmentDailyStat.day >= start)
+    if end:
+        daily = daily.filter(AppointmentDailyStat.day < end)
+
+    per_doctor_day = {}
+    for row in daily.order_by(AppointmentDailyStat.day, AppointmentDailyStat.doctor_name):
+        entry = per_doctor_day.setdefault((row.day, row.doctor_name), {
+            'date': row.day.isoformat(),
+            'doctor_name': row.doctor_name,
+            'total': 0,
+            'by_status': {}
+        })
+        entry['total'] += row.count
+        entry['by_status'][row.status] = row.count
+
+    by_status = {
+        row.status: row.count
+        for row in AppointmentStatusStat.query.filter(AppointmentStatusStat.count > 0)
+    }
+    by_blood_group = {
+        row.blood_group: row.count
+        for row in BloodGroupStat.query.filter(BloodGroupStat.count > 0)
+    }
+    return {
+        'appointments_total': sum(by_status.values()),
+        'appointments_by_status': by_status,
+        'appointments_per_doctor_per_day': list(per_doctor_day.values()),
+        'patients_total': sum(by_blood_group.values()),
+        'patients_by_blood_group': by_blood_group
+    }
+
+
+def init_stats(app):
+    """Register the ``flask stats rebuild`` command."""
+    @app.cli.group('stats')
+    def stats_cli():
+        """Summary tables behind /api/stats."""
+
+    @stats_cli.command('rebuild')
+    def rebuild_command():
+        """Recompute the summary tables from scratch (backfill)."""
+        rebuild_stats()
+        click.echo('Rebuilt appointment and patient statistics')
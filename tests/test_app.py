@@ -2,12 +2,66 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import asyncio
+import json
 import pytest
+from http import HTTPStatus
+from sqlalchemy import event
+from werkzeug.test import Client
 from app import create_app
+from asgi import ASGIApp
 from models import db, Patient, Appointment, MedicalRecord
 from datetime import datetime, date
 
 
+class ASGIToWSGI:
+    """Drive an ASGI app from a WSGI call so werkzeug's test client can exercise it."""
+    
+    def __init__(self, asgi_app):
+        self.asgi_app = asgi_app
+    
+    def __call__(self, environ, start_response):
+        body = environ['wsgi.input'].read(int(environ.get('CONTENT_LENGTH') or 0))
+        headers = [
+            (key[5:].replace('_', '-').lower().encode('latin-1'), value.encode('latin-1'))
+            for key, value in environ.items() if key.startswith('HTTP_')
+        ]
+        for key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            if environ.get(key):
+                headers.append((key.replace('_', '-').lower().encode('latin-1'), environ[key].encode('latin-1')))
+        scope = {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': environ['REQUEST_METHOD'],
+            'scheme': 'http',
+            'path': environ['PATH_INFO'].encode('latin-1').decode('utf-8'),
+            'root_path': '',
+            'query_string': environ['QUERY_STRING'].encode('latin-1'),
+            'headers': headers,
+            'server': ('localhost', 80),
+            'client': ('127.0.0.1', 50000)
+        }
+        messages = []
+        incoming = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        
+        async def receive():
+            if incoming:
+                return incoming.pop(0)
+            # Like a server whose client stays connected until the response is complete
+            await asyncio.Future()
+        
+        async def send(message):
+            messages.append(message)
+        
+        asyncio.run(self.asgi_app(scope, receive, send))
+        start = messages[0]
+        start_response(
+            f"{start['status']} {HTTPStatus(start['status']).phrase}",
+            [(name.decode('latin-1'), value.decode('latin-1')) for name, value in start['headers']]
+        )
+        return (message.get('body', b'') for message in messages[1:])
+
+
 @pytest.fixture
 def app():
     """Create and configure a test app."""
@@ -19,10 +73,12 @@ def app():
         db.drop_all()
 
 
-@pytest.fixture
-def client(app):
-    """Create a test client."""
-    return app.test_client()
+@pytest.fixture(params=['wsgi', 'asgi'])
+def client(request, app):
+    """Create a test client for the WSGI app and for the ASGI entry point."""
+    if request.param == 'wsgi':
+        return app.test_client()
+    return Client(ASGIToWSGI(ASGIApp(app.wsgi_app, max_threads=4)), response_wrapper=app.response_class)
 
 
 class TestHealthEndpoints:
@@ -99,6 +155,46 @@ class TestPatientEndpoints:
         assert data['success'] is True
         assert data['count'] == 2
     
+    def test_export_patient_records(self, client):
+        """Test streaming a patient's records and exporting an empty history."""
+        patient_response = client.post('/api/patients', json={
+            'name': 'Export History',
+            'date_of_birth': '1990-01-01',
+            'email': 'exporthistory@example.com'
+        })
+        patient_id = patient_response.get_json()['data']['id']
+        client.post('/api/records', json={
+            'patient_id': patient_id,
+            'diagnosis': 'Flu',
+            'doctor_name': 'Dr. A'
+        })
+        
+        response = client.get(f'/api/patients/{patient_id}/records/export?format=json')
+        assert response.status_code == 200
+        records = json.loads(response.get_data(as_text=True))
+        assert [r['diagnosis'] for r in records] == ['Flu']
+        
+        assert client.get('/api/patients/999/records/export').status_code == 404
+    
+    def test_bulk_create_medical_records(self, client):
+        """Test bulk creating medical records."""
+        patient_response = client.post('/api/patients', json={
+            'name': 'Bulk Record Patient',
+            'date_of_birth': '1990-01-01',
+            'email': 'bulkrecord@example.com'
+        })
+        patient_id = patient_response.get_json()['data']['id']
+        items = [
+            {'patient_id': patient_id, 'diagnosis': 'Flu', 'doctor_name': 'Dr. A', 'record_date': '2024-01-01'},
+            {'patient_id': patient_id, 'diagnosis': 'Cold', 'doctor_name': 'Dr. B'},
+        ]
+        response = client.post('/api/records/bulk', json=items)
+        assert response.status_code == 201
+        
+        records = client.get(f'/api/patients/{patient_id}/records').get_json()['data']
+        assert [r['diagnosis'] for r in records] == ['Flu', 'Cold']
+        assert records[0]['record_date'] == '2024-01-01'
+    
     def test_get_single_patient(self, client):
         """Test getting a specific patient."""
         # Create a patient
@@ -161,6 +257,207 @@ class TestPatientEndpoints:
         get_response = client.get(f'/api/patients/{patient_id}')
         assert get_response.status_code == 404
 
+    
+    def test_get_patients_keyset_pagination(self, client):
+        """Test paging through patients with limit and next_cursor."""
+        for i in range(5):
+            client.post('/api/patients', json={
+                'name': f'Page Patient {i}',
+                'date_of_birth': '1990-01-01',
+                'email': f'page{i}@example.com'
+            })
+        
+        response = client.get('/api/patients?limit=2')
+        data = response.get_json()
+        assert response.status_code == 200
+        assert data['count'] == 2
+        assert 'total' not in data
+        assert data['next_cursor'] is not None
+        
+        seen = [p['id'] for p in data['data']]
+        while data['next_cursor']:
+            data = client.get(f"/api/patients?limit=2&cursor={data['next_cursor']}").get_json()
+            seen.extend(p['id'] for p in data['data'])
+        assert len(seen) == 5
+        assert seen == sorted(seen)
+    
+    def test_get_patients_fields_projection_and_count(self, client):
+        """Test selecting a subset of columns and requesting the total."""
+        client.post('/api/patients', json={
+            'name': 'Projected',
+            'date_of_birth': '1990-01-01',
+            'email': 'projected@example.com'
+        })
+        response = client.get('/api/patients?fields=name,date_of_birth&count=true')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['total'] == 1
+        assert data['data'][0] == {'id': 1, 'name': 'Projected', 'date_of_birth': '1990-01-01'}
+    
+    def test_get_patients_invalid_pagination(self, client):
+        """Test that bad cursors, fields and deep offsets are rejected."""
+        assert client.get('/api/patients?cursor=not-a-cursor').status_code == 400
+        assert client.get('/api/patients?fields=password').status_code == 400
+        assert client.get('/api/patients?offset=1000000').status_code == 400
+
+    
+    def test_bulk_create_patients(self, app, client):
+        """Test bulk creating patients with per-item results."""
+        app.config['BULK_BATCH_SIZE'] = 2
+        client.post('/api/patients', json={
+            'name': 'Existing',
+            'date_of_birth': '1990-01-01',
+            'email': 'existing@example.com'
+        })
+        items = [
+            {'name': 'Bulk One', 'date_of_birth': '1990-01-01', 'email': 'bulk1@example.com'},
+            {'name': 'Bulk Two', 'date_of_birth': '1991-02-02', 'email': 'bulk2@example.com'},
+            {'name': 'No Email', 'date_of_birth': '1990-01-01'},
+            {'name': 'Taken', 'date_of_birth': '1990-01-01', 'email': 'existing@example.com'},
+            {'name': 'Bulk Three', 'date_of_birth': '1992-03-03', 'email': 'bulk3@example.com'},
+            {'name': 'Repeat', 'date_of_birth': '1990-01-01', 'email': 'bulk1@example.com'},
+        ]
+        response = client.post('/api/patients/bulk', json=items)
+        assert response.status_code == 207
+        data = response.get_json()
+        assert data['created'] == 3
+        assert data['failed'] == 3
+        assert [r['success'] for r in data['results']] == [True, True, False, False, True, False]
+        assert 'Missing required field: email' in data['results'][2]['error']
+        
+        created_id = data['results'][4]['id']
+        patient = client.get(f'/api/patients/{created_id}').get_json()['data']
+        assert patient['name'] == 'Bulk Three'
+        assert patient['created_at'] is not None
+    
+    def test_bulk_create_patients_ndjson(self, client):
+        """Test bulk creating patients from an NDJSON body."""
+        body = '\n'.join(json.dumps({
+            'name': f'Line {i}',
+            'date_of_birth': '1990-01-01',
+            'email': f'line{i}@example.com'
+        }) for i in range(3))
+        response = client.post('/api/patients/bulk', data=body, content_type='application/x-ndjson')
+        assert response.status_code == 201
+        assert response.get_json()['created'] == 3
+        
+        response = client.post('/api/patients/bulk', data='{not json', content_type='application/x-ndjson')
+        assert response.status_code == 400
+        assert client.post('/api/patients/bulk', json={'name': 'x'}).status_code == 400
+
+    
+    def test_get_patients_include_history_fixed_queries(self, app, client):
+        """Test that embedding history costs a fixed number of queries."""
+        for i in range(3):
+            response = client.post('/api/patients', json={
+                'name': f'History {i}',
+                'date_of_birth': '1990-01-01',
+                'email': f'include{i}@example.com'
+            })
+            patient_id = response.get_json()['data']['id']
+            client.post('/api/appointments', json={
+                'patient_id': patient_id,
+                'doctor_name': 'Dr. Include',
+                'appointment_datetime': f'2024-12-01 1{i}:00:00'
+            })
+            client.post('/api/records', json={
+                'patient_id': patient_id,
+                'diagnosis': f'Diagnosis {i}',
+                'doctor_name': 'Dr. Include'
+            })
+        
+        statements = []
+        
+        def count_selects(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', count_selects)
+        try:
+            response = client.get('/api/patients?include=appointments,records')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count_selects)
+        
+        assert response.status_code == 200
+        data = response.get_json()['data']
+        assert len(data) == 3
+        assert all(len(p['appointments']) == 1 and len(p['records']) == 1 for p in data)
+        assert len(statements) == 3
+    
+    def test_get_single_patient_include(self, client):
+        """Test embedding history on a single patient and rejecting unknown includes."""
+        response = client.post('/api/patients', json={
+            'name': 'Single Include',
+            'date_of_birth': '1990-01-01',
+            'email': 'singleinclude@example.com'
+        })
+        patient_id = response.get_json()['data']['id']
+        client.post('/api/records', json={
+            'patient_id': patient_id,
+            'diagnosis': 'Flu',
+            'doctor_name': 'Dr. A'
+        })
+        
+        data = client.get(f'/api/patients/{patient_id}?include=records').get_json()['data']
+        assert [r['diagnosis'] for r in data['records']] == ['Flu']
+        assert 'appointments' not in data
+        
+        assert client.get(f'/api/patients/{patient_id}?include=billing').status_code == 400
+        assert client.get('/api/patients?include=records&fields=name').status_code == 400
+        assert client.get('/api/patients/999?include=records').status_code == 404
+    
+    def test_search_patients(self, client):
+        """Test searching patients by name, email and phone prefixes."""
+        for name, email, phone in [
+            ('John Smith', 'jsmith@example.com', '555-0100'),
+            ('Johanna Doe', 'jdoe@example.com', None),
+            ('Bob Jones', 'bob@example.org', '555-0199')
+        ]:
+            client.post('/api/patients', json={
+                'name': name,
+                'date_of_birth': '1990-01-01',
+                'email': email,
+                'phone': phone
+            })
+        
+        def names(query):
+            response = client.get(f'/api/patients/search?{query}')
+            assert response.status_code == 200
+            return sorted(p['name'] for p in response.get_json()['data'])
+        
+        assert names('q=joh') == ['Johanna Doe', 'John Smith']
+        assert names('q=john+smi') == ['John Smith']
+        assert names('q=example.org') == ['Bob Jones']
+        assert names('q=555') == ['Bob Jones', 'John Smith']
+        assert names('q=zzz') == []
+        assert len(names('q=joh&limit=1')) == 1
+    
+    def test_search_reflects_writes(self, client):
+        """Test that updated and deleted patients are reindexed."""
+        response = client.post('/api/patients', json={
+            'name': 'Carol King',
+            'date_of_birth': '1990-01-01',
+            'email': 'carol@example.com'
+        })
+        patient_id = response.get_json()['data']['id']
+        client.put(f'/api/patients/{patient_id}', json={'name': 'Carla Queen'})
+        
+        assert client.get('/api/patients/search?q=carol+king').get_json()['data'] == []
+        data = client.get('/api/patients/search?q=queen').get_json()['data']
+        assert [p['id'] for p in data] == [patient_id]
+        
+        client.delete(f'/api/patients/{patient_id}')
+        assert client.get('/api/patients/search?q=queen').get_json()['data'] == []
+    
+    def test_search_validation(self, client):
+        """Test that short queries and bad limits are rejected."""
+        assert client.get('/api/patients/search').status_code == 400
+        assert client.get('/api/patients/search?q=jo').status_code == 400
+        assert client.get('/api/patients/search?q=%25%25%25').status_code == 400
+        assert client.get('/api/patients/search?q=john&limit=abc').status_code == 400
+        response = client.get('/api/patients/search?q=john&limit=1000')
+        assert response.get_json()['limit'] == 100
+
 
 class TestAppointmentEndpoints:
     """Test appointment management."""
@@ -197,6 +494,43 @@ class TestAppointmentEndpoints:
         assert data['success'] is True
         assert 'count' in data
     
+    def test_get_appointments_filters(self, client):
+        """Test server-side filtering by doctor, status, patient and date range."""
+        ids = []
+        for i in range(2):
+            response = client.post('/api/patients', json={
+                'name': f'Filter Patient {i}',
+                'date_of_birth': '1990-01-01',
+                'email': f'filter{i}@example.com'
+            })
+            ids.append(response.get_json()['data']['id'])
+        for patient_id, doctor, when, status in [
+            (ids[0], 'Dr. Smith', '2024-12-01 09:00:00', 'scheduled'),
+            (ids[0], 'Dr. Smith', '2024-12-02 09:00:00', 'completed'),
+            (ids[1], 'Dr. Smith', '2024-12-01 11:00:00', 'scheduled'),
+            (ids[1], 'Dr. Jones', '2024-12-01 10:00:00', 'cancelled'),
+        ]:
+            client.post('/api/appointments', json={
+                'patient_id': patient_id,
+                'doctor_name': doctor,
+                'appointment_datetime': when,
+                'status': status
+            })
+        
+        def fetch(query):
+            response = client.get(f'/api/appointments?{query}')
+            assert response.status_code == 200
+            return response.get_json()['data']
+        
+        day = fetch('doctor_name=Dr. Smith&from=2024-12-01&to=2024-12-02')
+        assert [a['appointment_datetime'] for a in day] == ['2024-12-01T09:00:00', '2024-12-01T11:00:00']
+        assert len(fetch('status=cancelled')) == 1
+        assert len(fetch(f'patient_id={ids[0]}')) == 2
+        assert len(fetch('')) == 4
+        
+        assert client.get('/api/appointments?from=yesterday').status_code == 400
+        assert client.get('/api/appointments?patient_id=abc').status_code == 400
+    
     def test_update_appointment_status(self, client):
         """Test updating appointment status."""
         # Create patient and appointment
@@ -223,6 +557,276 @@ class TestAppointmentEndpoints:
         data = response.get_json()
         assert data['data']['status'] == 'completed'
 
+    
+    def test_export_appointments_ndjson(self, app, client):
+        """Test streaming appointments as NDJSON across several batches."""
+        app.config['EXPORT_BATCH_SIZE'] = 2
+        patient_response = client.post('/api/patients', json={
+            'name': 'Export Patient',
+            'date_of_birth': '1990-01-01',
+            'email': 'export@example.com'
+        })
+        patient_id = patient_response.get_json()['data']['id']
+        for hour in range(9, 14):
+            client.post('/api/appointments', json={
+                'patient_id': patient_id,
+                'doctor_name': 'Dr. Stream',
+                'appointment_datetime': f'2024-12-01 {hour}:00:00'
+            })
+        
+        response = client.get('/api/appointments/export?format=ndjson')
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == 'application/x-ndjson'
+        lines = response.get_data(as_text=True).splitlines()
+        assert len(lines) == 5
+        assert [json.loads(line)['id'] for line in lines] == [1, 2, 3, 4, 5]
+        
+        response = client.get('/api/appointments/export?format=json')
+        assert len(json.loads(response.get_data(as_text=True))) == 5
+    
+    def test_export_appointments_invalid_format(self, client):
+        """Test that unknown export formats are rejected."""
+        response = client.get('/api/appointments/export?format=xml')
+        assert response.status_code == 400
+        assert response.get_json()['success'] is False
+
+    
+    def test_bulk_create_appointments(self, client):
+        """Test that bulk appointments check patient references as a set."""
+        patient_response = client.post('/api/patients', json={
+            'name': 'Bulk Appt Patient',
+            'date_of_birth': '1990-01-01',
+            'email': 'bulkappt@example.com'
+        })
+        patient_id = patient_response.get_json()['data']['id']
+        items = [
+            {'patient_id': patient_id, 'doctor_name': 'Dr. Bulk', 'appointment_datetime': '2024-12-01 10:00:00'},
+            {'patient_id': 999, 'doctor_name': 'Dr. Bulk', 'appointment_datetime': '2024-12-01 11:00:00'},
+            {'patient_id': patient_id, 'doctor_name': 'Dr. Bulk', 'appointment_datetime': 'tomorrow'},
+        ]
+        response = client.post('/api/appointments/bulk', json=items)
+        assert response.status_code == 207
+        results = response.get_json()['results']
+        assert results[0]['success'] is True
+        assert results[1]['error'] == 'Patient not found: 999'
+        assert 'appointment_datetime' in results[2]['error']
+        
+        appointments = client.get('/api/appointments').get_json()['data']
+        assert len(appointments) == 1
+        assert appointments[0]['status'] == 'scheduled'
+
+
+class TestScheduling:
+    """Test slot conflict checks and doctor availability."""
+    
+    def create_patient(self, client):
+        response = client.post('/api/patients', json={
+            'name': 'Slot Patient',
+            'date_of_birth': '1990-01-01',
+            'email': 'slot@example.com'
+        })
+        return response.get_json()['data']['id']
+    
+    def book(self, client, patient_id, when, doctor='Dr. Slot', **extra):
+        return client.post('/api/appointments', json={
+            'patient_id': patient_id,
+            'doctor_name': doctor,
+            'appointment_datetime': when,
+            **extra
+        })
+    
+    def test_create_rejects_overlap(self, client):
+        """Test that a doctor cannot be booked twice within one slot."""
+        patient_id = self.create_patient(client)
+        first = self.book(client, patient_id, '2024-12-01 10:00:00')
+        assert first.status_code == 201
+        
+        response = self.book(client, patient_id, '2024-12-01 10:15:00')
+        assert response.status_code == 409
+        assert response.get_json()['conflict_id'] == first.get_json()['data']['id']
+        assert self.book(client, patient_id, '2024-12-01 09:45:00').status_code == 409
+        
+        assert self.book(client, patient_id, '2024-12-01 10:30:00').status_code == 201
+        assert self.book(client, patient_id, '2024-12-01 09:30:00').status_code == 201
+        assert self.book(client, patient_id, '2024-12-01 10:00:00', doctor='Dr. Other').status_code == 201
+        assert self.book(client, patient_id, '2024-12-01 10:00:00', status='cancelled').status_code == 201
+    
+    def test_update_rejects_overlap(self, client):
+        """Test that moving or reactivating an appointment is checked too."""
+        patient_id = self.create_patient(client)
+        self.book(client, patient_id, '2024-12-01 10:00:00')
+        other = self.book(client, patient_id, '2024-12-01 11:00:00').get_json()['data']['id']
+        
+        response = client.put(f'/api/appointments/{other}', json={'appointment_datetime': '2024-12-01 10:10:00'})
+        assert response.status_code == 409
+        assert client.put(f'/api/appointments/{other}', json={'notes': 'Same slot'}).status_code == 200
+        
+        client.put(f'/api/appointments/{other}', json={'status': 'cancelled'})
+        assert self.book(client, patient_id, '2024-12-01 11:00:00').status_code == 201
+        assert client.put(f'/api/appointments/{other}', json={'status': 'scheduled'}).status_code == 409
+    
+    def test_legacy_double_booking_can_be_updated(self, app, client):
+        """Test that status and notes changes of a booking made before the check are not refused."""
+        from scheduling import SQLITE_SCHEDULING_DDL
+        patient_id = self.create_patient(client)
+        first = self.book(client, patient_id, '2024-12-01 10:00:00').get_json()['data']['id']
+        # Written before the slot check existed
+        db.session.execute(db.text('DROP TRIGGER appointment_slot_check_insert'))
+        db.session.add(Appointment(patient_id=patient_id, doctor_name='Dr. Slot',
+                                   appointment_datetime=datetime(2024, 12, 1, 10, 15)))
+        db.session.commit()
+        db.session.execute(db.text(SQLITE_SCHEDULING_DDL[0]))
+        db.session.commit()
+        
+        assert client.put(f'/api/appointments/{first}', json={'status': 'completed'}).status_code == 200
+        assert client.put(f'/api/appointments/{first}', json={'notes': 'Seen'}).status_code == 200
+        moved = client.put(f'/api/appointments/{first}', json={'appointment_datetime': '2024-12-01 10:05:00'})
+        assert moved.status_code == 409
+    
+    def test_database_rejects_overlap(self, app, client):
+        """Test that the database refuses overlapping rows written outside the API."""
+        from sqlalchemy.exc import IntegrityError
+        patient_id = self.create_patient(client)
+        self.book(client, patient_id, '2024-12-01 10:00:00')
+        
+        db.session.add(Appointment(
+            patient_id=patient_id,
+            doctor_name='Dr. Slot',
+            appointment_datetime=datetime(2024, 12, 1, 10, 29)
+        ))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+    
+    def test_conflict_check_uses_doctor_index(self, app):
+        """Test that the overlap check is a range scan of the doctor/datetime index."""
+        from scheduling import booked
+        query = booked('Dr. Slot', datetime(2024, 12, 1, 10), datetime(2024, 12, 1, 11))
+        sql = str(query.statement.compile(compile_kwargs={'literal_binds': True}))
+        plan = ' '.join(str(row) for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')))
+        assert 'ix_appointment_doctor_datetime' in plan
+    
+    def test_bulk_rejects_overlap(self, client):
+        """Test that bulk items overlapping a booking or each other fail individually."""
+        patient_id = self.create_patient(client)
+        self.book(client, patient_id, '2024-12-01 10:00:00')
+        response = client.post('/api/appointments/bulk', json=[
+            {'patient_id': patient_id, 'doctor_name': 'Dr. Slot', 'appointment_datetime': '2024-12-01 10:20:00'},
+            {'patient_id': patient_id, 'doctor_name': 'Dr. Slot', 'appointment_datetime': '2024-12-01 11:00:00'},
+            {'patient_id': patient_id, 'doctor_name': 'Dr. Slot', 'appointment_datetime': '2024-12-01 11:10:00'},
+            {'patient_id': patient_id, 'doctor_name': 'Dr. Slot', 'appointment_datetime': '2024-12-01 11:30:00'}
+        ])
+        assert response.status_code == 207
+        assert [r['success'] for r in response.get_json()['results']] == [False, True, False, True]
+    
+    def test_doctor_availability(self, client):
+        """Test that booked and overlapped grid slots are not offered."""
+        patient_id = self.create_patient(client)
+        self.book(client, patient_id, '2024-12-01 09:00:00')
+        self.book(client, patient_id, '2024-12-01 10:15:00')
+        self.book(client, patient_id, '2024-12-01 12:00:00', status='cancelled')
+        self.book(client, patient_id, '2024-12-02 09:30:00')
+        
+        response = client.get('/api/doctors/Dr. Slot/availability?date=2024-12-01')
+        assert response.status_code == 200
+        data = response.get_json()['data']
+        starts = [slot['start'][11:16] for slot in data['available']]
+        assert starts[:3] == ['09:30', '11:00', '11:30']
+        assert '12:00' in starts
+        assert len(starts) == 16 - 3
+        assert [b['start'] for b in data['booked']] == ['2024-12-01T09:00:00', '2024-12-01T10:15:00']
+        
+        assert client.get('/api/doctors/Dr. Slot/availability').status_code == 400
+        assert client.get('/api/doctors/Dr. Slot/availability?date=tomorrow').status_code == 400
+
+
+class TestStatistics:
+    """Test the pre-aggregated /api/stats counters."""
+    
+    def seed(self, client):
+        patient_id = client.post('/api/patients', json={
+            'name': 'Stats Patient',
+            'date_of_birth': '1990-01-01',
+            'email': 'stats@example.com',
+            'blood_group': 'A+'
+        }).get_json()['data']['id']
+        client.post('/api/patients', json={
+            'name': 'No Group',
+            'date_of_birth': '1990-01-01',
+            'email': 'nogroup@example.com'
+        })
+        ids = []
+        for doctor, when in [('Dr. A', '2024-12-01 09:00:00'), ('Dr. A', '2024-12-01 10:00:00'),
+                             ('Dr. B', '2024-12-02 09:00:00')]:
+            response = client.post('/api/appointments', json={
+                'patient_id': patient_id,
+                'doctor_name': doctor,
+                'appointment_datetime': when
+            })
+            ids.append(response.get_json()['data']['id'])
+        return patient_id, ids
+    
+    def test_stats_follow_writes(self, client):
+        """Test that creates, updates and deletes adjust the counters."""
+        patient_id, ids = self.seed(client)
+        client.put(f'/api/appointments/{ids[1]}', json={'status': 'completed'})
+        client.post('/api/appointments/bulk', json=[
+            {'patient_id': patient_id, 'doctor_name': 'Dr. B', 'appointment_datetime': '2024-12-02 11:00:00'}
+        ])
+        
+        data = client.get('/api/stats').get_json()['data']
+        assert data['appointments_total'] == 4
+        assert data['appointments_by_status'] == {'scheduled': 3, 'completed': 1}
+        assert data['appointments_per_doctor_per_day'] == [
+            {'date': '2024-12-01', 'doctor_name': 'Dr. A', 'total': 2,
+             'by_status': {'completed': 1, 'scheduled': 1}},
+            {'date': '2024-12-02', 'doctor_name': 'Dr. B', 'total': 2, 'by_status': {'scheduled': 2}}
+        ]
+        assert data['patients_by_blood_group'] == {'A+': 1, 'unknown': 1}
+        
+        client.delete(f'/api/patients/{patient_id}')
+        data = client.get('/api/stats').get_json()['data']
+        assert data['appointments_total'] == 0
+        assert data['appointments_per_doctor_per_day'] == []
+        assert data['patients_by_blood_group'] == {'unknown': 1}
+    
+    def test_stats_date_range(self, client):
+        """Test limiting the daily breakdown with from and to."""
+        self.seed(client)
+        data = client.get('/api/stats?from=2024-12-02&to=2024-12-03').get_json()['data']
+        assert [d['doctor_name'] for d in data['appointments_per_doctor_per_day']] == ['Dr. B']
+        assert data['appointments_total'] == 3
+        assert client.get('/api/stats?from=soon').status_code == 400
+    
+    def test_stats_do_not_scan_base_tables(self, app, client):
+        """Test that serving stats never reads the appointment or patient tables."""
+        self.seed(client)
+        statements = []
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            assert client.get('/api/stats').status_code == 200
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        assert statements
+        assert not any('FROM appointment ' in s or 'FROM patient ' in s for s in statements)
+    
+    def test_rebuild_command(self, app, client):
+        """Test that the rebuild command restores counters after drift."""
+        self.seed(client)
+        expected = client.get('/api/stats').get_json()['data']
+        db.session.execute(db.text('DELETE FROM appointment_status_stat'))
+        db.session.execute(db.text('UPDATE blood_group_stat SET count = 42'))
+        db.session.commit()
+        
+        result = app.test_cli_runner().invoke(args=['stats', 'rebuild'])
+        assert result.exit_code == 0
+        assert client.get('/api/stats').get_json()['data'] == expected
+
 
 class TestMedicalRecordEndpoints:
     """Test medical record management."""
@@ -282,3 +886,103 @@ class TestMedicalRecordEndpoints:
         data = response.get_json()
         assert data['success'] is True
         assert data['count'] == 2
+    
+    def test_export_patient_records(self, client):
+        """Test streaming a patient's records and exporting an empty history."""
+        patient_response = client.post('/api/patients', json={
+            'name': 'Export History',
+            'date_of_birth': '1990-01-01',
+            'email': 'exporthistory@example.com'
+        })
+        patient_id = patient_response.get_json()['data']['id']
+        client.post('/api/records', json={
+            'patient_id': patient_id,
+            'diagnosis': 'Flu',
+            'doctor_name': 'Dr. A'
+        })
+        
+        response = client.get(f'/api/patients/{patient_id}/records/export?format=json')
+        assert response.status_code == 200
+        records = json.loads(response.get_data(as_text=True))
+        assert [r['diagnosis'] for r in records] == ['Flu']
+        
+        assert client.get('/api/patients/999/records/export').status_code == 404
+
+
+class TestConditionalRequests:
+    """Test ETag and Last-Modified handling on GET endpoints."""
+    
+    def create_patient(self, client, email='etag@example.com'):
+        response = client.post('/api/patients', json={
+            'name': 'ETag Patient',
+            'date_of_birth': '1990-01-01',
+            'email': email
+        })
+        return response.get_json()['data']['id']
+    
+    def test_single_patient_etag(self, client):
+        """Test 304 on a matching ETag and a new ETag after an update."""
+        patient_id = self.create_patient(client)
+        response = client.get(f'/api/patients/{patient_id}')
+        etag = response.headers['ETag']
+        assert etag.startswith('W/')
+        assert response.headers['Last-Modified']
+        
+        cached = client.get(f'/api/patients/{patient_id}', headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.data == b''
+        
+        client.put(f'/api/patients/{patient_id}', json={'phone': '555'})
+        response = client.get(f'/api/patients/{patient_id}', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+    
+    def test_single_patient_if_modified_since(self, client):
+        """Test If-Modified-Since against the patient's updated_at."""
+        patient_id = self.create_patient(client)
+        response = client.get(f'/api/patients/{patient_id}', headers={
+            'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'
+        })
+        assert response.status_code == 304
+        response = client.get(f'/api/patients/{patient_id}', headers={
+            'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'
+        })
+        assert response.status_code == 200
+    
+    def test_included_history_changes_etag(self, client):
+        """Test that writes to included collections change the ETag."""
+        patient_id = self.create_patient(client)
+        url = f'/api/patients/{patient_id}?include=records'
+        etag = client.get(url).headers['ETag']
+        client.post('/api/records', json={
+            'patient_id': patient_id,
+            'diagnosis': 'Flu',
+            'doctor_name': 'Dr. A'
+        })
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert len(response.get_json()['data']['records']) == 1
+        
+        records_url = f'/api/patients/{patient_id}/records'
+        etag = client.get(records_url).headers['ETag']
+        assert client.get(records_url, headers={'If-None-Match': etag}).status_code == 304
+    
+    def test_collection_etags(self, client):
+        """Test that list ETags change when rows are added or deleted."""
+        patient_id = self.create_patient(client)
+        etag = client.get('/api/patients').headers['ETag']
+        assert client.get('/api/patients', headers={'If-None-Match': etag}).status_code == 304
+        self.create_patient(client, 'etag2@example.com')
+        assert client.get('/api/patients', headers={'If-None-Match': etag}).status_code == 200
+        
+        response = client.post('/api/appointments', json={
+            'patient_id': patient_id,
+            'doctor_name': 'Dr. ETag',
+            'appointment_datetime': '2024-12-01 10:00:00'
+        })
+        appointment_id = response.get_json()['data']['id']
+        etag = client.get('/api/appointments').headers['ETag']
+        assert client.get('/api/appointments', headers={'If-None-Match': etag}).status_code == 304
+        assert client.get('/api/appointments?status=cancelled', headers={'If-None-Match': etag}).status_code == 200
+        client.delete(f'/api/appointments/{appointment_id}')
+        assert client.get('/api/appointments', headers={'If-None-Match': etag}).status_code == 200
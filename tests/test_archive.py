@@ -0,0 +1,161 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from archive import INCLUDE_DELETED, archive_cold_rows
+from models import db, Appointment, AppointmentArchive, MedicalRecord, MedicalRecordArchive, Patient
+from stats import get_stats, rebuild_stats
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def create_patient(client, email='soft@example.com', blood_group='O+'):
+    return client.post('/api/patients', json={
+        'name': 'Soft Delete', 'date_of_birth': '1980-05-05', 'email': email, 'blood_group': blood_group
+    }).get_json()['data']['id']
+
+
+def create_appointment(client, patient_id, when, doctor='Dr. Archive'):
+    response = client.post('/api/appointments', json={
+        'patient_id': patient_id, 'doctor_name': doctor, 'appointment_datetime': when
+    })
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['data']['id']
+
+
+def create_record(client, patient_id, record_date):
+    return client.post('/api/records', json={
+        'patient_id': patient_id, 'diagnosis': 'Checkup', 'doctor_name': 'Dr. Archive',
+        'record_date': record_date
+    }).get_json()['data']['id']
+
+
+def days_ago(days, fmt='%Y-%m-%d 10:00:00'):
+    return (datetime.utcnow() - timedelta(days=days)).strftime(fmt)
+
+
+class TestSoftDelete:
+    """Test that deletes keep the rows but hide them."""
+    
+    def test_deleted_patient_is_hidden_but_kept(self, app, client):
+        """Test that a deleted patient, its appointments and records disappear from reads."""
+        patient_id = create_patient(client)
+        create_appointment(client, patient_id, '2030-01-07 09:00:00')
+        create_record(client, patient_id, '2030-01-07')
+        
+        assert client.delete(f'/api/patients/{patient_id}').status_code == 200
+        assert client.get(f'/api/patients/{patient_id}').status_code == 404
+        assert client.get('/api/patients').get_json()['data'] == []
+        assert client.get(f'/api/appointments?patient_id={patient_id}').get_json()['count'] == 0
+        assert client.get('/api/patients/search?q=soft').get_json()['data'] == []
+        
+        for model in (Patient, Appointment, MedicalRecord):
+            rows = db.session.execute(db.select(model), execution_options={INCLUDE_DELETED: True}).scalars().all()
+            assert len(rows) == 1
+            assert rows[0].deleted_at is not None
+        stats = get_stats()
+        assert stats['appointments_total'] == 0
+        assert stats['patients_total'] == 0
+    
+    def test_deleted_appointment_frees_its_slot(self, client):
+        """Test that a soft deleted appointment no longer blocks the slot."""
+        patient_id = create_patient(client)
+        appointment_id = create_appointment(client, patient_id, '2030-01-07 09:00:00')
+        assert client.delete(f'/api/appointments/{appointment_id}').status_code == 200
+        
+        create_appointment(client, patient_id, '2030-01-07 09:00:00')
+        included = client.get(f'/api/patients/{patient_id}?include=appointments').get_json()['data']
+        assert [a['id'] for a in included['appointments']] != [appointment_id]
+        assert len(included['appointments']) == 1
+    
+    def test_email_of_deleted_patient_can_be_registered_again(self, client):
+        """Test that only active patients hold their email."""
+        patient_id = create_patient(client)
+        duplicate = client.post('/api/patients', json={
+            'name': 'Again', 'date_of_birth': '1980-05-05', 'email': 'soft@example.com'
+        })
+        assert duplicate.status_code == 409
+        assert duplicate.get_json()['error'] == 'A patient with this email already exists'
+        
+        client.delete(f'/api/patients/{patient_id}')
+        assert create_patient(client) != patient_id
+        response = client.post('/api/patients/bulk', json=[
+            {'name': 'Again', 'date_of_birth': '1980-05-05', 'email': 'soft@example.com'}
+        ])
+        assert response.status_code == 400
+        assert response.get_json()['results'][0]['error'] == 'Email already exists: soft@example.com'
+    
+    def test_update_to_taken_email(self, client):
+        """Test that an update to another active patient's email is a conflict, not a database error."""
+        create_patient(client)
+        other = create_patient(client, email='other@example.com')
+        response = client.put(f'/api/patients/{other}', json={'email': 'soft@example.com'})
+        assert response.status_code == 409
+        assert 'INSERT' not in response.get_data(as_text=True)
+        assert 'UPDATE' not in response.get_data(as_text=True)
+
+
+class TestArchive:
+    """Test moving cold rows to the archive tables."""
+    
+    def seed(self, client):
+        patient_id = create_patient(client)
+        old = [create_appointment(client, patient_id, days_ago(1000 + i)) for i in range(3)]
+        recent = create_appointment(client, patient_id, days_ago(10))
+        old_record = create_record(client, patient_id, days_ago(1000, '%Y-%m-%d'))
+        create_record(client, patient_id, days_ago(10, '%Y-%m-%d'))
+        return patient_id, old, recent, old_record
+    
+    def test_archive_moves_cold_rows_in_batches(self, app, client):
+        """Test that rows past the horizon move and stay readable from the archive endpoints."""
+        patient_id, old, recent, old_record = self.seed(client)
+        before = get_stats()
+        
+        assert archive_cold_rows(batch_size=2, pause=0) == {'appointment': 3, 'medical_record': 1}
+        assert [row.id for row in Appointment.query] == [recent]
+        assert sorted(row.id for row in AppointmentArchive.query) == old
+        assert [row.id for row in MedicalRecordArchive.query] == [old_record]
+        assert archive_cold_rows(pause=0) == {'appointment': 0, 'medical_record': 0}
+        
+        page = client.get(f'/api/appointments/archive?patient_id={patient_id}&limit=2').get_json()
+        assert [a['id'] for a in page['data']] == old[:2]
+        assert page['data'][0]['archived_at']
+        page = client.get(f"/api/appointments/archive?cursor={page['next_cursor']}").get_json()
+        assert [a['id'] for a in page['data']] == old[2:]
+        records = client.get(f'/api/patients/{patient_id}/records/archive').get_json()
+        assert [r['id'] for r in records['data']] == [old_record]
+        assert client.get(f'/api/patients/{patient_id}/records').get_json()['count'] == 1
+        
+        # Archived appointments are still counted, incrementally and on rebuild
+        assert get_stats() == before
+        rebuild_stats()
+        assert get_stats() == before
+    
+    def test_deleting_patient_covers_archived_rows(self, app, client):
+        """Test that deleting a patient also hides and uncounts its archived history."""
+        patient_id, *_ = self.seed(client)
+        archive_cold_rows(pause=0)
+        client.delete(f'/api/patients/{patient_id}')
+        
+        assert AppointmentArchive.query.count() == 0
+        assert MedicalRecordArchive.query.count() == 0
+        assert get_stats()['appointments_total'] == 0
+        rebuild_stats()
+        assert get_stats()['appointments_total'] == 0
+        assert client.get(f'/api/patients/{patient_id}/records/archive').status_code == 404
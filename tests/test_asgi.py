@@ -0,0 +1,168 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import threading
+import asgi
+from asgi import ASGIApp, build_environ, handler_threads
+
+
+def call(asgi_app, path='/', query_string=b'', headers=()):
+    """Run one HTTP request through asgi_app and return the sent messages."""
+    scope = {
+        'type': 'http',
+        'method': 'GET',
+        'path': path,
+        'query_string': query_string,
+        'headers': list(headers)
+    }
+    messages = []
+    incoming = [{'type': 'http.request', 'body': b''}]
+    
+    async def receive():
+        if incoming:
+            return incoming.pop(0)
+        # The client stays connected
+        await asyncio.Future()
+    
+    async def send(message):
+        messages.append(message)
+    
+    return scope, receive, send, messages
+
+
+class TestASGIApp:
+    """Test the ASGI adapter around the Flask app."""
+    
+    def test_build_environ(self):
+        """Test translating an ASGI scope into a WSGI environ."""
+        scope, _, _, _ = call(None, '/api/patients', b'limit=5', [
+            (b'content-type', b'application/json'),
+            (b'accept', b'text/html'),
+            (b'accept', b'application/json')
+        ])
+        environ = build_environ(scope, None)
+        assert environ['PATH_INFO'] == '/api/patients'
+        assert environ['QUERY_STRING'] == 'limit=5'
+        assert environ['CONTENT_TYPE'] == 'application/json'
+        assert environ['HTTP_ACCEPT'] == 'text/html,application/json'
+    
+    def test_lifespan(self):
+        """Test that lifespan startup and shutdown are acknowledged."""
+        app = ASGIApp(lambda environ, start_response: [], max_threads=1)
+        incoming = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+        
+        async def receive():
+            return incoming.pop(0)
+        
+        async def send(message):
+            sent.append(message['type'])
+        
+        asyncio.run(app({'type': 'lifespan'}, receive, send))
+        assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    
+    def test_requests_run_concurrently(self):
+        """Test that blocking handlers overlap instead of queueing behind each other."""
+        in_flight = 8
+        # Every handler waits until all of them are running at the same time
+        barrier = threading.Barrier(in_flight, timeout=5)
+        
+        def blocking_app(environ, start_response):
+            barrier.wait()
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [environ['QUERY_STRING'].encode()]
+        
+        app = ASGIApp(blocking_app, max_threads=in_flight)
+        
+        async def run_all():
+            requests = [call(app, '/', str(i).encode()) for i in range(in_flight)]
+            await asyncio.gather(*(app(scope, receive, send) for scope, receive, send, _ in requests))
+            return [messages for _, _, _, messages in requests]
+        
+        results = asyncio.run(run_all())
+        assert all(messages[0]['status'] == 200 for messages in results)
+        assert [messages[1]['body'] for messages in results] == [str(i).encode() for i in range(in_flight)]
+    
+    def test_write_sends_start_first(self):
+        """Test that output passed to the WSGI write() callable follows the response start."""
+        def writing_app(environ, start_response):
+            write = start_response('200 OK', [('Content-Type', 'text/plain')])
+            write(b'written')
+            return [b' returned']
+        
+        app = ASGIApp(writing_app, max_threads=1)
+        scope, receive, send, messages = call(app)
+        asyncio.run(app(scope, receive, send))
+        assert [message['type'] for message in messages] == [
+            'http.response.start', 'http.response.body', 'http.response.body', 'http.response.body'
+        ]
+        assert b''.join(message['body'] for message in messages[1:]) == b'written returned'
+    
+    def test_disconnect_closes_body(self):
+        """Test that an endless body is closed once the client has gone."""
+        closed = threading.Event()
+        
+        def endless_app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            
+            def body():
+                try:
+                    while True:
+                        yield b'row\n'
+                finally:
+                    closed.set()
+            return body()
+        
+        app = ASGIApp(endless_app, max_threads=1)
+        
+        async def run():
+            gone = asyncio.Event()
+            incoming = [{'type': 'http.request', 'body': b''}]
+            sent = []
+            
+            async def receive():
+                if incoming:
+                    return incoming.pop(0)
+                await gone.wait()
+                return {'type': 'http.disconnect'}
+            
+            async def send(message):
+                sent.append(message)
+                if len(sent) == 3:
+                    gone.set()
+            
+            scope, _, _, _ = call(app)
+            await asyncio.wait_for(app(scope, receive, send), timeout=5)
+            return sent
+        
+        sent = asyncio.run(run())
+        assert closed.is_set()
+        # No final message for a client that is not there
+        assert sent[-1]['more_body'] is True
+
+
+class TestHandlerThreads:
+    """Test sizing the handler threads by the database pool."""
+    
+    def test_defaults_to_pool_capacity(self, monkeypatch):
+        """Test that each thread gets a connection unless ASGI_THREADS says otherwise."""
+        monkeypatch.delenv('ASGI_THREADS', raising=False)
+        monkeypatch.setattr(asgi, 'pool_capacity', lambda app: 7)
+        assert handler_threads(None) == 7
+        monkeypatch.setenv('ASGI_THREADS', '4')
+        assert handler_threads(None) == 4
+    
+    def test_without_pool(self, monkeypatch):
+        """Test the fallback for databases without a QueuePool (SQLite in memory)."""
+        from app import create_app
+        monkeypatch.delenv('ASGI_THREADS', raising=False)
+        assert handler_threads(create_app('testing')) == asgi.DEFAULT_THREADS
+    
+    def test_warns_beyond_pool(self, monkeypatch, caplog):
+        """Test that more threads than connections are logged as a misconfiguration."""
+        monkeypatch.setenv('ASGI_THREADS', '100')
+        monkeypatch.setattr(asgi, 'pool_capacity', lambda app: 7)
+        assert handler_threads(None) == 100
+        assert 'exceeds the database pool' in caplog.text
@@ -0,0 +1,163 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from datetime import date
+from sqlalchemy import event
+import audit
+from app import create_app
+from archive import archive_cold_rows
+from models import db, AuditLog, Patient
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def create_patient(client, email='audit@example.com'):
+    return client.post('/api/patients', json={
+        'name': 'Audit Trail', 'date_of_birth': '1975-03-03', 'email': email
+    }).get_json()['data']['id']
+
+
+def entries(**filters):
+    return AuditLog.query.filter_by(**filters).order_by(AuditLog.id).all()
+
+
+class TestAuditEntries:
+    """Test the entries written for inserts, updates and deletes."""
+    
+    def test_patient_lifecycle(self, client):
+        """Test that create, update and delete log before and after values."""
+        patient_id = create_patient(client)
+        client.put(f'/api/patients/{patient_id}', json={'phone': '555-0100', 'name': 'Audit Trail'})
+        client.delete(f'/api/patients/{patient_id}')
+        
+        created, updated, deleted = entries(entity_type='patient', entity_id=patient_id)
+        assert created.action == 'insert'
+        assert created.before is None
+        assert created.after['email'] == 'audit@example.com'
+        assert created.source == 'POST /api/patients'
+        
+        # Only the columns that changed are kept
+        assert updated.action == 'update'
+        assert updated.before['phone'] is None
+        assert updated.after['phone'] == '555-0100'
+        assert 'name' not in updated.after
+        
+        assert deleted.action == 'delete'
+        assert deleted.before['deleted_at'] is None
+        assert deleted.after['deleted_at'] is not None
+    
+    def test_one_insert_per_flush(self, app, client):
+        """Test that the entries of a flush go out in a single multi-row INSERT."""
+        patient_id = create_patient(client)
+        for hour in (9, 10, 11):
+            client.post('/api/appointments', json={
+                'patient_id': patient_id, 'doctor_name': 'Dr. Log',
+                'appointment_datetime': f'2030-02-04 {hour:02d}:00:00'
+            })
+        statements = []
+        
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('INSERT INTO audit_log'):
+                statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            client.delete(f'/api/patients/{patient_id}')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+        assert len(statements) == 1
+        assert len(entries(action='delete')) == 4
+    
+    def test_bulk_and_archived_rows_are_logged(self, app, client):
+        """Test that Core bulk inserts and deletes of archived rows are logged too."""
+        response = client.post('/api/patients/bulk', json=[
+            {'name': f'Bulk {i}', 'date_of_birth': '1990-01-01', 'email': f'bulk{i}@example.com'}
+            for i in range(3)
+        ])
+        ids = [result['id'] for result in response.get_json()['results']]
+        logged = entries(entity_type='patient', action='insert')
+        assert [entry.entity_id for entry in logged] == ids
+        assert logged[0].after['email'] == 'bulk0@example.com'
+        # The same snapshot as an ORM insert, column defaults included
+        single = create_patient(client)
+        orm_snapshot = entries(entity_type='patient', entity_id=single)[0].after
+        assert set(logged[0].after) == set(orm_snapshot)
+        assert logged[0].after['created_at'] is not None
+        assert logged[0].after['deleted_at'] is None
+        
+        record_id = client.post('/api/records', json={
+            'patient_id': ids[0], 'diagnosis': 'Old', 'doctor_name': 'Dr. Log', 'record_date': '2001-01-01'
+        }).get_json()['data']['id']
+        archive_cold_rows(pause=0)
+        client.delete(f'/api/patients/{ids[0]}')
+        deleted = entries(entity_type='medical_record', action='delete')
+        assert [entry.entity_id for entry in deleted] == [record_id]
+    
+    def test_failed_write_leaves_no_entry(self, client):
+        """Test that entries roll back with the change they describe."""
+        create_patient(client)
+        response = client.post('/api/patients', json={
+            'name': 'Duplicate', 'date_of_birth': '1975-03-03', 'email': 'audit@example.com'
+        })
+        assert response.status_code >= 400
+        assert len(entries(entity_type='patient')) == 1
+    
+    def test_commit_hooks(self, app, monkeypatch):
+        """Test that commit hooks get the logged entity types, which are then forgotten."""
+        committed = []
+        monkeypatch.setattr(audit, '_commit_hooks', [committed.append])
+        db.session.add(Patient(name='Hooked', date_of_birth=date(1975, 3, 3), email='hook@example.com'))
+        db.session.commit()
+        assert committed == [{'patient'}]
+        assert audit.WRITTEN_KEY not in db.session.info
+        
+        db.session.add(Patient(name='Rolled Back', date_of_birth=date(1975, 3, 3), email='gone@example.com'))
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+        assert committed == [{'patient'}]
+
+
+class TestAuditEndpoint:
+    """Test GET /api/audit."""
+    
+    def test_filters_and_keyset_pages(self, client):
+        """Test paging through one entity's history."""
+        patient_id = create_patient(client)
+        other_id = create_patient(client, 'other@example.com')
+        for phone in ('1', '2', '3'):
+            client.put(f'/api/patients/{patient_id}', json={'phone': phone})
+        
+        url = f'/api/audit?entity_type=patient&entity_id={patient_id}&limit=3'
+        page = client.get(url).get_json()
+        assert [e['action'] for e in page['data']] == ['insert', 'update', 'update']
+        assert {e['entity_id'] for e in page['data']} == {patient_id}
+        page = client.get(f"{url}&cursor={page['next_cursor']}").get_json()
+        assert [e['after']['phone'] for e in page['data']] == ['3']
+        assert page['next_cursor'] is None
+        
+        assert client.get('/api/audit?entity_type=patient&to=2000-01-01T00:00:00').get_json()['data'] == []
+        other = client.get(f'/api/audit?entity_type=patient&entity_id={other_id}').get_json()['data']
+        assert [e['action'] for e in other] == ['insert']
+    
+    @pytest.mark.parametrize('query', [
+        'entity_type=doctor', 'entity_id=1', 'entity_type=patient&entity_id=x', 'from=yesterday'
+    ])
+    def test_invalid_parameters(self, client, query):
+        """Test that bad filters are rejected with 400."""
+        assert client.get(f'/api/audit?{query}').status_code == 400
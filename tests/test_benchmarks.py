@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+import pytest
+from sqlalchemy import func
+from app import create_app
+from models import db, Appointment, AppointmentStatusStat, Patient
+from scheduling import check_slots
+import common
+import compare
+import datagen
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_summarize_reports_percentiles_in_milliseconds():
+    summary = common.summarize([i / 1000 for i in range(1, 101)], elapsed=2.0)
+    assert summary['count'] == 100
+    assert summary['p50_ms'] == 50
+    assert summary['p95_ms'] == 95
+    assert summary['p99_ms'] == 99
+    assert summary['per_second'] == 50
+    assert common.summarize([])['p50_ms'] is None
+
+
+def test_compare_flags_regressions_over_threshold():
+    def document(p95):
+        return {'kind': 'micro', 'results': {'get_patient': {'p50_ms': 1.0, 'p95_ms': p95, 'p99_ms': 3.0}}}
+
+    rows, regressed = compare.compare(document(2.0), document(2.1), threshold=10)
+    assert not regressed
+    rows, regressed = compare.compare(document(2.0), document(2.5), threshold=10)
+    assert regressed
+    assert [row[1] for row in rows if row[5]] == ['p95_ms']
+
+
+def test_generate_is_deterministic_and_conflict_free(app):
+    datagen.generate(patients=20, appointments=200, records=10, doctors=3, seed=7)
+    first = [tuple(row) for row in db.session.query(Patient.name, Patient.phone).order_by(Patient.id)]
+    assert db.session.query(func.count(Appointment.id)).scalar() == 200
+
+    valid = [(a.id, {'doctor_name': a.doctor_name, 'appointment_datetime': a.appointment_datetime,
+                     'status': 'scheduled'}) for a in Appointment.query.limit(50)]
+    Appointment.query.filter(Appointment.id.in_([index for index, _ in valid])).delete()
+    assert check_slots(valid) == {}
+    db.session.rollback()
+
+    counted = sum(row.count for row in AppointmentStatusStat.query)
+    assert counted == 200
+
+    datagen.generate(patients=20, appointments=200, records=10, doctors=3, seed=7)
+    assert [tuple(row) for row in db.session.query(Patient.name, Patient.phone).order_by(Patient.id)] == first
@@ -0,0 +1,156 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from app import create_app
+from cache import LRUCache, RedisCache, ResponseCache, patient_keys
+from datetime import datetime, timedelta
+from models import db, Patient
+
+
+class FakeRedis:
+    """In-memory stand-in for the subset of the Redis client used by RedisCache."""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.store.pop(key, None)
+
+
+@pytest.fixture
+def app():
+    """Create a test app whose cache uses the Redis backend with a fake client."""
+    app = create_app('testing')
+    app.extensions['cache'] = ResponseCache(RedisCache(FakeRedis()), ttl=60)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Create a test client."""
+    return app.test_client()
+
+
+class TestLRUCache:
+    """Test the in-process backend."""
+
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest untouched entry is evicted first."""
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 1, ttl=60)
+        cache.set('b', 2, ttl=60)
+        cache.get('a')
+        cache.set('c', 3, ttl=60)
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert len(cache) == 2
+
+    def test_expires_entries(self):
+        """Test that entries past their TTL are not returned."""
+        cache = LRUCache()
+        cache.set('a', 1, ttl=0)
+        assert cache.get('a') is None
+
+    def test_patient_keys_cover_every_include_variant(self):
+        """Test that invalidation covers all include combinations."""
+        keys = patient_keys(7, {'appointments': 'appointments', 'records': 'medical_records'})
+        assert sorted(keys) == sorted([
+            'patient:7:records-list',
+            'patient:7:base',
+            'patient:7:appointments',
+            'patient:7:records',
+            'patient:7:appointments,records'
+        ])
+
+
+class TestResponseCache:
+    """Test read-through caching of patient reads."""
+
+    def create_patient(self, client):
+        response = client.post('/api/patients', json={
+            'name': 'Cached Patient',
+            'date_of_birth': '1990-01-01',
+            'email': 'cached@example.com'
+        })
+        return response.get_json()['data']['id']
+
+    def test_hits_and_invalidation_on_update(self, client):
+        """Test that repeated reads hit the cache and updates invalidate it."""
+        patient_id = self.create_patient(client)
+        client.get(f'/api/patients/{patient_id}')
+        client.get(f'/api/patients/{patient_id}')
+        stats = client.get('/metrics/cache').get_json()
+        assert stats['backend'] == 'RedisCache'
+        assert stats['misses'] == 1
+        assert stats['hits'] == 1
+
+        client.put(f'/api/patients/{patient_id}', json={'name': 'Renamed'})
+        data = client.get(f'/api/patients/{patient_id}').get_json()['data']
+        assert data['name'] == 'Renamed'
+
+    def test_records_invalidated_by_record_writes(self, client):
+        """Test that creating and deleting records refreshes the cached list."""
+        patient_id = self.create_patient(client)
+        assert client.get(f'/api/patients/{patient_id}/records').get_json()['count'] == 0
+
+        response = client.post('/api/records', json={
+            'patient_id': patient_id,
+            'diagnosis': 'Flu',
+            'doctor_name': 'Dr. A'
+        })
+        record_id = response.get_json()['data']['id']
+        assert client.get(f'/api/patients/{patient_id}/records').get_json()['count'] == 1
+
+        client.delete(f'/api/records/{record_id}')
+        assert client.get(f'/api/patients/{patient_id}/records').get_json()['count'] == 0
+
+    def test_delete_patient_invalidates(self, client):
+        """Test that a deleted patient is not served from the cache."""
+        patient_id = self.create_patient(client)
+        client.get(f'/api/patients/{patient_id}')
+        client.delete(f'/api/patients/{patient_id}')
+        assert client.get(f'/api/patients/{patient_id}').status_code == 404
+
+    def test_entry_of_an_older_version_is_not_served(self, app, client):
+        """Test that a write this worker did not invalidate (another worker's) is not hidden by the cache."""
+        app.extensions['cache'] = ResponseCache(LRUCache(), ttl=60)
+        patient_id = self.create_patient(client)
+        first = client.get(f'/api/patients/{patient_id}')
+        assert first.get_json()['data']['name'] == 'Cached Patient'
+
+        # As committed by another process: no invalidation reaches this cache
+        Patient.query.filter_by(id=patient_id).update({
+            'name': 'Renamed Elsewhere', 'updated_at': datetime.utcnow() + timedelta(seconds=1)
+        })
+        db.session.commit()
+        second = client.get(f'/api/patients/{patient_id}')
+        assert second.get_json()['data']['name'] == 'Renamed Elsewhere'
+        assert second.headers['ETag'] != first.headers['ETag']
+
+    def test_query_string_variants_share_an_entry(self, client):
+        """Test that include order and ignored parameters do not evict each other's entry."""
+        patient_id = self.create_patient(client)
+        urls = [
+            f'/api/patients/{patient_id}?include=appointments,records',
+            f'/api/patients/{patient_id}?include=records,appointments',
+            f'/api/patients/{patient_id}?include=records,appointments&_=123',
+            f'/api/patients/{patient_id}?include=appointments,records',
+        ]
+        etags = {client.get(url).headers['ETag'] for url in urls}
+        assert len(etags) == 1
+        stats = client.get('/metrics/cache').get_json()
+        assert stats['misses'] == 1
+        assert stats['hits'] == 3
@@ -0,0 +1,110 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from datetime import datetime
+from app import create_app
+from models import db, AuditLog
+from audit import write_entries
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def create_patient(client, email):
+    return client.post('/api/patients', json={
+        'name': 'Sync Client', 'date_of_birth': '1999-09-09', 'email': email
+    }).get_json()['data']['id']
+
+
+def changes(client, token, limit=50):
+    response = client.get(f'/api/changes?since={token}&limit={limit}')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+class TestChangeFeed:
+    """Test GET /api/changes."""
+    
+    def test_deltas_since_token(self, client):
+        """Test that a client receives only the changes after its token."""
+        first = create_patient(client, 'first@example.com')
+        token = client.get('/api/changes').get_json()['next_token']
+        assert changes(client, token)['data'] == []
+        
+        second = create_patient(client, 'second@example.com')
+        client.put(f'/api/patients/{first}', json={'phone': '555-0199'})
+        record = client.post('/api/records', json={
+            'patient_id': second, 'diagnosis': 'Flu', 'doctor_name': 'Dr. Sync'
+        }).get_json()['data']['id']
+        
+        page = changes(client, token)
+        assert [(c['entity_type'], c['id'], c['action']) for c in page['data']] == [
+            ('patient', second, 'create'), ('patient', first, 'update'), ('medical_record', record, 'create')
+        ]
+        assert page['data'][1]['data']['phone'] == '555-0199'
+        assert page['has_more'] is False
+        assert changes(client, page['next_token'])['data'] == []
+    
+    def test_tombstones_and_collapsing(self, client):
+        """Test that deletes come back as tombstones and repeated changes collapse."""
+        token = client.get('/api/changes').get_json()['next_token']
+        patient_id = create_patient(client, 'gone@example.com')
+        client.put(f'/api/patients/{patient_id}', json={'phone': '1'})
+        page = changes(client, token)
+        assert [(c['id'], c['action']) for c in page['data']] == [(patient_id, 'create')]
+        
+        client.delete(f'/api/patients/{patient_id}')
+        tombstone, = changes(client, page['next_token'])['data']
+        assert tombstone['action'] == 'delete'
+        assert tombstone['data'] is None
+    
+    def test_pages(self, client):
+        """Test paging through a backlog of changes."""
+        token = client.get('/api/changes').get_json()['next_token']
+        ids = [create_patient(client, f'p{i}@example.com') for i in range(5)]
+        seen = []
+        while True:
+            page = changes(client, token, limit=2)
+            seen.extend(c['id'] for c in page['data'])
+            token = page['next_token']
+            if not page['has_more']:
+                break
+        assert seen == ids
+    
+    def test_late_commit_is_not_skipped(self, client):
+        """Test that an entry committed after a later audit id is still delivered."""
+        token = client.get('/api/changes').get_json()['next_token']
+        first = create_patient(client, 'a@example.com')
+        second = create_patient(client, 'b@example.com')
+        # As if the first write had not committed yet: its entry holds the lower id
+        entry = AuditLog.query.filter_by(entity_id=first).one()
+        entry_id = entry.id
+        db.session.delete(entry)
+        db.session.commit()
+        
+        page = changes(client, token)
+        assert [c['id'] for c in page['data']] == [second]
+        write_entries(db.session, [{
+            'id': entry_id, 'entity_type': 'patient', 'entity_id': first, 'action': 'insert',
+            'before': None, 'after': None, 'changed_at': datetime.utcnow(), 'source': None
+        }])
+        db.session.commit()
+        assert [c['id'] for c in changes(client, page['next_token'])['data']] == [first]
+    
+    def test_invalid_token(self, client):
+        """Test that a malformed token is rejected."""
+        assert client.get('/api/changes?since=not-a-token').status_code == 400
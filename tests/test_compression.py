@@ -0,0 +1,91 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import gzip
+import json
+import pytest
+from app import create_app
+from compression import parse_route_levels
+from models import db
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def patients(client):
+    response = client.post('/api/patients/bulk', json=[
+        {'name': f'Patient {i}', 'date_of_birth': '1970-01-01', 'email': f'p{i}@example.com'}
+        for i in range(40)
+    ])
+    assert response.status_code == 201
+
+
+GZIP = {'Accept-Encoding': 'gzip, deflate'}
+
+
+class TestCompression:
+    """Test Accept-Encoding negotiation and thresholds."""
+    
+    def test_large_list_is_gzipped(self, client, patients):
+        """Test that a list above the threshold is compressed and decodes to the same JSON."""
+        plain = client.get('/api/patients')
+        response = client.get('/api/patients', headers=GZIP)
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert int(response.headers['Content-Length']) < len(plain.data) / 4
+        assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+        assert 'Content-Encoding' not in plain.headers
+    
+    def test_small_and_unaccepted_bodies_are_left_alone(self, client, patients):
+        """Test the byte threshold and clients that do not accept gzip."""
+        small = client.get('/api/patients?limit=1', headers=GZIP)
+        assert 'Content-Encoding' not in small.headers
+        assert 'Accept-Encoding' in small.headers['Vary']
+        refused = client.get('/api/patients', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+        assert 'Content-Encoding' not in refused.headers
+    
+    def test_streamed_export_is_compressed(self, client, patients):
+        """Test that a streamed export is compressed as it is produced."""
+        for hour in range(9, 17):
+            client.post('/api/appointments', json={
+                'patient_id': 1, 'doctor_name': 'Dr. Zip', 'appointment_datetime': f'2030-04-01 {hour:02d}:00:00'
+            })
+        response = client.get('/api/appointments/export', headers=GZIP)
+        assert response.is_streamed
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in response.headers
+        lines = gzip.decompress(response.data).decode().splitlines()
+        assert len(lines) == 8
+        assert json.loads(lines[0])['doctor_name'] == 'Dr. Zip'
+    
+    def test_route_levels(self, app, client, patients):
+        """Test that a route can use its own level or opt out."""
+        app.extensions['compression'].update(parse_route_levels('GET /api/patients=0'))
+        assert 'Content-Encoding' not in client.get('/api/patients', headers=GZIP).headers
+        
+        app.extensions['compression'].update(parse_route_levels('GET /api/patients=1'))
+        fast = client.get('/api/patients', headers=GZIP)
+        assert fast.headers['Content-Encoding'] == 'gzip'
+        with pytest.raises(ValueError):
+            parse_route_levels('GET /api/patients=fast')
+    
+    def test_brotli_preferred_when_installed(self, client, patients):
+        """Test that brotli is chosen when available and accepted."""
+        brotli = pytest.importorskip('brotli')
+        response = client.get('/api/patients', headers={'Accept-Encoding': 'gzip, br'})
+        assert response.headers['Content-Encoding'] == 'br'
+        assert json.loads(brotli.decompress(response.data))['success'] is True
@@ -0,0 +1,70 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app import create_app
+from config import engine_options
+from dbpool import InstrumentedQueuePool, pool_stats
+from models import db
+
+
+class TestEngineOptions:
+    """Test per-environment engine option building."""
+    
+    def test_postgres_options(self, monkeypatch):
+        """Test pool defaults, env overrides and the statement timeout."""
+        monkeypatch.setenv('DB_POOL_SIZE', '7')
+        monkeypatch.setenv('DB_POOL_PRE_PING', 'false')
+        options = engine_options('postgresql://u:p@db/healthdb', pool_size=3, max_overflow=1)
+        assert options['pool_size'] == 7
+        assert options['max_overflow'] == 1
+        assert options['pool_pre_ping'] is False
+        assert options['connect_args'] == {'options': '-c statement_timeout=30000'}
+    
+    def test_sqlite_options(self):
+        """Test that SQLite gets no pool sizing options."""
+        assert engine_options('sqlite:///:memory:') == {}
+
+
+class TestInstrumentedPool:
+    """Test pool statistics."""
+    
+    def test_checkout_counts_and_timeouts(self, tmp_path):
+        """Test checked-out/idle counts, wait timing and timeouts."""
+        engine = create_engine(
+            f"sqlite:///{tmp_path / 'pool.db'}",
+            poolclass=InstrumentedQueuePool, pool_size=2, max_overflow=0, pool_timeout=0.05
+        )
+        first = engine.connect()
+        second = engine.connect()
+        first.execute(text('SELECT 1'))
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        
+        stats = pool_stats(engine)
+        assert stats['pool_class'] == 'InstrumentedQueuePool'
+        assert stats['checked_out'] == 2
+        assert stats['timeouts'] == 1
+        assert stats['checkouts'] == 3
+        assert stats['wait_seconds_max'] >= 0.05
+        
+        first.close()
+        second.close()
+        stats = pool_stats(engine)
+        assert stats['checked_out'] == 0
+        assert stats['idle'] == 2
+        engine.dispose()
+    
+    def test_pool_metrics_endpoint(self):
+        """Test the pool metrics view."""
+        app = create_app('testing')
+        with app.app_context():
+            db.create_all()
+            response = app.test_client().get('/metrics/pool')
+            assert response.status_code == 200
+            assert response.get_json()['pool_class'] == 'StaticPool'
+            db.session.remove()
+            db.drop_all()
@@ -0,0 +1,145 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import csv
+import io
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from export import generate_copy_csv, pyarrow, table_select
+from models import db, Patient
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def patient_ids(client):
+    response = client.post('/api/patients/bulk', json=[
+        {'name': f'Analytics {i}', 'date_of_birth': '1960-06-01', 'email': f'a{i}@example.com'}
+        for i in range(5)
+    ])
+    return [result['id'] for result in response.get_json()['results']]
+
+
+def read_csv(response):
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+
+class TestTableExport:
+    """Test GET /api/export/<table>."""
+    
+    def test_csv_export_of_whole_table(self, client, patient_ids):
+        """Test that every row, deleted ones included, is exported with a header."""
+        client.delete(f'/api/patients/{patient_ids[0]}')
+        response = client.get('/api/export/patient?format=csv')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/csv'
+        assert response.headers['Content-Disposition'] == 'attachment; filename=patient.csv'
+        
+        rows = read_csv(response)
+        assert [int(row['id']) for row in rows] == patient_ids
+        assert rows[0]['deleted_at'] != ''
+        assert rows[1]['deleted_at'] == ''
+        assert rows[1]['email'] == 'a1@example.com'
+    
+    def test_updated_since(self, app, client, patient_ids):
+        """Test that an incremental export only has the rows changed since the watermark."""
+        old = datetime.utcnow() - timedelta(days=1)
+        Patient.query.update({'updated_at': old})
+        db.session.commit()
+        client.put(f'/api/patients/{patient_ids[2]}', json={'phone': '555-0102'})
+        
+        since = (old + timedelta(hours=1)).isoformat()
+        rows = read_csv(client.get(f'/api/export/patient?updated_since={since}'))
+        assert [int(row['id']) for row in rows] == [patient_ids[2]]
+        assert len(read_csv(client.get(f'/api/export/patient?updated_since={old.isoformat()}'))) == 5
+    
+    def test_invalid_requests(self, client):
+        """Test unknown tables, formats and watermarks."""
+        assert client.get('/api/export/audit_log').status_code == 404
+        assert client.get('/api/export/patient?format=xml').status_code == 400
+        assert client.get('/api/export/patient?updated_since=yesterday').status_code == 400
+        if pyarrow is None:
+            assert client.get('/api/export/patient?format=arrow').status_code == 400
+    
+    def test_arrow_export(self, client, patient_ids):
+        """Test that the Arrow stream reads back as a table."""
+        pytest.importorskip('pyarrow')
+        response = client.get('/api/export/patient?format=arrow')
+        table = pyarrow.ipc.open_stream(response.data).read_all()
+        assert table.column('id').to_pylist() == patient_ids
+
+
+class FakeCursor:
+    def __init__(self, lines):
+        self.lines = lines
+    
+    def mogrify(self, query, params):
+        return query.encode()
+    
+    def copy_expert(self, sql, file):
+        assert sql.startswith('COPY (SELECT')
+        for line in self.lines:
+            file.write(line)
+    
+    def close(self):
+        pass
+
+
+class FakeEngine:
+    """Engine whose raw connection answers COPY with the given lines."""
+    
+    def __init__(self, dialect, lines):
+        self.dialect = dialect
+        self.lines = lines
+        self.closed = False
+    
+    def raw_connection(self):
+        engine = self
+        
+        class Connection:
+            def cursor(self):
+                return FakeCursor(engine.lines)
+            
+            def rollback(self):
+                pass
+            
+            def close(self):
+                engine.closed = True
+        return Connection()
+
+
+class TestCopyExport:
+    """Test streaming COPY output through the worker thread."""
+    
+    def test_copy_output_is_streamed_in_chunks(self, app):
+        """Test that COPY output reaches the response in order and the connection is closed."""
+        lines = ['id,name\n'] + [f'{i},{"x" * 1000}\n' for i in range(200)]
+        engine = FakeEngine(db.engine.dialect, lines)
+        chunks = list(generate_copy_csv(engine, table_select(Patient)))
+        assert len(chunks) > 1
+        assert b''.join(chunks).decode() == ''.join(lines)
+        assert engine.closed
+    
+    def test_client_going_away_aborts_copy(self, app):
+        """Test that closing the response stops the COPY."""
+        lines = (f'{i}\n' * 10000 for i in range(10000))
+        engine = FakeEngine(db.engine.dialect, lines)
+        body = generate_copy_csv(engine, table_select(Patient))
+        next(body)
+        body.close()
+        assert engine.closed
@@ -0,0 +1,115 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from idempotency import purge_expired
+from models import db, Appointment, IdempotencyKey
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def patient_id(client):
+    return client.post('/api/patients', json={
+        'name': 'Retry Client', 'date_of_birth': '1988-08-08', 'email': 'retry@example.com'
+    }).get_json()['data']['id']
+
+
+def book(client, patient_id, key, when='2030-03-04 09:00:00'):
+    return client.post('/api/appointments', headers={'Idempotency-Key': key}, json={
+        'patient_id': patient_id, 'doctor_name': 'Dr. Retry', 'appointment_datetime': when
+    })
+
+
+class TestIdempotencyKey:
+    """Test replaying POST responses for repeated Idempotency-Keys."""
+    
+    def test_retry_replays_stored_response(self, client, patient_id):
+        """Test that a retried POST returns the first response without writing again."""
+        first = book(client, patient_id, 'key-1')
+        assert first.status_code == 201
+        assert 'Idempotent-Replayed' not in first.headers
+        
+        retry = book(client, patient_id, 'key-1')
+        assert retry.status_code == 201
+        assert retry.headers['Idempotent-Replayed'] == 'true'
+        assert retry.get_json() == first.get_json()
+        assert Appointment.query.count() == 1
+    
+    def test_key_reused_for_another_request(self, client, patient_id):
+        """Test that a key sent with a different body is rejected."""
+        book(client, patient_id, 'key-1')
+        response = book(client, patient_id, 'key-1', when='2030-03-05 09:00:00')
+        assert response.status_code == 422
+        assert Appointment.query.count() == 1
+    
+    def test_request_in_progress(self, app, client, patient_id):
+        """Test that a retry racing the first request gets 409."""
+        now = datetime.utcnow()
+        db.session.add(IdempotencyKey(key='key-1', fingerprint='0' * 64, created_at=now,
+                                      expires_at=now + timedelta(seconds=60)))
+        db.session.commit()
+        response = client.post('/api/records', headers={'Idempotency-Key': 'key-1'}, json={})
+        assert response.status_code == 422
+        
+        IdempotencyKey.query.filter_by(key='key-1').delete()
+        db.session.commit()
+        first = book(client, patient_id, 'key-2')
+        IdempotencyKey.query.filter_by(key='key-2').update({'status_code': None})
+        db.session.commit()
+        assert book(client, patient_id, 'key-2').status_code == 409
+        assert first.status_code == 201
+    
+    def test_server_errors_are_not_stored(self, app, client, patient_id, monkeypatch):
+        """Test that a failed request releases its key so the retry runs again."""
+        def fail(*args, **kwargs):
+            raise RuntimeError('database hiccup')
+        
+        monkeypatch.setattr('app.check_slot', fail)
+        assert book(client, patient_id, 'key-1').status_code == 500
+        monkeypatch.undo()
+        
+        # Claiming the key itself fails before the view runs
+        monkeypatch.setattr(db.session, 'commit', fail)
+        assert book(client, patient_id, 'key-1').status_code == 503
+        monkeypatch.undo()
+        
+        assert IdempotencyKey.query.count() == 0
+        response = book(client, patient_id, 'key-1')
+        assert response.status_code == 201
+        assert 'Idempotent-Replayed' not in response.headers
+    
+    def test_expired_keys(self, app, client, patient_id):
+        """Test that expired keys are given up and purged."""
+        book(client, patient_id, 'key-1')
+        IdempotencyKey.query.update({'expires_at': datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        
+        # The key runs again, hitting the slot its first use booked
+        assert book(client, patient_id, 'key-1').status_code == 409
+        assert IdempotencyKey.query.count() == 1
+        IdempotencyKey.query.update({'expires_at': datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        assert purge_expired() == 1
+    
+    def test_invalid_key(self, client, patient_id):
+        """Test that empty and oversized keys are rejected."""
+        assert book(client, patient_id, '').status_code == 400
+        assert book(client, patient_id, 'k' * 256).status_code == 400
+        assert Appointment.query.count() == 0
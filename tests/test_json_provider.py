@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import pytest
+import json_provider
+from app import create_app
+from datetime import datetime, date
+
+
+@pytest.fixture
+def app():
+    """Create and configure a test app."""
+    return create_app('testing')
+
+
+SAMPLE = {'b': 1, 'a': 'ü', 'when': datetime(2024, 1, 2, 3, 4, 5), 'day': date(2024, 1, 2), 'none': None}
+
+
+class TestFastJSONProvider:
+    """Test the orjson-backed JSON provider."""
+
+    def test_matches_default_provider(self, app):
+        """Test that dates and datetimes encode the same as Flask's default provider."""
+        from flask.json.provider import DefaultJSONProvider
+        expected = json.loads(DefaultJSONProvider(app).dumps(SAMPLE))
+        assert json.loads(app.json.dumps_bytes(SAMPLE)) == expected
+
+    def test_keys_keep_insertion_order(self, app):
+        """Test that keys are not sorted."""
+        assert app.json.dumps({'b': 1, 'a': 2}) == '{"b":1,"a":2}'
+
+    def test_stdlib_fallback_matches(self, app, monkeypatch):
+        """Test that output is identical when orjson is not installed."""
+        expected = app.json.dumps_bytes(SAMPLE)
+        monkeypatch.setattr(json_provider, 'orjson', None)
+        assert json_provider.backend_name() == 'json'
+        assert app.json.dumps_bytes(SAMPLE) == expected
+        assert app.json.loads(expected)['a'] == 'ü'
+
+    def test_response_round_trip(self, app):
+        """Test that jsonify responses decode back to the original data."""
+        with app.test_request_context():
+            response = app.json.response({'success': True, 'data': [1, 2]})
+        assert response.mimetype == 'application/json'
+        assert json.loads(response.get_data()) == {'success': True, 'data': [1, 2]}
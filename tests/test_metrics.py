@@ -0,0 +1,116 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import logging
+import pytest
+from prometheus_client import REGISTRY
+from models import db
+from app import create_app
+
+
+@pytest.fixture
+def app():
+    """Create and configure a test app."""
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def request(client, method, url, **kwargs):
+    """Send a request and close the response, which is when metrics are recorded."""
+    response = client.open(url, method=method, **kwargs)
+    body = response.get_data()
+    response.close()
+    return response, body
+
+
+class TestRequestMetrics:
+    """Test the per-request Prometheus metrics."""
+
+    def test_latency_by_route_template(self, client):
+        """Test that latency is labelled with the route template, not the URL."""
+        before = sample('http_request_duration_seconds_count',
+                        method='GET', route='/api/patients/<int:patient_id>', status='404')
+        request(client, 'GET', '/api/patients/12345')
+        request(client, 'GET', '/api/patients/67890')
+        after = sample('http_request_duration_seconds_count',
+                       method='GET', route='/api/patients/<int:patient_id>', status='404')
+        assert after - before == 2
+
+    def test_sizes_and_sql_per_request(self, client):
+        """Test request/response sizes and SQL statement counts."""
+        labels = {'method': 'POST', 'route': '/api/patients'}
+        size_before = sample('http_request_size_bytes_sum', **labels)
+        queries_before = sample('http_request_db_queries_sum', **labels)
+        count_before = sample('http_request_db_queries_count', **labels)
+        response, body = request(client, 'POST', '/api/patients', json={
+            'name': 'Metric Patient',
+            'date_of_birth': '1990-01-01',
+            'email': 'metrics@example.com'
+        })
+        assert response.status_code == 201
+        assert sample('http_request_size_bytes_sum', **labels) - size_before == response.request.content_length
+        assert sample('http_response_size_bytes_sum', **labels) >= len(body)
+        assert sample('http_request_db_queries_count', **labels) - count_before == 1
+        assert sample('http_request_db_queries_sum', **labels) - queries_before >= 1
+        assert sample('http_request_db_duration_seconds_sum', **labels) > 0
+
+    def test_streamed_response_size(self, client):
+        """Test that streamed bodies and the queries they run are counted once fully sent."""
+        request(client, 'POST', '/api/patients', json={
+            'name': 'Stream Metric',
+            'date_of_birth': '1990-01-01',
+            'email': 'streammetric@example.com'
+        })
+        labels = {'method': 'GET', 'route': '/api/appointments/export'}
+        size_before = sample('http_response_size_bytes_sum', **labels)
+        queries_before = sample('http_request_db_queries_sum', **labels)
+        _, body = request(client, 'GET', '/api/appointments/export?format=json')
+        assert sample('http_response_size_bytes_sum', **labels) - size_before == len(body)
+        assert sample('http_request_db_queries_sum', **labels) - queries_before >= 1
+
+    def test_slow_query_log(self, app, caplog):
+        """Test that statements over the threshold are logged and counted."""
+        app.config['SLOW_QUERY_THRESHOLD_MS'] = 1
+        before = sample('db_slow_queries_total', route='none')
+        slow = ('WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 300000) '
+                'SELECT count(*) FROM c')
+        with caplog.at_level(logging.WARNING, logger='metrics'):
+            db.session.execute(db.text(slow))
+        assert sample('db_slow_queries_total', route='none') - before == 1
+        assert any('Slow query' in r.getMessage() and 'RECURSIVE' in r.getMessage() for r in caplog.records)
+
+        app.config['SLOW_QUERY_THRESHOLD_MS'] = 0
+        db.session.execute(db.text(slow))
+        assert sample('db_slow_queries_total', route='none') - before == 1
+
+    def test_metrics_endpoint(self, client):
+        """Test that /metrics serves the Prometheus text format."""
+        request(client, 'GET', '/health')
+        response, body = request(client, 'GET', '/metrics')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        assert b'http_request_duration_seconds_bucket' in body
+        assert b'route="/health"' in body
+
+    def test_missing_multiprocess_directory_is_created(self, tmp_path, monkeypatch):
+        """Test that a PROMETHEUS_MULTIPROC_DIR nobody created is not a 500."""
+        directory = tmp_path / 'prometheus'
+        monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(directory))
+        app = create_app('testing')
+        assert directory.is_dir()
+        response, _ = request(app.test_client(), 'GET', '/metrics')
+        assert response.status_code == 200
@@ -127,6 +127,41 @@ class TestAppointmentModel:
             # Test relationship
             assert appointment.patient.name == 'Rel Patient'
             assert len(patient.appointments) == 1
+    
+    def test_appointment_indexes(self, app):
+        """Test that the composite filter indexes are created."""
+        with app.app_context():
+            indexes = {
+                ix['name']: ix['column_names']
+                for ix in db.inspect(db.engine).get_indexes('appointment')
+            }
+            assert indexes['ix_appointment_doctor_datetime'] == ['doctor_name', 'appointment_datetime']
+            assert indexes['ix_appointment_patient_datetime'] == ['patient_id', 'appointment_datetime']
+            assert indexes['ix_appointment_status_datetime'] == ['status', 'appointment_datetime']
+    
+    def test_row_serializer_matches_to_dict(self, app):
+        """Test that serializing column tuples gives the same dict as to_dict."""
+        with app.app_context():
+            patient = Patient(name='Row Patient', date_of_birth=date(1980, 2, 3), email='row@example.com')
+            db.session.add(patient)
+            db.session.commit()
+            appointment = Appointment(
+                patient_id=patient.id,
+                doctor_name='Dr. Row',
+                appointment_datetime=datetime(2024, 5, 6, 7, 8),
+                reason='Checkup'
+            )
+            db.session.add(appointment)
+            db.session.commit()
+            
+            row = Appointment.query.with_entities(*Appointment.columns()).one()
+            assert Appointment.row_serializer()(row) == appointment.to_dict()
+            
+            row = Patient.query.with_entities(*Patient.columns(['id', 'date_of_birth'])).one()
+            assert Patient.row_serializer(['id', 'date_of_birth'])(row) == {
+                'id': patient.id,
+                'date_of_birth': '1980-02-03'
+            }
 
 
 class TestMedicalRecordModel:
@@ -0,0 +1,221 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import pytest
+from app import create_app
+from models import db
+import push
+from push import get_broker
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    app.config.update(PUSH_HEARTBEAT=0.01, PUSH_MAX_DURATION=0.05)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def create_patient(client, email):
+    return client.post('/api/patients', json={
+        'name': 'Push Client', 'date_of_birth': '1999-09-09', 'email': email
+    }).get_json()['data']['id']
+
+
+def create_record(client, patient_id, diagnosis='Flu'):
+    return client.post('/api/records', json={
+        'patient_id': patient_id, 'diagnosis': diagnosis, 'doctor_name': 'Dr. Push'
+    }).get_json()['data']['id']
+
+
+def open_stream(client, query='', **kwargs):
+    """GET /api/changes/stream as a threaded server (gthread or asgi.py) calls it."""
+    return client.get(f'/api/changes/stream{query}', environ_overrides={'wsgi.multithread': True}, **kwargs)
+
+
+def parse_events(body):
+    """Split an event stream into (id, event, data) tuples, skipping comments and retry hints."""
+    events = []
+    for block in body.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields.get('id'), fields['event'], json.loads(fields['data'])))
+    return events
+
+
+class TestChangeStream:
+    """Test GET /api/changes/stream."""
+    
+    def test_catch_up_and_resume(self, client):
+        """Test that a stream replays changes after since and resumes from Last-Event-ID."""
+        patient_id = create_patient(client, 'resume@example.com')
+        token = client.get('/api/changes').get_json()['next_token']
+        first = create_record(client, patient_id)
+        
+        response = open_stream(client, f'?since={token}')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        assert response.headers['Cache-Control'] == 'no-cache'
+        assert response.get_data().startswith(b'retry: 1000\n\n')
+        (event_id, name, data), = parse_events(response.get_data())
+        assert name == 'changes'
+        assert [(c['entity_type'], c['id'], c['action']) for c in data] == [('medical_record', first, 'create')]
+        
+        second = create_record(client, patient_id, 'Cold')
+        response = open_stream(client, headers={'Last-Event-ID': event_id})
+        (_, _, data), = parse_events(response.get_data())
+        assert [c['id'] for c in data] == [second]
+    
+    def test_entity_type_filter(self, client):
+        """Test that patient changes are only streamed when asked for."""
+        token = client.get('/api/changes').get_json()['next_token']
+        patient_id = create_patient(client, 'filter@example.com')
+        
+        (_, _, data), = parse_events(open_stream(client, f'?since={token}').get_data())
+        # The event is still sent, so the client's position moves forward
+        assert data == []
+        response = open_stream(client, f'?since={token}&entity_type=patient')
+        (_, _, data), = parse_events(response.get_data())
+        assert [c['id'] for c in data] == [patient_id]
+    
+    def test_invalid_parameters(self, client):
+        """Test that bad tokens and entity types are rejected."""
+        assert open_stream(client, '?since=bogus').status_code == 400
+        assert open_stream(client, '?entity_type=invoice').status_code == 400
+        assert not get_broker()._subscribers
+    
+    def test_subscriber_limit(self, app, client):
+        """Test that streams beyond PUSH_MAX_SUBSCRIBERS are turned away."""
+        broker = get_broker()
+        subscribers = [broker.subscribe() for _ in range(app.config['PUSH_MAX_SUBSCRIBERS'])]
+        response = open_stream(client)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '5'
+        broker.unsubscribe(subscribers[0])
+        response = open_stream(client)
+        assert response.status_code == 200
+        response.close()
+        # Closing the stream unsubscribed it
+        assert len(broker._subscribers) == len(subscribers) - 1
+    
+    def test_refused_on_sync_worker(self, client):
+        """Test that a server without threads gets no stream."""
+        response = client.get('/api/changes/stream')
+        assert response.status_code == 503
+        assert 'GET /api/changes' in response.get_json()['error']
+        assert not get_broker()._subscribers
+    
+    def test_streams_stay_below_thread_count(self, app, client):
+        """Test that PUSH_MAX_SUBSCRIBERS is capped one below SERVER_THREADS."""
+        app.config['SERVER_THREADS'] = 3
+        broker = get_broker()
+        assert broker.capacity() == 2
+        subscribers = [broker.subscribe(), broker.subscribe()]
+        response = open_stream(client)
+        assert response.status_code == 503
+        assert response.get_json()['error'] == 'Too many open change streams'
+        assert len(broker._subscribers) == len(subscribers)
+    
+    def test_last_free_thread_is_kept(self, app, client):
+        """Test that a stream is refused when every other thread is busy."""
+        app.config['SERVER_THREADS'] = 3
+        broker = get_broker()
+        # Two requests in flight elsewhere; the stream would take the third thread
+        broker.request_started()
+        broker.request_started()
+        response = open_stream(client)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '5'
+        assert not broker._subscribers
+        
+        broker.request_finished()
+        response = open_stream(client)
+        assert response.status_code == 200
+        response.close()
+        broker.request_finished()
+        assert broker.active_requests == 0
+
+
+class TestChangeBroker:
+    """Test fanning changes out to subscribers."""
+    
+    def test_dispatch_fans_out_each_page_once(self, client):
+        """Test that every subscriber receives the changes read by one dispatch."""
+        broker = get_broker()
+        patient_id = create_patient(client, 'fanout@example.com')
+        first, second = broker.subscribe(), broker.subscribe()
+        record = create_record(client, patient_id)
+        
+        broker.dispatch()
+        page = first.buffer.get_nowait()
+        assert second.buffer.get_nowait() is page
+        assert [(c['entity_type'], c['id']) for c in page['data']] == [('medical_record', record)]
+        assert broker.token == page['next_token']
+        broker.dispatch()
+        assert first.buffer.empty()
+    
+    def test_subscriber_joining_during_dispatch(self, client, monkeypatch):
+        """Test that a stream opened while a dispatch reads its pages still receives them."""
+        broker = get_broker()
+        patient_id = create_patient(client, 'late@example.com')
+        first = broker.subscribe()
+        record = create_record(client, patient_id)
+        read_pages = push._pages
+        late = []
+        
+        def read_then_subscribe(token):
+            pages = list(read_pages(token))
+            late.append(broker.subscribe())
+            return pages
+        
+        monkeypatch.setattr(push, '_pages', read_then_subscribe)
+        broker.dispatch()
+        subscriber, = late
+        # It catches up from where the dispatch started, and gets the dispatched page too
+        assert subscriber.token == first.token
+        page = subscriber.buffer.get_nowait()
+        assert [(c['entity_type'], c['id']) for c in page['data']] == [('medical_record', record)]
+        assert broker.token == page['next_token']
+    
+    def test_commit_wakes_dispatcher(self, client):
+        """Test that only committed audited writes signal the notifier."""
+        notifier = get_broker().notifier
+        notifier.wait(0)
+        create_patient(client, 'wake@example.com')
+        assert notifier.wait(0) is True
+        client.get('/api/patients')
+        assert notifier.wait(0) is False
+    
+    def test_overflow_falls_back_to_audit_log(self, app, client):
+        """Test that a stream whose buffer overflowed reads the dropped pages from the audit log."""
+        broker = get_broker()
+        broker.buffer_size = 1
+        app.config['PUSH_MAX_DURATION'] = 5
+        patient_id = create_patient(client, 'slow@example.com')
+        response = open_stream(client, buffered=False)
+        chunks = iter(response.response)
+        assert next(chunks).startswith(b'retry:')
+        # Catches up (nothing to send) and waits for its first page
+        assert next(chunks) == b': heartbeat\n\n'
+        subscriber, = broker._subscribers
+        
+        records = []
+        for i in range(3):
+            records.append(create_record(client, patient_id, f'Visit {i}'))
+            broker.dispatch()
+        assert subscriber.overflowed
+        # The buffered pages are dropped and read back from the audit log as one
+        (_, _, data), = parse_events(next(chunks))
+        assert [c['id'] for c in data] == records
+        assert not subscriber.overflowed and subscriber.buffer.empty()
+        response.close()
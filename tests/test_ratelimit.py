@@ -0,0 +1,100 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from app import create_app
+from models import db
+from ratelimit import LocalLimiterBackend, RateLimiter, parse_route_limits
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def install(app, default='0.001/3', routes='', concurrency=0):
+    limiter = RateLimiter(LocalLimiterBackend(), tuple(map(float, default.split('/'))),
+                          parse_route_limits(routes), concurrency)
+    app.extensions['ratelimit'] = limiter
+    return limiter
+
+
+class TestRateLimit:
+    """Test the per-client token buckets."""
+    
+    def test_bucket_empties_then_429(self, app, client):
+        """Test that a client gets its burst, then 429 with Retry-After."""
+        install(app)
+        assert [client.get('/api/patients').status_code for _ in range(3)] == [200, 200, 200]
+        response = client.get('/api/patients')
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) > 1
+        assert response.get_json() == {'success': False, 'error': 'Rate limit exceeded'}
+        # Readable by the front-ends, which are served from another origin
+        response = client.get('/api/patients', headers={'Origin': 'http://localhost:3000'})
+        assert response.headers['Access-Control-Expose-Headers'] == 'Retry-After'
+        
+        # Other routes and probes have buckets of their own
+        assert client.get('/api/appointments').status_code == 200
+        assert client.get('/health').status_code == 200
+        assert b'http_throttled_requests_total{reason="rate",route="/api/patients"}' \
+            in client.get('/metrics').data
+    
+    def test_clients_and_routes_are_separate(self, app, client):
+        """Test per-route overrides and per API key / address buckets."""
+        install(app, routes='GET /api/patients=0.001/1')
+        assert client.get('/api/patients').status_code == 200
+        assert client.get('/api/patients').status_code == 429
+        assert client.get('/api/patients', headers={'X-API-Key': 'partner'}).status_code == 200
+        assert client.get('/api/patients', environ_base={'REMOTE_ADDR': '10.0.0.9'}).status_code == 200
+        
+        # Behind the ingress, the forwarded address identifies the client
+        app.config['RATELIMIT_PROXY_COUNT'] = 1
+        forwarded = {'X-Forwarded-For': '203.0.113.7'}
+        assert client.get('/api/patients', headers=forwarded).status_code == 200
+        assert client.get('/api/patients', headers=forwarded).status_code == 429
+    
+    def test_invalid_route_limits(self):
+        """Test that malformed RATELIMIT_ROUTES are rejected at startup."""
+        assert parse_route_limits('get /api/patients=2/5') == {('GET', '/api/patients'): (2.0, 5.0)}
+        for value in ('/api/patients=2/5', 'GET /api/patients=fast', 'GET /api/patients=0/5'):
+            with pytest.raises(ValueError):
+                parse_route_limits(value)
+
+
+class TestConcurrencyCap:
+    """Test the cap on concurrent expensive requests."""
+    
+    def test_cap_rejects_while_slots_are_held(self, app, client):
+        """Test that requests past the cap get 429 and slots are given back."""
+        limiter = install(app, default='1000/1000', concurrency=1)
+        assert limiter.acquire('ip:127.0.0.1')
+        response = client.get('/api/appointments')
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '1'
+        # Cheap endpoints are not capped
+        assert client.get('/api/stats').status_code == 200
+        
+        limiter.release('ip:127.0.0.1')
+        assert client.get('/api/appointments').status_code == 200
+        assert client.get('/api/appointments').status_code == 200
+    
+    def test_streamed_export_holds_slot_until_closed(self, app, client):
+        """Test that an export keeps its slot while the body is streaming."""
+        limiter = install(app, default='1000/1000', concurrency=1)
+        export = client.get('/api/appointments/export', buffered=False)
+        assert export.status_code == 200
+        assert client.get('/api/appointments').status_code == 429
+        export.close()
+        assert limiter.acquire('ip:127.0.0.1')
@@ -0,0 +1,100 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+import time
+import pytest
+from sqlalchemy import event
+from app import create_app
+from config import TestingConfig
+from models import db
+from readiness import ReadinessMonitor, migration_head
+
+
+@pytest.fixture
+def file_app(tmp_path, monkeypatch):
+    """App on a SQLite file, which gets a real QueuePool, with a fast background checker."""
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'ready.db'}")
+    monkeypatch.setattr(TestingConfig, 'READINESS_CHECK_INTERVAL', 0.05)
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def wait_for_check(monitor, after=0.0):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        state = monitor._state
+        if state is not None and state['checked_at'] > after:
+            return state
+        time.sleep(0.01)
+    raise AssertionError('readiness checker did not run')
+
+
+class TestReadiness:
+    """Test the cached readiness state behind /ready."""
+    
+    def test_probe_answers_from_memory(self, file_app):
+        """Test that /ready runs no SQL in the request thread."""
+        monitor = file_app.extensions['readiness']
+        wait_for_check(monitor)
+        probe_thread = threading.get_ident()
+        statements = []
+    
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if threading.get_ident() == probe_thread:
+                statements.append(statement)
+        
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            client = file_app.test_client()
+            for _ in range(20):
+                response = client.get('/ready')
+                assert response.status_code == 200
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        assert statements == []
+        data = response.get_json()
+        assert data['status'] == 'ready'
+        assert data['database'] == 'connected'
+        assert data['pool']['saturation'] == 0
+        assert data['pool']['capacity'] > 0
+    
+    def test_reports_migration_version(self, file_app):
+        """Test that the applied revision is compared with the migrations head."""
+        head = migration_head(file_app)
+        assert head is not None
+        monitor = file_app.extensions['readiness']
+        # create_app built the new database and stamped it with the head
+        wait_for_check(monitor, after=time.monotonic())
+        data = file_app.test_client().get('/ready').get_json()
+        assert data['migration'] == {'version': head, 'expected': head, 'current': True}
+    
+    def test_database_failure_is_not_ready(self, monkeypatch):
+        """Test that a failed check makes /ready return 503."""
+        app = create_app('testing')
+        with app.app_context():
+            def refuse():
+                raise ConnectionError('connection refused')
+            monkeypatch.setattr(db.engine, 'connect', refuse)
+            response = app.test_client().get('/ready')
+            assert response.status_code == 503
+            data = response.get_json()
+            assert data['status'] == 'not ready'
+            assert data['database'] == 'disconnected'
+            assert 'connection refused' in data['error']
+            db.session.remove()
+    
+    def test_stale_result_is_not_ready(self, file_app):
+        """Test that a checker that stopped reporting does not keep the pod ready."""
+        monitor = ReadinessMonitor(file_app, db, interval=60, stale_after=0.05)
+        ready, _ = monitor.state()
+        assert ready
+        time.sleep(0.1)
+        ready, report = monitor.state()
+        assert not ready
+        assert report['database'] == 'unknown'
+        assert 'ago' in report['error']
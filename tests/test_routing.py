@@ -0,0 +1,146 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+import time
+import pytest
+from datetime import date
+from sqlalchemy import create_engine
+from app import create_app
+from config import TestingConfig
+from models import db, Patient
+from routing import PIN_COOKIE, replica_binds
+
+
+def seed_replica(url, name):
+    """Create the schema in a stand-in replica and give it a distinguishable row."""
+    engine = create_engine(url)
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(Patient.__table__.insert(), {
+            'id': 1, 'name': name, 'date_of_birth': date(1990, 1, 1), 'email': f'{name}@example.com'
+        })
+    engine.dispose()
+
+
+@pytest.fixture
+def replica_app(tmp_path, monkeypatch):
+    """App on a primary SQLite file with two SQLite files standing in for replicas."""
+    primary = f"sqlite:///{tmp_path / 'primary.db'}"
+    replicas = [f"sqlite:///{tmp_path / 'replica_a.db'}", f"sqlite:///{tmp_path / 'replica_b.db'}"]
+    seed_replica(replicas[0], 'replica-a')
+    seed_replica(replicas[1], 'replica-b')
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', primary)
+    monkeypatch.setattr(TestingConfig, 'DATABASE_REPLICA_URLS', ','.join(replicas))
+    monkeypatch.setattr(TestingConfig, 'CACHE_BACKEND', 'none')
+    app = create_app('testing')
+    app.extensions['replica_router'].check()
+    with app.app_context():
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+class TestReplicaRouting:
+    """Test read routing between the primary and replicas."""
+    
+    def test_replica_binds(self):
+        """Test parsing of DATABASE_REPLICA_URLS."""
+        assert replica_binds('') == {}
+        assert replica_binds('sqlite:///a.db, sqlite:///b.db') == {
+            'replica_0': 'sqlite:///a.db',
+            'replica_1': 'sqlite:///b.db'
+        }
+    
+    def test_reads_round_robin_and_writes_hit_primary(self, replica_app):
+        """Test that GETs alternate replicas while writes go to the primary."""
+        client = replica_app.test_client()
+        names = [client.get('/api/patients/1').get_json()['data']['name'] for _ in range(4)]
+        assert names == ['replica-a', 'replica-b', 'replica-a', 'replica-b']
+        
+        response = client.post('/api/patients', json={
+            'name': 'Primary Patient',
+            'date_of_birth': '1990-01-01',
+            'email': 'primary@example.com'
+        })
+        assert response.status_code == 201
+        assert db.session.get(Patient, 1).name == 'Primary Patient'
+    
+    def test_read_your_writes(self, replica_app):
+        """Test that a client that just wrote reads from the primary."""
+        client = replica_app.test_client()
+        client.post('/api/patients', json={
+            'name': 'Fresh Write',
+            'date_of_birth': '1990-01-01',
+            'email': 'fresh@example.com'
+        })
+        assert client.get_cookie(PIN_COOKIE) is not None
+        assert client.get('/api/patients/1').get_json()['data']['name'] == 'Fresh Write'
+        
+        other = replica_app.test_client()
+        assert other.get('/api/patients/1').get_json()['data']['name'].startswith('replica-')
+        response = other.get('/api/patients/1', headers={'X-Read-Consistency': 'primary'})
+        assert response.get_json()['data']['name'] == 'Fresh Write'
+    
+    def test_unhealthy_replica_is_skipped(self, tmp_path, monkeypatch):
+        """Test fallback to the remaining replica, then to the primary."""
+        primary = f"sqlite:///{tmp_path / 'primary.db'}"
+        healthy = f"sqlite:///{tmp_path / 'replica.db'}"
+        broken = f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"
+        seed_replica(healthy, 'replica-ok')
+        monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', primary)
+        monkeypatch.setattr(TestingConfig, 'DATABASE_REPLICA_URLS', f'{broken},{healthy}')
+        monkeypatch.setattr(TestingConfig, 'CACHE_BACKEND', 'none')
+        app = create_app('testing')
+        app.extensions['replica_router'].check()
+        client = app.test_client()
+        with app.app_context():
+            names = {client.get('/api/patients/1').get_json()['data']['name'] for _ in range(3)}
+            assert names == {'replica-ok'}
+            replicas = client.get('/metrics/pool').get_json()['replicas']
+            assert replicas['replica_0']['healthy'] is False
+            assert replicas['replica_1']['healthy'] is True
+            
+            monkeypatch.setattr(TestingConfig, 'DATABASE_REPLICA_URLS', broken)
+            app = create_app('testing')
+            app.extensions['replica_router'].check()
+            response = app.test_client().get('/api/patients/1')
+            assert response.status_code == 404
+            for engine in db.engines.values():
+                engine.dispose()
+    
+    def test_hanging_probe_does_not_block_reads(self, replica_app):
+        """Test that reads use the last probe results while a probe hangs."""
+        router = replica_app.extensions['replica_router']
+        release = threading.Event()
+        probe = router._probe
+        router._probe = lambda key: release.wait(5) and probe(key)
+        checker = threading.Thread(target=router.check)
+        checker.start()
+        try:
+            started = time.monotonic()
+            names = {replica_app.test_client().get('/api/patients/1').get_json()['data']['name'] for _ in range(2)}
+            assert names == {'replica-a', 'replica-b'}
+            assert time.monotonic() - started < 1
+        finally:
+            release.set()
+            checker.join()
+    
+    def test_replicas_wait_for_first_probe(self, tmp_path, monkeypatch):
+        """Test that reads stay on the primary until a replica has passed a probe."""
+        replica = f"sqlite:///{tmp_path / 'replica.db'}"
+        seed_replica(replica, 'replica-new')
+        monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'primary.db'}")
+        monkeypatch.setattr(TestingConfig, 'DATABASE_REPLICA_URLS', replica)
+        monkeypatch.setattr(TestingConfig, 'CACHE_BACKEND', 'none')
+        app = create_app('testing')
+        router = app.extensions['replica_router']
+        with app.app_context():
+            assert router.status() == {'replica_0': None}
+            assert app.test_client().get('/api/patients/1').status_code == 404
+            router.check()
+            assert app.test_client().get('/api/patients/1').get_json()['data']['name'] == 'replica-new'
+            for engine in db.engines.values():
+                engine.dispose()
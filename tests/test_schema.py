@@ -0,0 +1,84 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import importlib.util
+import subprocess
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, text
+from app import create_app
+from config import TestingConfig
+from models import db
+from schema import MIGRATIONS_DIRECTORY
+
+ROOT = os.path.dirname(MIGRATIONS_DIRECTORY)
+INITIAL_REVISION = '2b681c23b5fd'
+
+
+def head():
+    return ScriptDirectory(MIGRATIONS_DIRECTORY).get_current_head()
+
+
+def flask_db(url, *args):
+    """Run a ``flask db`` command the way the README does."""
+    env = {**os.environ, 'FLASK_APP': 'app:create_app', 'FLASK_ENV': 'development', 'DATABASE_URL': url,
+           'READINESS_CHECK_INTERVAL': '0', 'PUSH_POLL_INTERVAL': '0'}
+    result = subprocess.run([sys.executable, '-m', 'flask', 'db', *args], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def create_baseline_database(url):
+    """Build the tables create_all() made before migrations existed, without an alembic_version."""
+    path = os.path.join(MIGRATIONS_DIRECTORY, 'versions', f'{INITIAL_REVISION}_initial_schema.py')
+    spec = importlib.util.spec_from_file_location('initial_schema', path)
+    initial_schema = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(initial_schema)
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            initial_schema.upgrade()
+        connection.execute(text("INSERT INTO patient (name, date_of_birth, email) "
+                                "VALUES ('Old Patient', '1980-01-01', 'old@example.com')"))
+    engine.dispose()
+
+
+def columns(engine, table):
+    return {column['name'] for column in inspect(engine).get_columns(table)}
+
+
+class TestSchema:
+    """Test creating new databases and upgrading existing ones."""
+
+    def test_new_database_is_created_at_head(self, tmp_path, monkeypatch):
+        """Test that create_app builds an empty database and stamps it with the latest revision."""
+        url = f"sqlite:///{tmp_path / 'new.db'}"
+        monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', url)
+        app = create_app('testing')
+        with app.app_context():
+            assert db.session.execute(text('SELECT version_num FROM alembic_version')).scalar() == head()
+            db.session.remove()
+            db.engine.dispose()
+        # Nothing left for the migrations to do
+        flask_db(url, 'upgrade')
+
+    def test_readme_upgrade_of_baseline_database(self, tmp_path):
+        """Test the README's stamp and upgrade steps on a database created before migrations."""
+        url = f"sqlite:///{tmp_path / 'baseline.db'}"
+        create_baseline_database(url)
+
+        flask_db(url, 'stamp', INITIAL_REVISION)
+        engine = create_engine(url)
+        # Starting the app left the existing schema to the migrations
+        assert not inspect(engine).has_table('appointment_daily_stat')
+
+        flask_db(url, 'upgrade')
+        with engine.connect() as connection:
+            assert connection.execute(text('SELECT version_num FROM alembic_version')).scalar() == head()
+            assert connection.execute(text('SELECT email FROM patient')).scalars().all() == ['old@example.com']
+        assert {'deleted_at'} <= columns(engine, 'patient')
+        assert {'feed_id'} <= columns(engine, 'audit_log')
+        assert inspect(engine).has_table('appointment_daily_stat')
+        engine.dispose()